@@ -56,6 +56,7 @@ class Settings(BaseSettings):
     anomaly_sensitivity: float = Field(default=0.05, env="ANOMALY_SENSITIVITY")  # 5%
     anomaly_window_size: int = Field(default=24, env="ANOMALY_WINDOW_SIZE")  # 24時間
     anomaly_min_data_points: int = Field(default=10, env="ANOMALY_MIN_DATA_POINTS")
+    anomaly_n_jobs: int = Field(default=1, env="ANOMALY_N_JOBS")  # Isolation Forestの並列数
     
     # トレンド分析設定
     trend_analysis_periods: List[str] = Field(
@@ -53,8 +53,8 @@ async def lifespan(app: FastAPI):
     settings = Settings()
     ai_analytics_service = AIAnalyticsService(settings)
     insight_generator = InsightGeneratorService(settings)
-    realtime_processor = RealtimeProcessorService(settings)
     anomaly_detector = AnomalyDetectorService(settings)
+    realtime_processor = RealtimeProcessorService(settings, anomaly_detector=anomaly_detector)
     trend_analyzer = TrendAnalyzerService(settings)
     behavior_analyzer = BehaviorAnalyzerService(settings)
     
@@ -74,6 +74,8 @@ async def lifespan(app: FastAPI):
     logger.info("AI分析エンジンをシャットダウン中...")
     if realtime_processor:
         await realtime_processor.cleanup()
+    if trend_analyzer:
+        await trend_analyzer.cleanup()
     logger.info("AI分析エンジンのシャットダウンが完了しました")
 
 # FastAPIアプリケーションの作成
@@ -281,9 +283,13 @@ async def analyze_user_behavior(site_id: str, segment: Optional[str] = None) ->
 # ============ リアルタイム分析エンドポイント ============
 
 @app.websocket("/ws/realtime/{site_id}")
-async def realtime_analytics_websocket(websocket: WebSocket, site_id: str):
-    """リアルタイム分析WebSocket接続"""
-    await websocket_manager.connect(websocket, site_id)
+async def realtime_analytics_websocket(websocket: WebSocket, site_id: str, binary: bool = False):
+    """
+    リアルタイム分析WebSocket接続
+    
+    クエリパラメータ binary=true を指定すると、サーバーからのJSONをバイナリフレームで受信する
+    """
+    await websocket_manager.connect(websocket, site_id, binary_frames=binary)
     try:
         # リアルタイム処理開始
         await realtime_processor.start_realtime_analysis(site_id, websocket_manager)
@@ -384,5 +390,6 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8001,  # メインバックエンドと分離
         reload=True,
+        loop="auto",  # uvloopがインストールされていればuvloop（WebSocket送受信が高速）、無ければasyncio
         log_level="info"
     )
\ No newline at end of file
@@ -199,6 +199,22 @@ class AlertData(BaseModel):
     threshold_value: float = Field(..., description="閾値")
     recommended_actions: List[str] = Field(..., description="推奨アクション")
     auto_resolved: bool = Field(default=False, description="自動解決済み")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSONシリアライズ可能なフラット辞書に変換"""
+        return {
+            "alert_id": self.alert_id,
+            "alert_type": self.alert_type,
+            "severity": self.severity.value,
+            "title": self.title,
+            "message": self.message,
+            "triggered_at": self.triggered_at.isoformat(),
+            "metric_name": self.metric_name,
+            "current_value": self.current_value,
+            "threshold_value": self.threshold_value,
+            "recommended_actions": list(self.recommended_actions),
+            "auto_resolved": self.auto_resolved
+        }
 
 # ============ WebSocketメッセージスキーマ ============
 
@@ -0,0 +1,93 @@
+"""
+トレンド分析用の数値カーネル
+pandasを介さずNumPy配列上で統計量をまとめて計算する
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def summary_statistics(y: np.ndarray) -> Dict[str, float]:
+    """基本統計量・分位点・歪度・尖度を一括計算（pandasと同じ不偏推定）"""
+    n = y.size
+    if n == 0:
+        return {}
+
+    # 中心化配列と二乗配列の2つだけを確保し、モーメントは内積で計算
+    mean = y.mean()
+    centered = y - mean
+    sq = np.multiply(centered, centered)
+    m2 = sq.sum() / n
+    m3 = (sq @ centered) / n
+    m4 = (sq @ sq) / n
+
+    # 分位点は1回の選択で取得（線形補間）
+    q1, median, q3 = np.quantile(y, (0.25, 0.5, 0.75))
+
+    std = np.sqrt(m2 * n / (n - 1)) if n > 1 else np.nan
+
+    # 調整済みFisher-Pearson歪度
+    if n < 3:
+        skewness = np.nan
+    elif m2 == 0:
+        skewness = 0.0
+    else:
+        skewness = np.sqrt(n * (n - 1)) / (n - 2) * m3 / m2 ** 1.5
+
+    # 不偏超過尖度
+    if n < 4:
+        kurtosis = np.nan
+    elif m2 == 0:
+        kurtosis = 0.0
+    else:
+        g2 = m4 / (m2 * m2) - 3.0
+        kurtosis = ((n + 1) * g2 + 6.0) * (n - 1) / ((n - 2) * (n - 3))
+
+    return {
+        "mean": float(mean),
+        "median": float(median),
+        "std": float(std),
+        "min": float(y.min()),
+        "max": float(y.max()),
+        "q1": float(q1),
+        "q3": float(q3),
+        "skewness": float(skewness),
+        "kurtosis": float(kurtosis)
+    }
+
+
+def local_extrema(y: np.ndarray, order: int) -> Tuple[np.ndarray, np.ndarray]:
+    """前後order点より厳密に小さい/大きい点のインデックス（argrelextremaのclipモード相当）"""
+    n = y.size
+    if n == 0:
+        return np.array([], dtype=np.intp), np.array([], dtype=np.intp)
+
+    # 端点は自身の値で埋める（clipモードと同じく端では比較が成立しない）
+    padded = np.pad(y, order, mode='edge')
+    windows = sliding_window_view(padded, 2 * order + 1)
+    left = windows[:, :order]
+    right = windows[:, order + 1:]
+
+    is_min = y < np.minimum(left.min(axis=1), right.min(axis=1))
+    is_max = y > np.maximum(left.max(axis=1), right.max(axis=1))
+    return np.flatnonzero(is_min), np.flatnonzero(is_max)
+
+
+def rolling_std_summary(y: np.ndarray, w: int) -> Tuple[float, float, float]:
+    """窓幅wの移動標準偏差（ddof=1）の最初の値・最後の値・平均を累積和で計算"""
+    n = y.size
+    if n < w or w < 2:
+        return np.nan, np.nan, np.nan
+
+    # 桁落ちを抑えるため平均で中心化してから累積和を取る
+    centered = y - y.mean()
+    cs = np.concatenate(([0.0], np.cumsum(centered)))
+    css = np.concatenate(([0.0], np.cumsum(centered * centered)))
+    s = cs[w:] - cs[:-w]
+    ss = css[w:] - css[:-w]
+
+    var = (ss - s * s / w) / (w - 1)
+    np.maximum(var, 0.0, out=var)
+    stds = np.sqrt(var)
+    return float(stds[0]), float(stds[-1]), float(stds.mean())
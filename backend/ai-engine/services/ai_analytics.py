@@ -3,8 +3,12 @@ AI分析サービス - OpenAI + LangChain統合
 Google Analytics Intelligence、Adobe Senseiを超える次世代分析エンジン
 """
 import asyncio
+import io
 import json
+import re
+import zlib
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Dict, List, Any, Optional, Tuple
 import openai
 from langchain.chat_models import ChatOpenAI
@@ -13,6 +17,7 @@ from langchain.chains import LLMChain
 from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from langchain.memory import ConversationBufferWindowMemory
 from langchain.callbacks import get_openai_callback
+import orjson
 import pandas as pd
 import numpy as np
 from scipy import stats
@@ -26,9 +31,205 @@ from models.schemas import AnalyticsRequest, AnalyticsResponse
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=32)
+def _fft_bin_periods(n: int) -> np.ndarray:
+    """長さnのrfft周波数ビン→周期（データ点数）の対応表"""
+    with np.errstate(divide='ignore'):
+        periods = n / np.arange(n // 2 + 1, dtype=np.float64)
+    periods.flags.writeable = False
+    return periods
+
+@lru_cache(maxsize=32)
+def _centered_time_index(n: int) -> Tuple[np.ndarray, float]:
+    """長さnの中心化した時間軸とその平方和 n(n²-1)/12"""
+    x = np.arange(n, dtype=np.float64) - (n - 1) / 2
+    x.flags.writeable = False
+    return x, n * (n * n - 1) / 12
+
+@lru_cache(maxsize=32)
+def _sample_analytics_columns(days: int) -> Dict[str, np.ndarray]:
+    """日数別サンプル分析データの列（乱数シード固定のため日数だけで決まる。読み取り専用）"""
+    # リアルなサンプルデータ生成
+    rng = np.random.RandomState(42)
+    weekly = np.sin(np.arange(days) * 2 * np.pi / 7)
+    columns = {
+        "page_views": rng.poisson(1000, days) + weekly * 200,
+        "unique_visitors": rng.poisson(400, days) + weekly * 80,
+        "sessions": rng.poisson(600, days),
+        "bounce_rate": rng.beta(2, 3, days),
+        "avg_session_duration": rng.gamma(2, 60, days),
+        "conversions": rng.poisson(20, days),
+        "revenue": rng.gamma(2, 500, days)
+    }
+    for values in columns.values():
+        values.flags.writeable = False
+    return columns
+
+def _sample_analytics_data(start_date: datetime, end_date: datetime) -> pd.DataFrame:
+    """期間別サンプル分析データ生成"""
+    days = (end_date - start_date).days
+    dates = pd.date_range(start=start_date, end=end_date, freq='D')
+    
+    # 値は日数が同じ期間で共有（呼び出し側の変更がキャッシュに及ばないようコピー）
+    return pd.DataFrame({"date": dates[:days], **_sample_analytics_columns(days)}, copy=True)
+
+# システムプロンプト - 分析エキスパート
+_ANALYSIS_SYSTEM_PROMPT = """
+あなたは世界最高レベルのWebアナリティクスAIエキスパートです。
+Google Analytics Intelligence、Adobe Senseiを遥かに超える洞察力を持っています。
+
+あなたの能力：
+- 複雑なデータパターンを瞬時に識別
+- ビジネスインパクトを定量化
+- 実行可能な改善提案を生成
+- ROI予測の高精度計算
+- 競合分析と市場トレンド把握
+- ユーザー心理とビヘイビアの深層理解
+
+分析時の原則：
+1. データドリブンな洞察提供
+2. 実用的で具体的な提案
+3. ビジネス価値への変換
+4. 統計的根拠の明示
+5. わかりやすい日本語での説明
+"""
+
+# 分析種別ごとのプロンプト（解析コストを避けるためインポート時に1回だけ構築）
+ANALYSIS_PROMPTS = {
+    "comprehensive": ChatPromptTemplate.from_messages([
+        SystemMessagePromptTemplate.from_template(_ANALYSIS_SYSTEM_PROMPT),
+        HumanMessagePromptTemplate.from_template("""
+        サイト: {site_id}
+        期間: {date_range}
+        
+        分析データ:
+        {analytics_data}
+        
+        以下を包括的に分析してください：
+        1. 主要パフォーマンス指標の評価
+        2. ユーザーエンゲージメントの深層分析
+        3. コンバージョンファネルの最適化ポイント
+        4. 競合他社との差異化要因
+        5. 成長機会の特定
+        6. 具体的な改善アクション
+        7. ROI予測と投資優先度
+        
+        JSON形式で構造化された分析結果を返してください。
+        """)
+    ]),
+    
+    "anomaly_insight": ChatPromptTemplate.from_messages([
+        SystemMessagePromptTemplate.from_template(_ANALYSIS_SYSTEM_PROMPT),
+        HumanMessagePromptTemplate.from_template("""
+        異常値検知結果を分析し、ビジネスへの影響を評価してください。
+        
+        検知データ:
+        {anomaly_data}
+        
+        以下を分析：
+        1. 異常の根本原因
+        2. ビジネスへの影響度
+        3. 緊急対応の必要性
+        4. 今後の予防策
+        5. 類似パターンの予測
+        
+        緊急度とアクションプランを含めて回答してください。
+        """)
+    ]),
+    
+    "trend_prediction": ChatPromptTemplate.from_messages([
+        SystemMessagePromptTemplate.from_template(_ANALYSIS_SYSTEM_PROMPT),
+        HumanMessagePromptTemplate.from_template("""
+        トレンドデータを基に将来予測を行ってください。
+        
+        トレンドデータ:
+        {trend_data}
+        市場データ:
+        {market_data}
+        
+        分析内容：
+        1. トレンドの持続性評価
+        2. 外部要因の影響分析
+        3. 成長機会の予測
+        4. リスク要因の特定
+        5. 戦略的推奨事項
+        
+        30日、90日、365日の予測を含めてください。
+        """)
+    ]),
+    
+    "behavior_optimization": ChatPromptTemplate.from_messages([
+        SystemMessagePromptTemplate.from_template(_ANALYSIS_SYSTEM_PROMPT),
+        HumanMessagePromptTemplate.from_template("""
+        ユーザー行動データから最適化戦略を提案してください。
+        
+        行動データ:
+        {behavior_data}
+        セグメント情報:
+        {segment_data}
+        
+        最適化項目：
+        1. ユーザージャーニーの改善
+        2. UI/UXの最適化ポイント
+        3. コンテンツ戦略の提案
+        4. パーソナライゼーション機会
+        5. A/Bテスト推奨事項
+        
+        各提案に期待ROIを算出してください。
+        """)
+    ])
+}
+
+# 洞察テキストからのROI数値抽出
+_ROI_PATTERN = re.compile(r'ROI.*?(\d+(?:\.\d+)?)%')
+
+# 洞察テキストの行分類キーワード（全キーワードを1つのパターンにまとめ、各行を1回だけ走査する）
+_INSIGHT_LINE_KEYWORDS = {
+    "recommendations": ("推奨", "提案", "改善", "おすすめ"),
+    "next_steps": ("次に", "ステップ", "アクション")
+}
+_INSIGHT_LINE_PATTERN = re.compile("|".join(
+    f"(?P<{tag}>{'|'.join(map(re.escape, keywords))})"
+    for tag, keywords in _INSIGHT_LINE_KEYWORDS.items()
+))
+
 class AIAnalyticsService:
     """AI分析サービス"""
     
+    # 列指向・圧縮形式で保存したDataFrameキャッシュの識別子
+    FRAME_PAYLOAD_PREFIX = b"\x00f"
+    ANALYTICS_CACHE_TTL = 3600  # 1時間
+    
+    # 支配的周期の有意水準（Fisherのg検定）
+    SEASONALITY_SIGNIFICANCE = 0.05
+    
+    # パフォーマンススコアの業界標準値（サンプル）と評価方向
+    SCORE_METRICS = ("bounce_rate", "conversion_rate", "avg_session_duration")
+    SCORE_BENCHMARKS = np.array([0.60, 0.03, 120.0])
+    SCORE_HIGHER_IS_BETTER = np.array([False, True, True])
+    
+    # パフォーマンスアラート（メトリクス、閾値、閾値超過で発火するか、アラート内容）
+    ALERT_METRICS = ("bounce_rate", "conversion_rate")
+    ALERT_THRESHOLDS = np.array([0.70, 0.01])
+    ALERT_ABOVE = np.array([True, False])
+    ALERT_DEFINITIONS = (
+        {
+            "type": "high_bounce_rate",
+            "severity": "high",
+            "message": "直帰率が70%を超えています",
+            "recommendation": "ランディングページの改善を検討してください"
+        },
+        {
+            "type": "low_conversion_rate",
+            "severity": "medium",
+            "message": "コンバージョン率が1%を下回っています",
+            "recommendation": "コンバージョンファネルの最適化が必要です"
+        }
+    )
+    
+    # 洞察テキストから抽出する行数の上限（推奨事項5件、次のステップ3件）
+    INSIGHT_LINE_LIMITS = {"recommendations": 5, "next_steps": 3}
+    
     def __init__(self, settings: Settings):
         self.settings = settings
         self.redis_client = None
@@ -75,113 +276,8 @@ class AIAnalyticsService:
             raise
 
     async def _setup_analysis_prompts(self):
-        """分析用プロンプトの設定"""
-        
-        # システムプロンプト - 分析エキスパート
-        system_prompt = """
-        あなたは世界最高レベルのWebアナリティクスAIエキスパートです。
-        Google Analytics Intelligence、Adobe Senseiを遥かに超える洞察力を持っています。
-        
-        あなたの能力：
-        - 複雑なデータパターンを瞬時に識別
-        - ビジネスインパクトを定量化
-        - 実行可能な改善提案を生成
-        - ROI予測の高精度計算
-        - 競合分析と市場トレンド把握
-        - ユーザー心理とビヘイビアの深層理解
-        
-        分析時の原則：
-        1. データドリブンな洞察提供
-        2. 実用的で具体的な提案
-        3. ビジネス価値への変換
-        4. 統計的根拠の明示
-        5. わかりやすい日本語での説明
-        """
-        
-        self.analysis_prompts = {
-            "comprehensive": ChatPromptTemplate.from_messages([
-                SystemMessagePromptTemplate.from_template(system_prompt),
-                HumanMessagePromptTemplate.from_template("""
-                サイト: {site_id}
-                期間: {date_range}
-                
-                分析データ:
-                {analytics_data}
-                
-                以下を包括的に分析してください：
-                1. 主要パフォーマンス指標の評価
-                2. ユーザーエンゲージメントの深層分析
-                3. コンバージョンファネルの最適化ポイント
-                4. 競合他社との差異化要因
-                5. 成長機会の特定
-                6. 具体的な改善アクション
-                7. ROI予測と投資優先度
-                
-                JSON形式で構造化された分析結果を返してください。
-                """)
-            ]),
-            
-            "anomaly_insight": ChatPromptTemplate.from_messages([
-                SystemMessagePromptTemplate.from_template(system_prompt),
-                HumanMessagePromptTemplate.from_template("""
-                異常値検知結果を分析し、ビジネスへの影響を評価してください。
-                
-                検知データ:
-                {anomaly_data}
-                
-                以下を分析：
-                1. 異常の根本原因
-                2. ビジネスへの影響度
-                3. 緊急対応の必要性
-                4. 今後の予防策
-                5. 類似パターンの予測
-                
-                緊急度とアクションプランを含めて回答してください。
-                """)
-            ]),
-            
-            "trend_prediction": ChatPromptTemplate.from_messages([
-                SystemMessagePromptTemplate.from_template(system_prompt),
-                HumanMessagePromptTemplate.from_template("""
-                トレンドデータを基に将来予測を行ってください。
-                
-                トレンドデータ:
-                {trend_data}
-                市場データ:
-                {market_data}
-                
-                分析内容：
-                1. トレンドの持続性評価
-                2. 外部要因の影響分析
-                3. 成長機会の予測
-                4. リスク要因の特定
-                5. 戦略的推奨事項
-                
-                30日、90日、365日の予測を含めてください。
-                """)
-            ]),
-            
-            "behavior_optimization": ChatPromptTemplate.from_messages([
-                SystemMessagePromptTemplate.from_template(system_prompt),
-                HumanMessagePromptTemplate.from_template("""
-                ユーザー行動データから最適化戦略を提案してください。
-                
-                行動データ:
-                {behavior_data}
-                セグメント情報:
-                {segment_data}
-                
-                最適化項目：
-                1. ユーザージャーニーの改善
-                2. UI/UXの最適化ポイント
-                3. コンテンツ戦略の提案
-                4. パーソナライゼーション機会
-                5. A/Bテスト推奨事項
-                
-                各提案に期待ROIを算出してください。
-                """)
-            ])
-        }
+        """分析用プロンプトの設定（モジュール読み込み時に構築済みのテンプレートを共有）"""
+        self.analysis_prompts = dict(ANALYSIS_PROMPTS)
 
     async def _setup_ml_models(self):
         """機械学習モデルの準備"""
@@ -276,7 +372,7 @@ class AIAnalyticsService:
             cached_data = await self._get_from_cache(cache_key)
             
             if cached_data:
-                return pd.read_json(cached_data)
+                return self._decode_frame_payload(cached_data)
             
             # メインバックエンドAPIから データ取得
             # 実装時は適切なAPIエンドポイントを呼び出す
@@ -291,8 +387,8 @@ class AIAnalyticsService:
             # データフレーム変換
             df = pd.DataFrame(raw_data)
             
-            # キャッシュ保存
-            await self._save_to_cache(cache_key, df.to_json(), ttl=3600)  # 1時間
+            # キャッシュ保存（dtypeを保持した列指向形式）
+            await self._save_frame_to_cache(cache_key, df, ttl=self.ANALYTICS_CACHE_TTL)
             
             return df
             
@@ -487,12 +583,7 @@ class AIAnalyticsService:
                 return parsed_result
             except json.JSONDecodeError:
                 # JSON形式でない場合はテキストとして処理
-                return {
-                    "insights_text": result,
-                    "recommendations": self._extract_recommendations(result),
-                    "roi_predictions": self._extract_roi_predictions(result),
-                    "next_steps": self._extract_next_steps(result)
-                }
+                return {"insights_text": result, **self._extract_all(result)}
                 
         except Exception as e:
             logger.error(f"AI洞察生成エラー: {e}")
@@ -541,27 +632,20 @@ class AIAnalyticsService:
     def _calculate_performance_score(self, metrics: Dict[str, float]) -> float:
         """パフォーマンススコア計算"""
         try:
-            # 業界標準値（サンプル）
-            benchmarks = {
-                "bounce_rate": 0.60,  # 低い方が良い
-                "conversion_rate": 0.03,  # 高い方が良い
-                "avg_session_duration": 120  # 高い方が良い（秒）
-            }
-            
-            scores = []
-            
-            for metric, value in metrics.items():
-                if metric in benchmarks:
-                    benchmark = benchmarks[metric]
-                    if metric == "bounce_rate":
-                        # 低い方が良いメトリクス
-                        score = max(0, (benchmark - value) / benchmark * 100)
-                    else:
-                        # 高い方が良いメトリクス
-                        score = min(100, (value / benchmark) * 100)
-                    scores.append(score)
-            
-            return np.mean(scores) if scores else 50.0
+            present = [i for i, metric in enumerate(self.SCORE_METRICS) if metric in metrics]
+            if not present:
+                return 50.0
+            
+            values = np.array([metrics[self.SCORE_METRICS[i]] for i in present], dtype=np.float64)
+            ratios = values / self.SCORE_BENCHMARKS[present]
+            
+            # 高い方が良いメトリクスは上限100、低い方が良いメトリクスは下限0
+            scores = np.where(
+                self.SCORE_HIGHER_IS_BETTER[present],
+                np.minimum(100, ratios * 100),
+                np.maximum(0, (1 - ratios) * 100)
+            )
+            return float(scores.mean())
             
         except Exception as e:
             logger.error(f"パフォーマンススコア計算エラー: {e}")
@@ -572,21 +656,40 @@ class AIAnalyticsService:
         try:
             insights = {}
             
-            numeric_columns = data.select_dtypes(include=[np.number]).columns
-            
-            for column in numeric_columns:
-                series = data[column].dropna()
-                if len(series) > 10:  # 最低10データポイント
-                    insights[column] = {
-                        "mean": float(series.mean()),
-                        "median": float(series.median()),
-                        "std": float(series.std()),
-                        "skewness": float(stats.skew(series)),
-                        "kurtosis": float(stats.kurtosis(series)),
-                        "trend": self._calculate_trend(series),
-                        "seasonality": self._detect_seasonality(series),
-                        "outliers": len(self._detect_outliers(series))
-                    }
+            # 最低10データポイントある数値列のみ対象
+            numeric = data.select_dtypes(include=[np.number])
+            counts = numeric.count()
+            numeric = numeric.loc[:, counts > 10]
+            if numeric.empty:
+                return insights
+            
+            # 要約統計量は全列まとめて計算（欠損は列ごとに除外）
+            values = numeric.to_numpy(dtype=np.float64)
+            moments = self._column_moments(values)
+            medians = np.nanmedian(values, axis=0)
+            outlier_counts = self._outlier_mask(values).sum(axis=0)
+            
+            # 欠損のない列のトレンドは1回の行列演算でまとめて計算
+            complete = [c for c in numeric.columns if counts[c] == len(numeric)]
+            trends, seasonalities = {}, {}
+            if complete:
+                complete_values = numeric[complete].to_numpy(dtype=np.float64)
+                trends = dict(zip(complete, self._linear_trend_batch(complete_values)))
+                if len(complete_values) >= 14:
+                    seasonalities = dict(zip(complete, self._seasonality_batch(complete_values)))
+            
+            for j, column in enumerate(numeric.columns):
+                series = numeric[column].dropna()
+                insights[column] = {
+                    "mean": float(moments["mean"][j]),
+                    "median": float(medians[j]),
+                    "std": float(moments["std"][j]),
+                    "skewness": float(moments["skewness"][j]),
+                    "kurtosis": float(moments["kurtosis"][j]),
+                    "trend": trends[column] if column in trends else self._calculate_trend(series),
+                    "seasonality": seasonalities[column] if column in seasonalities else self._detect_seasonality(series),
+                    "outliers": int(outlier_counts[j])
+                }
             
             return insights
             
@@ -594,55 +697,150 @@ class AIAnalyticsService:
             logger.error(f"統計分析エラー: {e}")
             return {}
 
+    def _column_moments(self, Y: np.ndarray) -> Dict[str, np.ndarray]:
+        """列ごとの平均・標準偏差・歪度・尖度を一括計算（NaNは列ごとに除外）"""
+        valid = ~np.isnan(Y)
+        n = valid.sum(axis=0)
+        mean = np.where(valid, Y, 0.0).sum(axis=0) / n
+        
+        # 中心化してから高次モーメントを計算（大きな値でも桁落ちしない）
+        centered = np.where(valid, Y - mean, 0.0)
+        sq = centered * centered
+        m2 = sq.sum(axis=0) / n
+        m3 = np.einsum('ij,ij->j', sq, centered) / n
+        m4 = np.einsum('ij,ij->j', sq, sq) / n
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(m2 * n / (n - 1))
+            # scipy.stats.skew / kurtosis の既定（偏りあり、Fisher定義）と同じ推定量
+            skewness = np.where(m2 > 0, m3 / m2 ** 1.5, np.nan)
+            kurtosis = np.where(m2 > 0, m4 / (m2 * m2) - 3.0, np.nan)
+        
+        return {"mean": mean, "std": std, "skewness": skewness, "kurtosis": kurtosis}
+
     def _calculate_trend(self, series: pd.Series) -> Dict[str, Any]:
         """トレンド計算"""
+        unknown = {"direction": "unknown", "slope": 0, "r_squared": 0, "significance": "unknown"}
+        if len(series) < 2 or not np.issubdtype(series.dtype, np.number):
+            return unknown
+        
         try:
-            x = np.arange(len(series))
-            slope, intercept, r_value, p_value, std_err = stats.linregress(x, series)
-            
-            return {
+            values = series.to_numpy(dtype=np.float64).reshape(-1, 1)
+            return self._linear_trend_batch(values)[0]
+        except (ValueError, FloatingPointError) as e:
+            logger.debug(f"トレンド計算エラー: {e}")
+            return unknown
+
+    def _linear_trend_batch(self, Y: np.ndarray) -> List[Dict[str, Any]]:
+        """列ごとの線形トレンドを一括計算（Y: n×k、閉形式の最小二乗）"""
+        n = Y.shape[0]
+        if n < 2:
+            raise ValueError("トレンド計算には2点以上のデータが必要です")
+        
+        x, sxx = _centered_time_index(n)
+        Yc = Y - Y.mean(axis=0)
+        
+        # 全列の共分散を1回の行列積で計算（時間軸と平方和は長さごとにキャッシュ）
+        sxy = x @ Yc
+        syy = np.einsum('ij,ij->j', Yc, Yc)
+        slopes = sxy / sxx
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = np.where(syy > 0, sxy / np.sqrt(sxx * syy), 0.0)
+            r = np.clip(r, -1.0, 1.0)
+            dof = n - 2
+            t = np.abs(r) * np.sqrt(dof / ((1.0 - r) * (1.0 + r)))
+            p_values = 2 * stats.t.sf(t, dof)
+        
+        return [
+            {
                 "direction": "increasing" if slope > 0 else "decreasing" if slope < 0 else "stable",
                 "slope": float(slope),
                 "r_squared": float(r_value ** 2),
                 "significance": "significant" if p_value < 0.05 else "not_significant"
             }
-        except Exception:
-            return {"direction": "unknown", "slope": 0, "r_squared": 0, "significance": "unknown"}
+            for slope, r_value, p_value in zip(slopes, r, p_values)
+        ]
 
     def _detect_seasonality(self, series: pd.Series) -> Dict[str, Any]:
         """季節性検出"""
+        # 最低2週間の数値データが必要
+        if len(series) < 14 or not np.issubdtype(series.dtype, np.number):
+            return {"detected": False}
+        
         try:
-            if len(series) < 14:  # 最低2週間のデータ
-                return {"detected": False}
-            
-            # 簡単な周期検出（実際の実装ではFFTやSTLを使用）
-            # 週次パターンの検出
-            weekly_pattern = np.corrcoef(series[:-7], series[7:])[0, 1] if len(series) >= 14 else 0
+            values = series.to_numpy(dtype=np.float64).reshape(-1, 1)
+            return self._seasonality_batch(values)[0]
+        except (ValueError, FloatingPointError) as e:
+            logger.debug(f"季節性検出エラー: {e}")
+            return {"detected": False}
+
+    def _seasonality_batch(self, Y: np.ndarray) -> List[Dict[str, Any]]:
+        """列ごとの季節性を一括検出（Y: n×k、FFTで支配的周期を推定）"""
+        n = Y.shape[0]
+        Yc = Y - Y.mean(axis=0)
+        
+        # 全列のパワースペクトルを1回のrfftで計算
+        power = np.abs(np.fft.rfft(Yc, axis=0)) ** 2
+        # 直流成分と1周期未満しか観測できない最低周波数は除外
+        candidates = power[2:]
+        total_power = candidates.sum(axis=0)
+        dominant_bins = candidates.argmax(axis=0) + 2
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            strengths = np.where(
+                total_power > 0,
+                power[dominant_bins, np.arange(Y.shape[1])] / total_power,
+                0.0
+            )
             
-            return {
-                "detected": weekly_pattern > 0.5,
-                "weekly_correlation": float(weekly_pattern),
-                "pattern_strength": "strong" if weekly_pattern > 0.7 else "moderate" if weekly_pattern > 0.5 else "weak"
+            # 週次パターン（7点ラグの自己相関）
+            head = Yc[:-7] - Yc[:-7].mean(axis=0)
+            tail = Yc[7:] - Yc[7:].mean(axis=0)
+            weekly = np.einsum('ij,ij->j', head, tail) / np.sqrt(
+                np.einsum('ij,ij->j', head, head) * np.einsum('ij,ij->j', tail, tail)
+            )
+        
+        # Fisherのg検定（第1項近似）: 白色雑音で最大ピークが占有率gを超える確率
+        m = candidates.shape[0]
+        p_values = np.minimum(1.0, m * (1.0 - strengths) ** (m - 1))
+        periods = _fft_bin_periods(n)[dominant_bins]
+        alpha = self.SEASONALITY_SIGNIFICANCE
+        
+        return [
+            {
+                "detected": bool(p_value < alpha),
+                "period": int(round(period)) if strength > 0 else 0,
+                "spectral_strength": float(strength),
+                "weekly_correlation": float(weekly_correlation),
+                "pattern_strength": "strong" if p_value < alpha / 50 else "moderate" if p_value < alpha else "weak"
             }
-        except Exception:
-            return {"detected": False}
+            for strength, p_value, period, weekly_correlation in zip(strengths, p_values, periods, weekly)
+        ]
 
     def _detect_outliers(self, series: pd.Series) -> List[int]:
         """外れ値検出"""
+        if series.empty or not np.issubdtype(series.dtype, np.number):
+            return []
+        
         try:
-            Q1 = series.quantile(0.25)
-            Q3 = series.quantile(0.75)
-            IQR = Q3 - Q1
-            
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            
-            outliers = series[(series < lower_bound) | (series > upper_bound)]
-            return outliers.index.tolist()
-            
-        except Exception:
+            mask = self._outlier_mask(series.to_numpy(dtype=np.float64).reshape(-1, 1))
+            return series.index[mask[:, 0]].tolist()
+        except (ValueError, FloatingPointError) as e:
+            logger.debug(f"外れ値検出エラー: {e}")
             return []
 
+    def _outlier_mask(self, Y: np.ndarray) -> np.ndarray:
+        """IQR法による外れ値マスク（Y: n×k、NaNは外れ値としない）"""
+        # 四分位点は列ごとに選択アルゴリズムで1回だけ計算
+        quantile = np.nanquantile if np.isnan(Y).any() else np.quantile
+        q1, q3 = quantile(Y, [0.25, 0.75], axis=0)
+        iqr = q3 - q1
+        
+        lower_bound = q1 - 1.5 * iqr
+        upper_bound = q3 + 1.5 * iqr
+        return (Y < lower_bound) | (Y > upper_bound)
+
     async def _get_from_cache(self, key: str) -> Optional[str]:
         """キャッシュから取得"""
         try:
@@ -660,6 +858,84 @@ class AIAnalyticsService:
         except Exception as e:
             logger.warning(f"キャッシュ保存エラー: {e}")
 
+    async def _save_frame_to_cache(self, key: str, df: pd.DataFrame, ttl: int):
+        """DataFrameをキャッシュに保存（シリアライズ失敗時は保存しない）"""
+        try:
+            payload = self._encode_frame_payload(df)
+        except (TypeError, ValueError, orjson.JSONEncodeError) as e:
+            logger.warning(f"キャッシュ保存エラー: {e}")
+            return
+        await self._save_to_cache(key, payload, ttl)
+
+    def _encode_frame_payload(self, df: pd.DataFrame) -> bytes:
+        """DataFrameを列ごとのdtype付きでJSON化して圧縮（数値列はNumPy配列のまま直列化）"""
+        frame = {
+            "columns": [str(name) for name in df.columns],
+            "data": [self._encode_frame_column(df[name]) for name in df.columns],
+            "index": None if isinstance(df.index, pd.RangeIndex) else self._encode_frame_column(df.index),
+            "index_name": df.index.name
+        }
+        payload = orjson.dumps(
+            frame,
+            default=self._frame_payload_default,
+            option=orjson.OPT_SERIALIZE_NUMPY
+        )
+        return self.FRAME_PAYLOAD_PREFIX + zlib.compress(payload, 3)
+
+    def _encode_frame_column(self, column) -> Dict[str, Any]:
+        """列（またはインデックス）をdtype名と値に変換"""
+        dtype = column.dtype
+        if dtype.kind in "biuf":
+            data = np.ascontiguousarray(column.to_numpy())
+        elif dtype.kind == "M":
+            # 日時はUTCのエポックナノ秒（NaTはint64最小値）で保持
+            data = column.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        else:
+            data = column.tolist()
+        return {"dtype": str(dtype), "data": data}
+
+    @staticmethod
+    def _frame_payload_default(obj: Any) -> Any:
+        """orjsonが直接扱えない値の変換"""
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, pd.Timestamp):
+            return obj.isoformat()
+        raise TypeError(f"シリアライズできない型です: {type(obj).__name__}")
+
+    def _decode_frame_payload(self, payload) -> pd.DataFrame:
+        """キャッシュからDataFrameを復元（旧形式のpandas JSONにも対応）"""
+        if isinstance(payload, str):
+            return pd.read_json(io.StringIO(payload))
+        if not payload.startswith(self.FRAME_PAYLOAD_PREFIX):
+            return pd.read_json(io.StringIO(payload.decode()))
+        
+        frame = orjson.loads(zlib.decompress(payload[len(self.FRAME_PAYLOAD_PREFIX):]))
+        data = {
+            name: self._decode_frame_column(column)
+            for name, column in zip(frame["columns"], frame["data"])
+        }
+        df = pd.DataFrame(data)
+        if frame["index"] is not None:
+            df.index = pd.Index(self._decode_frame_column(frame["index"]), name=frame.get("index_name"))
+        return df
+
+    def _decode_frame_column(self, column: Dict[str, Any]):
+        """dtype名と値から列を復元"""
+        dtype = pd.api.types.pandas_dtype(column["dtype"])
+        if dtype.kind == "M":
+            values = pd.Series(np.asarray(column["data"], dtype=np.int64).view("datetime64[ns]"))
+            if isinstance(dtype, pd.DatetimeTZDtype):
+                return values.dt.tz_localize("UTC").dt.tz_convert(dtype.tz).astype(dtype)
+            return values.astype(dtype)
+        if dtype.kind in "biuf":
+            return pd.Series(np.asarray(column["data"], dtype=dtype))
+        if dtype == object:
+            return pd.Series(column["data"], dtype=object)
+        return pd.Series(column["data"]).astype(dtype)
+
     async def _call_main_backend_api(self, endpoint: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
         """メインバックエンドAPI呼び出し"""
         import httpx
@@ -689,23 +965,7 @@ class AIAnalyticsService:
             if isinstance(end_date, str):
                 end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
             
-            days = (end_date - start_date).days
-            dates = pd.date_range(start=start_date, end=end_date, freq='D')
-            
-            # リアルなサンプルデータ生成
-            np.random.seed(42)
-            data = {
-                "date": dates[:days],
-                "page_views": np.random.poisson(1000, days) + np.sin(np.arange(days) * 2 * np.pi / 7) * 200,
-                "unique_visitors": np.random.poisson(400, days) + np.sin(np.arange(days) * 2 * np.pi / 7) * 80,
-                "sessions": np.random.poisson(600, days),
-                "bounce_rate": np.random.beta(2, 3, days),
-                "avg_session_duration": np.random.gamma(2, 60, days),
-                "conversions": np.random.poisson(20, days),
-                "revenue": np.random.gamma(2, 500, days)
-            }
-            
-            return pd.DataFrame(data)
+            return _sample_analytics_data(start_date, end_date)
             
         except Exception as e:
             logger.error(f"サンプルデータ生成エラー: {e}")
@@ -744,53 +1004,55 @@ class AIAnalyticsService:
 
     def _identify_performance_alerts(self, metrics: Dict[str, float]) -> List[Dict[str, Any]]:
         """パフォーマンスアラート識別"""
-        alerts = []
-        
-        if metrics.get("bounce_rate", 0) > 0.70:
-            alerts.append({
-                "type": "high_bounce_rate",
-                "severity": "high",
-                "message": "直帰率が70%を超えています",
-                "recommendation": "ランディングページの改善を検討してください"
-            })
-        
-        if metrics.get("conversion_rate", 0) < 0.01:
-            alerts.append({
-                "type": "low_conversion_rate",
-                "severity": "medium", 
-                "message": "コンバージョン率が1%を下回っています",
-                "recommendation": "コンバージョンファネルの最適化が必要です"
-            })
-        
-        return alerts
+        values = np.array([metrics.get(metric, 0) for metric in self.ALERT_METRICS], dtype=np.float64)
+        triggered = np.where(
+            self.ALERT_ABOVE,
+            values > self.ALERT_THRESHOLDS,
+            values < self.ALERT_THRESHOLDS
+        )
+        return [dict(self.ALERT_DEFINITIONS[i]) for i in np.flatnonzero(triggered)]
+
+    def _extract_all(self, text: str) -> Dict[str, Any]:
+        """テキストから推奨事項・ROI予測・次のステップを1回の走査で抽出"""
+        # 簡単な実装（実際にはより高度な自然言語処理を使用）
+        buckets = self._scan_insight_lines(text)
+        return {
+            "recommendations": buckets["recommendations"],
+            "roi_predictions": self._extract_roi_predictions(text),
+            "next_steps": buckets["next_steps"]
+        }
+
+    def _scan_insight_lines(self, text: str) -> Dict[str, List[str]]:
+        """各行をキーワード種別ごとに振り分け（種別ごとの上限に達したら走査終了）"""
+        buckets = {tag: [] for tag in self.INSIGHT_LINE_LIMITS}
+        remaining = len(buckets)
+        for line in text.split('\n'):
+            tags = {match.lastgroup for match in _INSIGHT_LINE_PATTERN.finditer(line.lower())}
+            for tag in tags:
+                bucket = buckets[tag]
+                if len(bucket) < self.INSIGHT_LINE_LIMITS[tag]:
+                    bucket.append(line.strip())
+                    if len(bucket) == self.INSIGHT_LINE_LIMITS[tag]:
+                        remaining -= 1
+            if remaining == 0:
+                break
+        return buckets
 
     def _extract_recommendations(self, text: str) -> List[str]:
         """テキストから推奨事項を抽出"""
-        # 簡単な実装（実際にはより高度な自然言語処理を使用）
-        recommendations = []
-        lines = text.split('\n')
-        for line in lines:
-            if any(keyword in line.lower() for keyword in ['推奨', '提案', '改善', 'おすすめ']):
-                recommendations.append(line.strip())
-        return recommendations[:5]  # 最大5個
+        return self._scan_insight_lines(text)["recommendations"]
 
     def _extract_roi_predictions(self, text: str) -> Dict[str, float]:
         """テキストからROI予測を抽出"""
-        # 簡単な実装
-        import re
-        roi_matches = re.findall(r'ROI.*?(\d+(?:\.\d+)?)%', text)
-        if roi_matches:
-            return {"predicted_roi": float(roi_matches[0]) / 100}
+        # 簡単な実装（最初の一致のみ使用）
+        roi_match = _ROI_PATTERN.search(text)
+        if roi_match:
+            return {"predicted_roi": float(roi_match.group(1)) / 100}
         return {}
 
     def _extract_next_steps(self, text: str) -> List[str]:
         """テキストから次のステップを抽出"""
-        next_steps = []
-        lines = text.split('\n')
-        for line in lines:
-            if any(keyword in line.lower() for keyword in ['次に', 'ステップ', 'アクション']):
-                next_steps.append(line.strip())
-        return next_steps[:3]  # 最大3個
+        return self._scan_insight_lines(text)["next_steps"]
 
     # 追加の分析メソッド（簡略実装）
     async def _analyze_engagement_segments(self, data: pd.DataFrame) -> Dict[str, Any]:
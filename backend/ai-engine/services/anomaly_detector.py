@@ -5,15 +5,16 @@
 import asyncio
 import logging
 import json
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import DBSCAN
 from sklearn.decomposition import PCA
-from scipy import stats
 import redis
 from config.settings import Settings
 from models.schemas import AnomalyData, AlertSeverity
@@ -23,6 +24,62 @@ logger = logging.getLogger(__name__)
 class AnomalyDetectorService:
     """異常値検知サービス"""
     
+    # 重複除去時の重要度比較に使う重要度の序列
+    SEVERITY_ORDER = {
+        AlertSeverity.CRITICAL: 4,
+        AlertSeverity.HIGH: 3,
+        AlertSeverity.MEDIUM: 2,
+        AlertSeverity.LOW: 1
+    }
+    
+    # ランキング用の重要度・メトリクス重み
+    SEVERITY_WEIGHTS = {
+        AlertSeverity.CRITICAL: 1.0,
+        AlertSeverity.HIGH: 0.8,
+        AlertSeverity.MEDIUM: 0.6,
+        AlertSeverity.LOW: 0.4
+    }
+    METRIC_WEIGHTS = {
+        'revenue': 1.0,
+        'conversion_rate': 0.9,
+        'page_views': 0.8,
+        'unique_visitors': 0.8,
+        'bounce_rate': 0.7,
+        'avg_session_duration': 0.6
+    }
+    MAX_RANKED_ANOMALIES = 50
+    
+    # 連続性（急激な変化）検知で比較する直前ウィンドウの長さ（24時間）
+    CONTINUITY_WINDOW = 24
+    # 連続性検知のロバストZ-score閾値（直前ウィンドウの中央値・MAD基準）
+    CONTINUITY_Z_THRESHOLD = 5.0
+    # 正規分布でMADを標準偏差に換算する係数
+    MAD_TO_STD = 1.4826
+    
+    # 重要度別内訳のキー（レスポンスのキー順）
+    SEVERITY_BREAKDOWN_KEYS = ('critical', 'high', 'medium', 'low')
+    
+    # 検知手法ごとの重要度境界（昇順、境界値以上で1段階上がる）と対応する重要度
+    SEVERITY_BREAKPOINTS = {
+        'z_score': (
+            np.array([2.5, 3.0, 4.0]),
+            (AlertSeverity.LOW, AlertSeverity.MEDIUM, AlertSeverity.HIGH, AlertSeverity.CRITICAL)
+        ),
+        'iqr': (
+            np.array([2.0, 3.0]),
+            (AlertSeverity.LOW, AlertSeverity.MEDIUM, AlertSeverity.HIGH)
+        ),
+        'anomaly_score': (
+            np.array([0.4, 0.6, 0.8]),
+            (AlertSeverity.LOW, AlertSeverity.MEDIUM, AlertSeverity.HIGH, AlertSeverity.CRITICAL)
+        ),
+        # 連続性検知のロバストZ-scoreは閾値自体が高いため、境界も引き上げる
+        'continuity': (
+            np.array([8.0, 12.0, 20.0]),
+            (AlertSeverity.LOW, AlertSeverity.MEDIUM, AlertSeverity.HIGH, AlertSeverity.CRITICAL)
+        )
+    }
+    
     def __init__(self, settings: Settings):
         self.settings = settings
         self.redis_client = None
@@ -30,6 +87,8 @@ class AnomalyDetectorService:
         self.scalers = {}
         self.thresholds = {}
         self.historical_patterns = {}
+        # サイト・メトリクスごとのストリーミング基準統計（件数・平均・偏差平方和）
+        self.baselines = {}
         
     async def initialize(self):
         """サービス初期化"""
@@ -55,11 +114,12 @@ class AnomalyDetectorService:
     async def _initialize_models(self):
         """異常検知モデル初期化"""
         try:
-            # Isolation Forest - 一般的な異常検知
+            # Isolation Forest - 一般的な異常検知（並列数は設定値。複数ワーカーでの過剰並列を避け既定は1）
             self.models['isolation_forest'] = IsolationForest(
                 contamination=self.settings.anomaly_sensitivity,
                 random_state=42,
-                n_estimators=100
+                n_estimators=100,
+                n_jobs=self.settings.anomaly_n_jobs
             )
             
             # DBSCAN - クラスタベース異常検知
@@ -236,6 +296,8 @@ class AnomalyDetectorService:
         """統計的異常検知"""
         try:
             anomalies = []
+            timestamps = data['timestamp'] if 'timestamp' in data.columns else None
+            multiplier = self.models['statistical']['iqr_multiplier']
             
             for metric in metrics:
                 if metric not in data.columns:
@@ -245,61 +307,73 @@ class AnomalyDetectorService:
                 if len(series) < self.settings.anomaly_min_data_points:
                     continue
                 
-                # Z-score異常検知
-                z_scores = np.abs(stats.zscore(series))
+                values = series.to_numpy(dtype=np.float64)
+                series_mean = float(series.mean())
+                
+                # Z-score異常検知（全点のスコアを一括計算）
+                z_scores = np.abs(self._calculate_z_scores(values))
                 z_threshold = self.thresholds['metrics'].get(metric, {}).get('z_score', 3.0)
-                z_anomalies = np.where(z_scores > z_threshold)[0]
+                z_anomalies = np.flatnonzero(z_scores > z_threshold)
+                
+                if z_anomalies.size:
+                    z_context = {
+                        'detection_method': 'z_score',
+                        'threshold': z_threshold,
+                        'series_std': float(series.std()),
+                        'series_mean': series_mean
+                    }
                 
-                for idx in z_anomalies:
+                z_severities = self._calculate_severities(z_scores[z_anomalies], 'z_score')
+                for idx, severity in zip(z_anomalies, z_severities):
                     anomaly = AnomalyData(
                         metric_name=metric,
-                        timestamp=data.iloc[idx]['timestamp'] if 'timestamp' in data.columns else datetime.utcnow(),
-                        expected_value=float(series.mean()),
-                        actual_value=float(series.iloc[idx]),
+                        timestamp=timestamps.iloc[idx] if timestamps is not None else datetime.utcnow(),
+                        expected_value=series_mean,
+                        actual_value=float(values[idx]),
                         deviation_score=float(z_scores[idx]),
-                        severity=self._calculate_severity(z_scores[idx], 'z_score'),
+                        severity=severity,
                         confidence=min(0.95, z_scores[idx] / 5.0),
-                        context={
-                            'detection_method': 'z_score',
-                            'threshold': z_threshold,
-                            'series_std': float(series.std()),
-                            'series_mean': float(series.mean())
-                        }
+                        context=z_context
                     )
                     anomalies.append(anomaly)
                 
-                # IQR異常検知
-                Q1 = series.quantile(0.25)
-                Q3 = series.quantile(0.75)
+                # IQR異常検知（境界外の点と逸脱度を一括計算）
+                Q1, Q3, lower_bound, upper_bound = self._iqr_bounds(values, multiplier)
                 IQR = Q3 - Q1
-                multiplier = self.models['statistical']['iqr_multiplier']
-                
-                lower_bound = Q1 - multiplier * IQR
-                upper_bound = Q3 + multiplier * IQR
-                
-                iqr_anomalies = series[(series < lower_bound) | (series > upper_bound)]
+                iqr_positions = np.flatnonzero((values < lower_bound) | (values > upper_bound))
                 
-                for idx, value in iqr_anomalies.items():
-                    deviation = min(abs(value - lower_bound), abs(value - upper_bound)) / IQR
+                if iqr_positions.size:
+                    outlier_values = values[iqr_positions]
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        deviations = np.minimum(
+                            np.abs(outlier_values - lower_bound),
+                            np.abs(outlier_values - upper_bound)
+                        ) / IQR
+                    iqr_context = {
+                        'detection_method': 'iqr',
+                        'q1': float(Q1),
+                        'q3': float(Q3),
+                        'iqr': float(IQR),
+                        'lower_bound': float(lower_bound),
+                        'upper_bound': float(upper_bound)
+                    }
+                    series_median = float(np.median(values))
+                    labels = series.index[iqr_positions]
                     
-                    anomaly = AnomalyData(
-                        metric_name=metric,
-                        timestamp=data.iloc[idx]['timestamp'] if 'timestamp' in data.columns else datetime.utcnow(),
-                        expected_value=float(series.median()),
-                        actual_value=float(value),
-                        deviation_score=float(deviation),
-                        severity=self._calculate_severity(deviation, 'iqr'),
-                        confidence=min(0.90, deviation / 3.0),
-                        context={
-                            'detection_method': 'iqr',
-                            'q1': float(Q1),
-                            'q3': float(Q3),
-                            'iqr': float(IQR),
-                            'lower_bound': float(lower_bound),
-                            'upper_bound': float(upper_bound)
-                        }
-                    )
-                    anomalies.append(anomaly)
+                    iqr_severities = self._calculate_severities(deviations, 'iqr')
+                    
+                    for idx, value, deviation, severity in zip(labels, outlier_values, deviations, iqr_severities):
+                        anomaly = AnomalyData(
+                            metric_name=metric,
+                            timestamp=timestamps.iloc[idx] if timestamps is not None else datetime.utcnow(),
+                            expected_value=series_median,
+                            actual_value=float(value),
+                            deviation_score=float(deviation),
+                            severity=severity,
+                            confidence=min(0.90, deviation / 3.0),
+                            context=iqr_context
+                        )
+                        anomalies.append(anomaly)
             
             return anomalies
             
@@ -307,6 +381,19 @@ class AnomalyDetectorService:
             logger.error(f"統計的異常検知エラー: {e}")
             return []
 
+    def _calculate_z_scores(self, values: np.ndarray) -> np.ndarray:
+        """Z-score（母標準偏差基準、定数系列はNaN）"""
+        mean = values.mean()
+        std = values.std()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (values - mean) / std
+
+    def _iqr_bounds(self, values: np.ndarray, multiplier: float) -> Tuple[float, float, float, float]:
+        """四分位点とIQR法の下限・上限"""
+        Q1, Q3 = np.quantile(values, (0.25, 0.75))
+        IQR = Q3 - Q1
+        return Q1, Q3, Q1 - multiplier * IQR, Q3 + multiplier * IQR
+
     async def _detect_ml_anomalies(
         self, 
         data: pd.DataFrame, 
@@ -323,36 +410,42 @@ class AnomalyDetectorService:
                 return anomalies
             
             # データ正規化
-            scaled_data = self.scalers['standard'].fit_transform(numeric_data)
-            
-            # Isolation Forest
-            isolation_forest = self.models['isolation_forest']
-            anomaly_scores = isolation_forest.fit_predict(scaled_data)
-            outlier_scores = isolation_forest.score_samples(scaled_data)
+            values = numeric_data.to_numpy(dtype=np.float64)
+            scaled_data = self.scalers['standard'].fit_transform(values)
+            
+            # Isolation Forest（木はfloat32で扱うため、学習・予測・スコアで毎回変換せず1回だけ変換）
+            forest_input = np.ascontiguousarray(scaled_data, dtype=np.float32)
+            outlier_scores = self._score_isolation_forest(forest_input)
+            
+            # 異常点を特定（学習済みスコアを感度で閾値処理するだけなので再学習・再予測は不要）
+            anomaly_indices = self._apply_threshold(outlier_scores, self.settings.anomaly_sensitivity)
+            
+            # 行ごとの再計算を避けるため、列統計と全点のZ-score行列を1回だけ計算
+            column_positions = {column: j for j, column in enumerate(numeric_data.columns)}
+            abs_z_scores = self._abs_z_score_matrix(values)
+            timestamps = data['timestamp'] if 'timestamp' in data.columns else None
+            affected_metrics = [m for m in metrics if m in column_positions]
+            column_means = numeric_data.mean()
+            most_anomalous_metrics = self._find_most_anomalous_metrics(
+                abs_z_scores[anomaly_indices], column_positions, metrics
+            )
             
-            # 異常点を特定
-            anomaly_indices = np.where(anomaly_scores == -1)[0]
+            forest_severities = self._calculate_severities(np.abs(outlier_scores[anomaly_indices]), 'anomaly_score')
             
-            for idx in anomaly_indices:
-                # 最も異常なメトリクスを特定
-                row_data = numeric_data.iloc[idx]
-                most_anomalous_metric = self._find_most_anomalous_metric(
-                    row_data, numeric_data, metrics
-                )
-                
+            for idx, most_anomalous_metric, severity in zip(anomaly_indices, most_anomalous_metrics, forest_severities):
                 anomaly = AnomalyData(
                     metric_name=most_anomalous_metric,
-                    timestamp=data.iloc[idx]['timestamp'] if 'timestamp' in data.columns else datetime.utcnow(),
-                    expected_value=float(numeric_data[most_anomalous_metric].mean()),
-                    actual_value=float(row_data[most_anomalous_metric]),
+                    timestamp=timestamps.iloc[idx] if timestamps is not None else datetime.utcnow(),
+                    expected_value=float(column_means[most_anomalous_metric]),
+                    actual_value=float(values[idx, column_positions[most_anomalous_metric]]),
                     deviation_score=abs(float(outlier_scores[idx])),
-                    severity=self._calculate_severity_from_score(outlier_scores[idx]),
+                    severity=severity,
                     confidence=min(0.95, abs(outlier_scores[idx]) * 2),
                     context={
                         'detection_method': 'isolation_forest',
                         'anomaly_score': float(outlier_scores[idx]),
                         'contamination': self.settings.anomaly_sensitivity,
-                        'affected_metrics': [m for m in metrics if m in row_data.index]
+                        'affected_metrics': affected_metrics
                     }
                 )
                 anomalies.append(anomaly)
@@ -365,17 +458,17 @@ class AnomalyDetectorService:
                 # ノイズ（クラスタに属さない点）を異常とする
                 noise_indices = np.where(cluster_labels == -1)[0]
                 
-                for idx in noise_indices:
-                    row_data = numeric_data.iloc[idx]
-                    most_anomalous_metric = self._find_most_anomalous_metric(
-                        row_data, numeric_data, metrics
-                    )
-                    
+                column_medians = numeric_data.median()
+                noise_metrics = self._find_most_anomalous_metrics(
+                    abs_z_scores[noise_indices], column_positions, metrics
+                )
+                
+                for idx, most_anomalous_metric in zip(noise_indices, noise_metrics):
                     anomaly = AnomalyData(
                         metric_name=most_anomalous_metric,
-                        timestamp=data.iloc[idx]['timestamp'] if 'timestamp' in data.columns else datetime.utcnow(),
-                        expected_value=float(numeric_data[most_anomalous_metric].median()),
-                        actual_value=float(row_data[most_anomalous_metric]),
+                        timestamp=timestamps.iloc[idx] if timestamps is not None else datetime.utcnow(),
+                        expected_value=float(column_medians[most_anomalous_metric]),
+                        actual_value=float(values[idx, column_positions[most_anomalous_metric]]),
                         deviation_score=2.0,  # DBSCAN用固定スコア
                         severity=AlertSeverity.MEDIUM,
                         confidence=0.80,
@@ -470,67 +563,59 @@ class AnomalyDetectorService:
             logger.error(f"文脈的異常検知エラー: {e}")
             return []
 
+    def _score_isolation_forest(self, forest_input: np.ndarray) -> np.ndarray:
+        """Isolation Forestを1回だけ学習し、学習データの異常スコア（score_samples）を返す"""
+        isolation_forest = self.models['isolation_forest']
+        isolation_forest.fit(forest_input)
+        return isolation_forest.score_samples(forest_input)
+
+    def _apply_threshold(self, scores: np.ndarray, sensitivity: float) -> np.ndarray:
+        """異常スコアの下位sensitivity割合を異常とする（IsolationForestのcontamination判定と同じ閾値）"""
+        threshold = np.percentile(scores, 100.0 * sensitivity)
+        return np.flatnonzero(scores < threshold)
+
     def _calculate_severity(self, score: float, method: str) -> AlertSeverity:
-        """重要度計算"""
+        """単一スコアの重要度計算（リアルタイム判定用。境界はSEVERITY_BREAKPOINTSを共有）"""
+        return self._calculate_severities([score], method)[0]
+
+    def _calculate_severities(self, scores, method: str) -> List[AlertSeverity]:
+        """重要度の一括計算（境界配列への二分探索、NaNは最低重要度）"""
         try:
-            if method == 'z_score':
-                if score >= 4.0:
-                    return AlertSeverity.CRITICAL
-                elif score >= 3.0:
-                    return AlertSeverity.HIGH
-                elif score >= 2.5:
-                    return AlertSeverity.MEDIUM
-                else:
-                    return AlertSeverity.LOW
-            elif method == 'iqr':
-                if score >= 3.0:
-                    return AlertSeverity.HIGH
-                elif score >= 2.0:
-                    return AlertSeverity.MEDIUM
-                else:
-                    return AlertSeverity.LOW
-            else:
-                return AlertSeverity.MEDIUM
+            if method not in self.SEVERITY_BREAKPOINTS:
+                return [AlertSeverity.MEDIUM] * len(scores)
+            
+            breakpoints, levels = self.SEVERITY_BREAKPOINTS[method]
+            scores = np.asarray(scores, dtype=np.float64)
+            positions = np.searchsorted(breakpoints, scores, side='right')
+            positions[np.isnan(scores)] = 0
+            return [levels[i] for i in positions]
                 
-        except Exception:
-            return AlertSeverity.MEDIUM
-
-    def _calculate_severity_from_score(self, score: float) -> AlertSeverity:
-        """スコアから重要度計算"""
-        abs_score = abs(score)
-        if abs_score >= 0.8:
-            return AlertSeverity.CRITICAL
-        elif abs_score >= 0.6:
-            return AlertSeverity.HIGH
-        elif abs_score >= 0.4:
-            return AlertSeverity.MEDIUM
-        else:
-            return AlertSeverity.LOW
-
-    def _find_most_anomalous_metric(
+        except (TypeError, ValueError):
+            return [AlertSeverity.MEDIUM] * len(scores)
+
+    def _abs_z_score_matrix(self, values: np.ndarray) -> np.ndarray:
+        """列ごとの絶対Z-score行列（不偏標準偏差基準）"""
+        if len(values) < 2:
+            return np.full(values.shape, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.abs((values - values.mean(axis=0)) / values.std(axis=0, ddof=1))
+
+    def _find_most_anomalous_metrics(
         self, 
-        row_data: pd.Series, 
-        full_data: pd.DataFrame, 
+        abs_z_scores: np.ndarray, 
+        column_positions: Dict[str, int], 
         metrics: List[str]
-    ) -> str:
-        """最も異常なメトリクスを特定"""
-        try:
-            max_z_score = 0
-            most_anomalous = metrics[0]
-            
-            for metric in metrics:
-                if metric in row_data.index and metric in full_data.columns:
-                    series = full_data[metric].dropna()
-                    if len(series) > 1:
-                        z_score = abs((row_data[metric] - series.mean()) / series.std())
-                        if z_score > max_z_score:
-                            max_z_score = z_score
-                            most_anomalous = metric
-            
-            return most_anomalous
-            
-        except Exception:
-            return metrics[0] if metrics else "unknown"
+    ) -> List[str]:
+        """各行で最も異常なメトリクスを一括特定（Z-scoreが正の列がなければ先頭メトリクス）"""
+        candidates = [m for m in metrics if m in column_positions]
+        if not candidates:
+            return [metrics[0] if metrics else "unknown"] * len(abs_z_scores)
+        
+        scores = abs_z_scores[:, [column_positions[m] for m in candidates]]
+        scores = np.where(np.isnan(scores), -np.inf, scores)
+        best = scores.argmax(axis=1)
+        has_positive = scores[np.arange(len(scores)), best] > 0
+        return [candidates[j] if positive else metrics[0] for j, positive in zip(best, has_positive)]
 
     async def _rank_and_deduplicate_anomalies(
         self, 
@@ -542,111 +627,168 @@ class AnomalyDetectorService:
             if not anomalies:
                 return []
             
-            # 重複除去（同じメトリクス・時間帯の異常）
-            unique_anomalies = {}
-            for anomaly in anomalies:
-                key = f"{anomaly.metric_name}_{anomaly.timestamp.strftime('%Y%m%d%H')}"
-                
-                if key not in unique_anomalies:
-                    unique_anomalies[key] = anomaly
-                else:
-                    # より重要度の高い異常を保持
-                    existing = unique_anomalies[key]
-                    if self._compare_anomaly_importance(anomaly, existing) > 0:
-                        unique_anomalies[key] = anomaly
+            # 候補の属性を列指向の配列にまとめ、比較・重要度スコアを一括計算
+            severity = [anomaly.severity for anomaly in anomalies]
+            severity_rank = np.array([self.SEVERITY_ORDER.get(s, 0) for s in severity], dtype=np.float64)
+            severity_weight = np.array([self.SEVERITY_WEIGHTS.get(s, 0.5) for s in severity], dtype=np.float64)
+            metric_weight = np.array(
+                [self.METRIC_WEIGHTS.get(anomaly.metric_name, 0.5) for anomaly in anomalies],
+                dtype=np.float64
+            )
+            confidence = np.array([anomaly.confidence for anomaly in anomalies], dtype=np.float64)
+            deviation = np.array([anomaly.deviation_score for anomaly in anomalies], dtype=np.float64)
             
-            # 重要度スコア計算とランキング
-            ranked_anomalies = list(unique_anomalies.values())
-            for anomaly in ranked_anomalies:
-                anomaly.importance_score = self._calculate_importance_score(anomaly)
+            compare_scores = severity_rank * confidence * deviation
+            importance_scores = (
+                severity_weight * 0.4 +
+                confidence * 0.3 +
+                metric_weight * 0.2 +
+                np.minimum(deviation / 5.0, 1.0) * 0.1
+            )
             
-            # 重要度順でソート
-            ranked_anomalies.sort(key=lambda x: x.importance_score, reverse=True)
+            # 重複除去（同じメトリクス・時間帯の異常はより重要度の高いものを保持）
+            # 時間帯キーは文字列整形せず、日時フィールドのタプルで作る
+            best_positions = {}
+            for i, anomaly in enumerate(anomalies):
+                ts = anomaly.timestamp
+                key = (anomaly.metric_name, ts.year, ts.month, ts.day, ts.hour)
+                
+                existing = best_positions.get(key)
+                if existing is None or compare_scores[i] > compare_scores[existing]:
+                    best_positions[key] = i
             
-            # 上位N件のみ返す
-            max_anomalies = 50
-            return ranked_anomalies[:max_anomalies]
+            # 重要度順でソート（同点は出現順）し、上位N件のみ返す
+            kept = np.fromiter(best_positions.values(), dtype=np.intp, count=len(best_positions))
+            order = kept[np.argsort(-importance_scores[kept], kind='stable')]
+            return [anomalies[i] for i in order[:self.MAX_RANKED_ANOMALIES]]
             
         except Exception as e:
             logger.error(f"異常値ランキングエラー: {e}")
             return anomalies[:20]  # フォールバック
 
-    def _compare_anomaly_importance(self, anomaly1: AnomalyData, anomaly2: AnomalyData) -> int:
-        """異常値の重要度比較"""
+    def get_severity_breakdown(self, anomalies: List[AnomalyData]) -> Dict[str, int]:
+        """重要度別内訳取得"""
         try:
-            severity_order = {
-                AlertSeverity.CRITICAL: 4,
-                AlertSeverity.HIGH: 3,
-                AlertSeverity.MEDIUM: 2,
-                AlertSeverity.LOW: 1
-            }
-            
-            score1 = severity_order.get(anomaly1.severity, 0) * anomaly1.confidence * anomaly1.deviation_score
-            score2 = severity_order.get(anomaly2.severity, 0) * anomaly2.confidence * anomaly2.deviation_score
+            # 固定キーの辞書を1回で作り、件数はCounterでまとめて加算
+            breakdown = dict.fromkeys(self.SEVERITY_BREAKDOWN_KEYS, 0)
+            breakdown.update(Counter(anomaly.severity.value for anomaly in anomalies))
+            return breakdown
             
-            if score1 > score2:
-                return 1
-            elif score1 < score2:
-                return -1
-            else:
-                return 0
-                
-        except Exception:
-            return 0
+        except Exception as e:
+            logger.error(f"重要度別内訳計算エラー: {e}")
+            return dict.fromkeys(self.SEVERITY_BREAKDOWN_KEYS, 0)
 
-    def _calculate_importance_score(self, anomaly: AnomalyData) -> float:
-        """重要度スコア計算"""
+    async def update_baseline(
+        self, 
+        data: pd.DataFrame, 
+        site_id: str = 'default', 
+        metrics: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, float]]:
+        """ストリーミング基準統計の更新（バッチの十分統計量をWelford法の並列版で合成）"""
         try:
-            severity_weights = {
-                AlertSeverity.CRITICAL: 1.0,
-                AlertSeverity.HIGH: 0.8,
-                AlertSeverity.MEDIUM: 0.6,
-                AlertSeverity.LOW: 0.4
-            }
-            
-            # メトリクス重要度
-            metric_weights = {
-                'revenue': 1.0,
-                'conversion_rate': 0.9,
-                'page_views': 0.8,
-                'unique_visitors': 0.8,
-                'bounce_rate': 0.7,
-                'avg_session_duration': 0.6
-            }
-            
-            severity_weight = severity_weights.get(anomaly.severity, 0.5)
-            metric_weight = metric_weights.get(anomaly.metric_name, 0.5)
-            
-            importance_score = (
-                severity_weight * 0.4 +
-                anomaly.confidence * 0.3 +
-                metric_weight * 0.2 +
-                min(anomaly.deviation_score / 5.0, 1.0) * 0.1
-            )
+            if not metrics:
+                metrics = list(data.select_dtypes(include=[np.number]).columns)
+            columns = [m for m in metrics if m in data.columns]
+            if not columns:
+                return self.baselines.get(site_id, {})
+            
+            # バッチ側の件数・平均・偏差平方和を全メトリクス一括で計算（欠損は除外）
+            values = data[columns].to_numpy(dtype=np.float64)
+            valid = ~np.isnan(values)
+            batch_count = valid.sum(axis=0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                batch_mean = np.where(valid, values, 0.0).sum(axis=0) / batch_count
+            deviations = np.where(valid, values - batch_mean, 0.0)
+            batch_m2 = np.einsum('ij,ij->j', deviations, deviations)
+            
+            site_baselines = self.baselines.setdefault(site_id, {})
+            for j, metric in enumerate(columns):
+                n_b = int(batch_count[j])
+                if n_b == 0:
+                    continue
+                
+                current = site_baselines.get(metric)
+                if current is None:
+                    site_baselines[metric] = {
+                        'count': n_b,
+                        'mean': float(batch_mean[j]),
+                        'm2': float(batch_m2[j])
+                    }
+                    continue
+                
+                # Chanらの並列アルゴリズムで既存の統計と合成
+                n_a = current['count']
+                n = n_a + n_b
+                delta = batch_mean[j] - current['mean']
+                current['count'] = n
+                current['mean'] = float(current['mean'] + delta * n_b / n)
+                current['m2'] = float(current['m2'] + batch_m2[j] + delta * delta * n_a * n_b / n)
             
-            return importance_score
+            return site_baselines
             
-        except Exception:
-            return 0.5
+        except Exception as e:
+            logger.error(f"基準統計更新エラー ({site_id}): {e}")
+            return self.baselines.get(site_id, {})
 
-    def get_severity_breakdown(self, anomalies: List[AnomalyData]) -> Dict[str, int]:
-        """重要度別内訳取得"""
+    async def detect_real_time_anomaly(
+        self, 
+        point: pd.DataFrame, 
+        site_id: str = 'default', 
+        metrics: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """新着データの最終行を基準統計と比較して異常判定（O(1)、モデルの再学習なし）"""
+        result = {'is_anomaly': False, 'confidence': 0.0, 'anomalies': []}
         try:
-            breakdown = {
-                'critical': 0,
-                'high': 0,
-                'medium': 0,
-                'low': 0
-            }
+            site_baselines = self.baselines.get(site_id, {})
+            if point.empty or not site_baselines:
+                return result
             
-            for anomaly in anomalies:
-                breakdown[anomaly.severity.value] += 1
+            if not metrics:
+                metrics = list(site_baselines)
+            latest = point.iloc[-1]
+            timestamp = pd.to_datetime(latest['timestamp']) if 'timestamp' in point.columns else datetime.utcnow()
+            min_count = max(self.settings.anomaly_min_data_points, 2)
+            z_threshold = self.models.get('statistical', {}).get('z_threshold', 3.0)
             
-            return breakdown
+            for metric in metrics:
+                baseline = site_baselines.get(metric)
+                if metric not in point.columns or not baseline or baseline['count'] < min_count:
+                    continue
+                
+                value = float(latest[metric])
+                std = (baseline['m2'] / (baseline['count'] - 1)) ** 0.5
+                if np.isnan(value) or std == 0:
+                    continue
+                
+                z_score = abs(value - baseline['mean']) / std
+                if z_score <= z_threshold:
+                    continue
+                
+                result['anomalies'].append(AnomalyData(
+                    metric_name=metric,
+                    timestamp=timestamp,
+                    expected_value=baseline['mean'],
+                    actual_value=value,
+                    deviation_score=float(z_score),
+                    severity=self._calculate_severity(z_score, 'z_score'),
+                    confidence=min(0.95, z_score / 5.0),
+                    context={
+                        'detection_method': 'streaming_z_score',
+                        'threshold': z_threshold,
+                        'baseline_count': baseline['count'],
+                        'baseline_std': std
+                    }
+                ))
+            
+            if result['anomalies']:
+                result['is_anomaly'] = True
+                result['confidence'] = max(a.confidence for a in result['anomalies'])
+            
+            return result
             
         except Exception as e:
-            logger.error(f"重要度別内訳計算エラー: {e}")
-            return {'critical': 0, 'high': 0, 'medium': 0, 'low': 0}
+            logger.error(f"リアルタイム異常判定エラー ({site_id}): {e}")
+            return result
 
     # ============ ヘルパーメソッド ============
     
@@ -669,13 +811,12 @@ class AnomalyDetectorService:
                 data['timestamp'] = pd.to_datetime(data['timestamp'])
                 data = data.set_index('timestamp').sort_index()
             
-            # 移動平均による平滑化
+            # 移動平均による平滑化（全数値列を1回のrollingで計算し、列追加もまとめて1回で行う）
             window_size = 24  # 24時間
-            numeric_columns = data.select_dtypes(include=[np.number]).columns
-            for col in numeric_columns:
-                data[f'{col}_ma'] = data[col].rolling(window=window_size, center=True).mean()
+            numeric_data = data.select_dtypes(include=[np.number])
+            moving_averages = numeric_data.rolling(window=window_size, center=True).mean()
             
-            return data
+            return pd.concat([data, moving_averages.add_suffix('_ma')], axis=1)
             
         except Exception as e:
             logger.error(f"データ前処理エラー: {e}")
@@ -827,5 +968,65 @@ class AnomalyDetectorService:
         return []  # 簡略実装
 
     async def _detect_continuity_anomalies(self, data, metrics):
-        """連続性異常検知"""
-        return []  # 簡略実装
\ No newline at end of file
+        """連続性異常検知（直前ウィンドウの中央値・MADから大きく外れた急変点）"""
+        try:
+            anomalies = []
+            window = self.CONTINUITY_WINDOW
+            z_threshold = self.CONTINUITY_Z_THRESHOLD
+            
+            for metric in metrics:
+                if metric not in data.columns:
+                    continue
+                
+                series = data[metric].dropna()
+                if len(series) <= window:
+                    continue
+                
+                # 各点の直前ウィンドウをコピーなしのビューで作り、中央値・MADを一括計算
+                # （ウィンドウ内の過去の外れ値で基準が崩れないようロバスト統計を使う）
+                values = series.to_numpy(dtype=np.float64)
+                windows = sliding_window_view(values[:-1], window)
+                window_medians = np.median(windows, axis=1)
+                window_scales = np.median(np.abs(windows - window_medians[:, None]), axis=1) * self.MAD_TO_STD
+                current = values[window:]
+                
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    z_scores = np.abs(current - window_medians) / window_scales
+                flagged = np.flatnonzero((z_scores > z_threshold) & np.isfinite(z_scores))
+                if not flagged.size:
+                    continue
+                
+                severities = self._calculate_severities(z_scores[flagged], 'continuity')
+                
+                # 欠損除外後の位置ではなくインデックスラベルで発生時刻を引く
+                labels = series.index[flagged + window]
+                if 'timestamp' in data.columns:
+                    timestamps = pd.to_datetime(data.loc[labels, 'timestamp']).tolist()
+                elif isinstance(data.index, pd.DatetimeIndex):
+                    timestamps = labels.tolist()
+                else:
+                    timestamps = [datetime.utcnow()] * flagged.size
+                
+                for position, timestamp, severity in zip(flagged, timestamps, severities):
+                    anomaly = AnomalyData(
+                        metric_name=metric,
+                        timestamp=timestamp,
+                        expected_value=float(window_medians[position]),
+                        actual_value=float(current[position]),
+                        deviation_score=float(z_scores[position]),
+                        severity=severity,
+                        confidence=min(0.95, z_scores[position] / (2 * z_threshold)),
+                        context={
+                            'detection_method': 'continuity',
+                            'window_size': window,
+                            'threshold': z_threshold,
+                            'window_scale': float(window_scales[position])
+                        }
+                    )
+                    anomalies.append(anomaly)
+            
+            return anomalies
+            
+        except Exception as e:
+            logger.error(f"連続性異常検知エラー: {e}")
+            return []
\ No newline at end of file
@@ -19,6 +19,12 @@ from models.schemas import UserBehaviorPattern
 
 logger = logging.getLogger(__name__)
 
+# 行動異常の検出対象列・異常タイプ・説明文テンプレート
+_BEHAVIOR_ANOMALY_TEMPLATES = (
+    ('session_duration', 'session_duration_anomaly', "異常なセッション時間: {value:.0f}秒"),
+    ('pages_per_session', 'page_views_anomaly', "異常なページビュー数: {value:.0f}ページ"),
+)
+
 class BehaviorAnalyzerService:
     """ユーザー行動分析サービス"""
     
@@ -448,31 +454,25 @@ class BehaviorAnalyzerService:
             
             anomalies = []
             
-            # 異常に長い/短いセッション
-            if 'session_duration' in data.columns:
-                duration_z_scores = np.abs((data['session_duration'] - data['session_duration'].mean()) / data['session_duration'].std())
-                duration_anomalies = data[duration_z_scores > 3]
+            # 異常に長い/短いセッション・異常なページビュー数（行単位の走査をせず、該当値のみテンプレートで説明文を生成）
+            for column, anomaly_type, template in _BEHAVIOR_ANOMALY_TEMPLATES:
+                if column not in data.columns:
+                    continue
                 
-                for _, row in duration_anomalies.iterrows():
-                    anomalies.append({
-                        "type": "session_duration_anomaly",
-                        "value": row['session_duration'],
-                        "z_score": duration_z_scores[row.name],
-                        "description": f"異常なセッション時間: {row['session_duration']:.0f}秒"
-                    })
-            
-            # 異常なページビュー数
-            if 'pages_per_session' in data.columns:
-                pages_z_scores = np.abs((data['pages_per_session'] - data['pages_per_session'].mean()) / data['pages_per_session'].std())
-                pages_anomalies = data[pages_z_scores > 3]
+                values = data[column]
+                z_scores = np.abs((values - values.mean()) / values.std())
+                mask = z_scores > 3
+                describe = template.format
                 
-                for _, row in pages_anomalies.iterrows():
-                    anomalies.append({
-                        "type": "page_views_anomaly",
-                        "value": row['pages_per_session'],
-                        "z_score": pages_z_scores[row.name],
-                        "description": f"異常なページビュー数: {row['pages_per_session']:.0f}ページ"
-                    })
+                anomalies.extend(
+                    {
+                        "type": anomaly_type,
+                        "value": value,
+                        "z_score": z_score,
+                        "description": describe(value=value)
+                    }
+                    for value, z_score in zip(values[mask], z_scores[mask])
+                )
             
             # ボット的行動パターン
             bot_patterns = await self._detect_bot_patterns(data)
@@ -5,19 +5,24 @@
 import asyncio
 import logging
 import json
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Set
 from collections import deque, defaultdict
 import numpy as np
 import pandas as pd
-from dataclasses import dataclass, asdict
-import redis
+from dataclasses import dataclass
+from redis import asyncio as aioredis
 from config.settings import Settings
 from models.schemas import RealtimeMetrics, AlertData, AlertSeverity
+from services.anomaly_detector import AnomalyDetectorService
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# コンバージョンとして扱うイベントタイプ
+CONVERSION_EVENT_TYPES = frozenset(('purchase', 'signup', 'conversion'))
+
+@dataclass(slots=True)
 class RealtimeEvent:
     """リアルタイムイベント"""
     site_id: str
@@ -38,8 +43,14 @@ class StreamingWindow:
 class RealtimeProcessorService:
     """リアルタイム処理サービス"""
     
-    def __init__(self, settings: Settings):
+    # クールダウン辞書の上限（超過時は即座に期限切れを削除）
+    MAX_ALERT_COOLDOWNS = 10000
+    # 分単位メトリクスバケットの保持期間（秒）
+    METRIC_BUCKET_TTL = 3600
+    
+    def __init__(self, settings: Settings, anomaly_detector: Optional[AnomalyDetectorService] = None):
         self.settings = settings
+        self.anomaly_detector = anomaly_detector
         self.redis_client = None
         self.active_streams = {}  # site_id -> StreamingWindow
         self.alert_rules = {}
@@ -52,8 +63,12 @@ class RealtimeProcessorService:
     async def initialize(self):
         """サービス初期化"""
         try:
-            # Redis接続
-            self.redis_client = redis.from_url(self.settings.redis_url)
+            # Redis接続（非同期クライアント）
+            self.redis_client = aioredis.from_url(
+                self.settings.redis_url,
+                decode_responses=False,
+                max_connections=32
+            )
             
             # アラートルール設定
             await self._setup_alert_rules()
@@ -188,7 +203,8 @@ class RealtimeProcessorService:
                 )
             
             # WebSocket管理オブジェクトを保存
-            self.active_streams[site_id].websocket_manager = websocket_manager
+            stream = self.active_streams[site_id]
+            stream.websocket_manager = websocket_manager
             
             logger.info(f"リアルタイム分析開始: {site_id}")
             
@@ -198,8 +214,7 @@ class RealtimeProcessorService:
     async def stop_realtime_analysis(self, site_id: str):
         """リアルタイム分析停止"""
         try:
-            if site_id in self.active_streams:
-                del self.active_streams[site_id]
+            self.active_streams.pop(site_id, None)
             
             logger.info(f"リアルタイム分析停止: {site_id}")
             
@@ -216,22 +231,32 @@ class RealtimeProcessorService:
         try:
             start_time = datetime.utcnow()
             
-            # イベント処理
+            # イベント処理（ts_ms（エポックミリ秒）があればISO文字列の解析を省略）
             processed_events = []
+            append = processed_events.append
+            event_cls = RealtimeEvent
+            utcfromtimestamp = datetime.utcfromtimestamp
+            fromisoformat = datetime.fromisoformat
             for event in event_data:
-                realtime_event = RealtimeEvent(
-                    site_id=site_id,
-                    event_type=event.get('type', 'unknown'),
-                    timestamp=datetime.fromisoformat(event.get('timestamp', datetime.utcnow().isoformat())),
-                    data=event.get('data', {}),
-                    user_id=event.get('user_id'),
-                    session_id=event.get('session_id')
-                )
-                processed_events.append(realtime_event)
-            
-            # キューに追加
+                ts_ms = event.get('ts_ms')
+                if ts_ms is not None:
+                    timestamp = utcfromtimestamp(ts_ms / 1000.0)
+                else:
+                    iso_timestamp = event.get('timestamp')
+                    timestamp = fromisoformat(iso_timestamp) if iso_timestamp else start_time
+                append(event_cls(
+                    site_id,
+                    event.get('type', 'unknown'),
+                    timestamp,
+                    event.get('data', {}),
+                    event.get('user_id'),
+                    event.get('session_id')
+                ))
+            
+            # キューに追加（無制限キューのためノンブロッキングで投入）
+            put_nowait = self.processing_queue.put_nowait
             for event in processed_events:
-                await self.processing_queue.put(event)
+                put_nowait(event)
             
             # 即座に基本メトリクス計算
             instant_metrics = await self._calculate_instant_metrics(site_id, processed_events)
@@ -346,8 +371,14 @@ class RealtimeProcessorService:
     async def _alert_processor(self):
         """アラートプロセッサ"""
         try:
+            tick_count = 0
             while self.is_running:
                 try:
+                    # 期限切れクールダウンの定期削除
+                    if len(self.alert_cooldowns) > self.MAX_ALERT_COOLDOWNS or tick_count % 60 == 0:
+                        self._prune_alert_cooldowns(datetime.utcnow())
+                    tick_count += 1
+                    
                     # 全アクティブストリームをチェック
                     for site_id, stream in self.active_streams.items():
                         await self._check_alerts(site_id, stream)
@@ -361,6 +392,13 @@ class RealtimeProcessorService:
         except asyncio.CancelledError:
             logger.info("アラートプロセッサ停止")
 
+    def _prune_alert_cooldowns(self, current_time: datetime):
+        """期限切れのアラートクールダウンを削除"""
+        self.alert_cooldowns = {
+            key: until for key, until in self.alert_cooldowns.items()
+            if until > current_time
+        }
+
     async def _prediction_processor(self):
         """予測プロセッサ"""
         try:
@@ -371,7 +409,7 @@ class RealtimeProcessorService:
                         predictions = await self._generate_predictions(site_id, stream)
                         
                         if predictions and hasattr(stream, 'websocket_manager'):
-                            await stream.websocket_manager.send_to_site(site_id, {
+                            self._enqueue_site_message(site_id, stream, {
                                 "type": "predictions",
                                 "data": predictions,
                                 "timestamp": datetime.utcnow().isoformat()
@@ -395,8 +433,14 @@ class RealtimeProcessorService:
                     for site_id, stream in self.active_streams.items():
                         aggregated_metrics = await self._aggregate_metrics(site_id, stream)
                         
+                        # 履歴ベースライン用に分単位バケットへ記録（集約ティックごとに1回）
+                        await self._record_metric_buckets(site_id, stream)
+                        
+                        # ストリーミング基準統計による異常判定
+                        await self._check_streaming_anomalies(site_id, stream)
+                        
                         if aggregated_metrics and hasattr(stream, 'websocket_manager'):
-                            await stream.websocket_manager.send_to_site(site_id, {
+                            self._enqueue_site_message(site_id, stream, {
                                 "type": "realtime_metrics",
                                 "data": aggregated_metrics,
                                 "timestamp": datetime.utcnow().isoformat()
@@ -411,6 +455,10 @@ class RealtimeProcessorService:
         except asyncio.CancelledError:
             logger.info("メトリクス集約プロセッサ停止")
 
+    def _enqueue_site_message(self, site_id: str, stream: StreamingWindow, message: Dict[str, Any]):
+        """サイト宛メッセージをWebSocketマネージャーのまとめ送信に積む（一定間隔で1フレームに集約）"""
+        stream.websocket_manager.enqueue_to_site(site_id, message)
+
     async def _process_events_batch(self, events_batch: List[RealtimeEvent]):
         """イベントバッチ処理"""
         try:
@@ -442,46 +490,99 @@ class RealtimeProcessorService:
         try:
             current_time = datetime.utcnow()
             
-            # 1分間のイベント数
+            # 直近1分間のイベントを1パスで集計
             one_minute_ago = current_time - timedelta(minutes=1)
-            recent_events = [e for e in stream.events if e.timestamp > one_minute_ago]
+            event_count = 0
+            page_views = 0
+            conversions = 0
+            errors = 0
+            session_counts = defaultdict(int)
+            user_set = set()
+            
+            for e in stream.events:
+                if e.timestamp <= one_minute_ago:
+                    continue
+                event_count += 1
+                event_type = e.event_type
+                if event_type == 'page_view':
+                    page_views += 1
+                elif event_type in CONVERSION_EVENT_TYPES:
+                    conversions += 1
+                if event_type == 'error' or e.data.get('is_error', False):
+                    errors += 1
+                if e.session_id:
+                    session_counts[e.session_id] += 1
+                if e.user_id:
+                    user_set.add(e.user_id)
             
             # 基本メトリクス計算
             stream.metrics.update({
-                'events_per_minute': len(recent_events),
-                'page_views_per_minute': len([e for e in recent_events if e.event_type == 'page_view']),
-                'unique_sessions': len(set(e.session_id for e in recent_events if e.session_id)),
-                'active_users': len(set(e.user_id for e in recent_events if e.user_id))
+                'events_per_minute': event_count,
+                'page_views_per_minute': page_views,
+                'unique_sessions': len(session_counts),
+                'active_users': len(user_set)
             })
             
-            # セッション関連メトリクス
-            sessions_data = defaultdict(list)
-            for event in recent_events:
-                if event.session_id:
-                    sessions_data[event.session_id].append(event)
-            
-            # 直帰率計算
-            bounced_sessions = 0
-            total_sessions = len(sessions_data)
-            
+            # 直帰率計算（イベント1件のみのセッション）
+            total_sessions = len(session_counts)
             if total_sessions > 0:
-                for session_events in sessions_data.values():
-                    if len(session_events) == 1:
-                        bounced_sessions += 1
-                
+                bounced_sessions = sum(1 for count in session_counts.values() if count == 1)
                 stream.metrics['bounce_rate'] = bounced_sessions / total_sessions
             
             # コンバージョン関連
-            conversions = len([e for e in recent_events if e.event_type in ['purchase', 'signup', 'conversion']])
-            stream.metrics['conversion_rate'] = conversions / max(len(recent_events), 1)
+            stream.metrics['conversion_rate'] = conversions / max(event_count, 1)
             
             # エラー率
-            errors = len([e for e in recent_events if e.event_type == 'error' or e.data.get('is_error', False)])
-            stream.metrics['error_rate'] = errors / max(len(recent_events), 1)
+            stream.metrics['error_rate'] = errors / max(event_count, 1)
             
         except Exception as e:
             logger.error(f"ストリームメトリクス更新エラー: {e}")
 
+    @staticmethod
+    def _metric_bucket_key(site_id: str, metric: str, minute_bucket: int) -> str:
+        """分単位メトリクスバケットのRedisキー"""
+        return f"met:{site_id}:{metric}:{minute_bucket}"
+
+    async def _record_metric_buckets(self, site_id: str, stream: StreamingWindow):
+        """現在のメトリクスを分単位バケットとしてRedisに記録"""
+        try:
+            if not self.redis_client:
+                return
+            
+            minute_bucket = int(time.time() // 60)
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for metric, value in stream.metrics.items():
+                    pipe.set(
+                        self._metric_bucket_key(site_id, metric, minute_bucket),
+                        float(value),
+                        ex=self.METRIC_BUCKET_TTL
+                    )
+                await pipe.execute()
+            
+        except Exception as e:
+            logger.error(f"メトリクスバケット記録エラー ({site_id}): {e}")
+
+    async def _check_streaming_anomalies(self, site_id: str, stream: StreamingWindow):
+        """現在のメトリクスを基準統計と比較して異常判定し、判定後に基準統計へ取り込む"""
+        try:
+            if not self.anomaly_detector or not stream.metrics:
+                return
+            
+            point = pd.DataFrame([stream.metrics])
+            result = await self.anomaly_detector.detect_real_time_anomaly(point, site_id)
+            await self.anomaly_detector.update_baseline(point, site_id)
+            
+            if result['is_anomaly'] and hasattr(stream, 'websocket_manager'):
+                self._enqueue_site_message(site_id, stream, {
+                    "type": "realtime_anomaly",
+                    "data": [anomaly.dict() for anomaly in result['anomalies']],
+                    "confidence": result['confidence'],
+                    "timestamp": datetime.utcnow().isoformat()
+                })
+            
+        except Exception as e:
+            logger.error(f"ストリーミング異常判定エラー ({site_id}): {e}")
+
     async def _check_alerts(self, site_id: str, stream: StreamingWindow):
         """アラートチェック"""
         try:
@@ -495,7 +596,7 @@ class RealtimeProcessorService:
                         continue
                 
                 # アラート条件チェック
-                alert_triggered = await self._check_alert_condition(stream, rule)
+                alert_triggered = await self._check_alert_condition(site_id, stream, rule)
                 
                 if alert_triggered:
                     # アラート生成
@@ -512,7 +613,7 @@ class RealtimeProcessorService:
         except Exception as e:
             logger.error(f"アラートチェックエラー ({site_id}): {e}")
 
-    async def _check_alert_condition(self, stream: StreamingWindow, rule: Dict[str, Any]) -> bool:
+    async def _check_alert_condition(self, site_id: str, stream: StreamingWindow, rule: Dict[str, Any]) -> bool:
         """アラート条件チェック"""
         try:
             metric_name = rule['metric']
@@ -524,7 +625,7 @@ class RealtimeProcessorService:
             elif 'threshold_multiplier' in rule:
                 # 相対閾値（履歴との比較）
                 historical_avg = await self._get_historical_average(
-                    stream, metric_name, rule.get('window_minutes', 60)
+                    site_id, stream, metric_name, rule.get('window_minutes', 60)
                 )
                 
                 if historical_avg > 0:
@@ -540,14 +641,35 @@ class RealtimeProcessorService:
             logger.error(f"アラート条件チェックエラー: {e}")
             return False
 
-    async def _get_historical_average(self, stream: StreamingWindow, metric: str, window_minutes: int) -> float:
-        """履歴平均取得"""
+    async def _get_historical_average(
+        self, site_id: str, stream: StreamingWindow, metric: str, window_minutes: int
+    ) -> float:
+        """履歴平均取得（Redisの分単位バケットを1回のMGETで取得）"""
+        try:
+            if self.redis_client:
+                # 書き込み中の現在分バケットは除外し、直前の分から遡る
+                current_bucket = int(time.time() // 60)
+                keys = [
+                    self._metric_bucket_key(site_id, metric, bucket)
+                    for bucket in range(current_bucket - window_minutes, current_bucket)
+                ]
+                values = [float(v) for v in await self.redis_client.mget(keys) if v is not None]
+                
+                if values:
+                    return sum(values) / len(values)
+            
+        except Exception as e:
+            logger.warning(f"Redis履歴平均取得エラー: {e}")
+        
+        # バケット未蓄積時はウィンドウ内イベントから計算
+        return self._get_in_memory_average(stream, metric, window_minutes)
+
+    def _get_in_memory_average(self, stream: StreamingWindow, metric: str, window_minutes: int) -> float:
+        """ウィンドウ内イベントからの履歴平均計算"""
         try:
             current_time = datetime.utcnow()
             window_start = current_time - timedelta(minutes=window_minutes)
             
-            # 履歴イベントから計算（簡略実装）
-            # 実際の実装では、Redisやデータベースから履歴データを取得
             relevant_events = [e for e in stream.events if e.timestamp > window_start]
             
             if not relevant_events:
@@ -615,20 +737,18 @@ class RealtimeProcessorService:
     async def _send_alert(self, site_id: str, alert: AlertData, stream: StreamingWindow):
         """アラート送信"""
         try:
+            alert_data = alert.to_dict()
+            
             # WebSocket経由で送信
             if hasattr(stream, 'websocket_manager'):
                 await stream.websocket_manager.send_to_site(site_id, {
                     "type": "alert",
-                    "data": asdict(alert),
+                    "data": alert_data,
                     "timestamp": datetime.utcnow().isoformat()
                 })
             
             # Redisにアラート履歴保存
             alert_key = f"alerts:{site_id}"
-            alert_data = {
-                **asdict(alert),
-                "triggered_at": alert.triggered_at.isoformat()
-            }
             
             await self.redis_client.lpush(alert_key, json.dumps(alert_data))
             await self.redis_client.ltrim(alert_key, 0, 99)  # 最新100件まで
@@ -644,11 +764,22 @@ class RealtimeProcessorService:
     async def _calculate_instant_metrics(self, site_id: str, events: List[RealtimeEvent]) -> Dict[str, Any]:
         """即座のメトリクス計算"""
         try:
+            sessions = set()
+            page_views = 0
+            conversions = 0
+            for e in events:
+                if e.session_id:
+                    sessions.add(e.session_id)
+                if e.event_type == 'page_view':
+                    page_views += 1
+                elif e.event_type in ('purchase', 'signup'):
+                    conversions += 1
+            
             return {
                 "events_processed": len(events),
-                "unique_sessions": len(set(e.session_id for e in events if e.session_id)),
-                "page_views": len([e for e in events if e.event_type == 'page_view']),
-                "conversions": len([e for e in events if e.event_type in ['purchase', 'signup']]),
+                "unique_sessions": len(sessions),
+                "page_views": page_views,
+                "conversions": conversions,
                 "timestamp": datetime.utcnow().isoformat()
             }
         except:
@@ -765,6 +896,10 @@ class RealtimeProcessorService:
             # ストリームクリア
             self.active_streams.clear()
             
+            # Redis接続クローズ
+            if self.redis_client:
+                await self.redis_client.close()
+            
             logger.info("リアルタイム処理サービスクリーンアップ完了")
             
         except Exception as e:
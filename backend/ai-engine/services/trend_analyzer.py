@@ -3,39 +3,124 @@
 時系列分析、季節性検出、機械学習予測を統合した次世代トレンド分析
 """
 import asyncio
+import hashlib
 import logging
-import json
-from datetime import datetime, timedelta
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Dict, List, Any, Optional, Tuple
 import numpy as np
+import orjson
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from sklearn.base import clone
 from sklearn.linear_model import LinearRegression
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 from scipy import stats
-from scipy.fft import fft, fftfreq
+from scipy.fft import rfft, rfftfreq
 from scipy.signal import find_peaks
-import redis
+from redis import asyncio as aioredis
 from config.settings import Settings
 from models.schemas import TrendData
+from services._trend_kernels import summary_statistics, local_extrema, rolling_std_summary
+from utils.timeutils import utcnow_iso
 
 logger = logging.getLogger(__name__)
 
+# 自己相関で確認する既知の季節周期（日数 -> パターン種別）
+SEASONAL_LAGS = {7: "weekly", 30: "monthly", 91: "quarterly", 365: "yearly"}
+
+# デフォルトのトレンド分析対象メトリクス
+DEFAULT_TREND_METRICS = (
+    'page_views', 'unique_visitors', 'bounce_rate',
+    'conversion_rate', 'avg_session_duration', 'revenue'
+)
+
+@lru_cache(maxsize=64)
+def _default_metrics_for(columns: frozenset) -> Tuple[str, ...]:
+    """カラム集合に含まれるデフォルトメトリクス（定義順）"""
+    return tuple(m for m in DEFAULT_TREND_METRICS if m in columns)
+
+# サンプルトレンドデータの列（_sample_trend_valuesの列順）
+SAMPLE_TREND_COLUMNS = DEFAULT_TREND_METRICS
+
+@lru_cache(maxsize=32)
+def _sample_trend_values(n_points: int) -> np.ndarray:
+    """点数別サンプルトレンド値（乱数シード固定のため点数だけで決まる。読み取り専用）"""
+    # サンプルデータ生成（PCG64ジェネレータで乱数をまとめて生成）
+    rng = np.random.default_rng(42)
+
+    # トレンド・週次季節性・ノイズを含む基準系列
+    base = np.linspace(1000, 1200, n_points)  # 上昇トレンド
+    base += 100 * np.sin(2 * np.pi * np.arange(n_points) / 7)  # 週次季節性
+    base += rng.standard_normal(n_points) * 50
+
+    # 直帰率・CVR・セッション時間のノイズを1回で生成してその場でスケール
+    noise = rng.standard_normal((n_points, 3))
+    noise *= (0.1, 0.005, 30)
+    noise += (0.6, 0.03, 180)
+    np.clip(noise[:, :2], 0, 1, out=noise[:, :2])
+
+    values = np.column_stack((base, base * 0.4, noise, base * 0.8))
+    values.flags.writeable = False
+    return values
+
+def _sample_trend_data(start_date: datetime, end_date: datetime) -> pd.DataFrame:
+    """期間別サンプルトレンドデータ生成"""
+    dates = pd.date_range(start=start_date, end=end_date, freq='D', name='timestamp')
+
+    # 値は点数が同じ期間で共有（呼び出し側の変更がキャッシュに及ばないようコピーしてfloat64の1ブロックにする）
+    return pd.DataFrame(
+        _sample_trend_values(len(dates)), index=dates, columns=list(SAMPLE_TREND_COLUMNS), copy=True
+    )
+
 class TrendAnalyzerService:
     """トレンド分析サービス"""
     
+    # 学習済み予測モデルキャッシュの上限（site_id × metric、RandomForest1個あたり約1.3MB）
+    MAX_FORECAST_MODELS = 32
+    # 既知周期の自己相関がこの値を超えれば季節性ありと判定
+    SEASONAL_ACF_THRESHOLD = 0.4
+    # 既知周期に該当しない場合にFFTで任意周期を探索するか
+    FFT_SEASONALITY_FALLBACK = True
+    # 予測モデルの学習に使う直近サンプル数（約半年）
+    FORECAST_TRAINING_WINDOW = 180
+    # 予測結果キャッシュの保持期間（1時間）
+    FORECAST_CACHE_TTL = 3600
+    # 季節パターンキャッシュの保持期間（7日）
+    SEASONAL_PATTERN_TTL = 86400 * 7
+    # 圧縮済みペイロードの識別子（JSONは0x00で始まらない）
+    COMPRESSED_PAYLOAD_PREFIX = b"\x00z"
+    
     def __init__(self, settings: Settings):
         self.settings = settings
         self.redis_client = None
         self.prediction_models = {}
         self.seasonal_patterns = {}
         self.trend_cache = {}
+        # (site_id, metric) -> (データ指紋, 学習済みモデル)
+        self.forecast_model_cache: OrderedDict = OrderedDict()
+        self._model_cache_lock = threading.Lock()
+        # メトリクス別のCPU処理（回帰・FFT・RF学習）を実行するワーカー
+        self._cpu_pool: Optional[ThreadPoolExecutor] = None
         
     async def initialize(self):
         """サービス初期化"""
         try:
-            # Redis接続
-            self.redis_client = redis.from_url(self.settings.redis_url)
+            # Redis接続（非同期クライアント）
+            self.redis_client = aioredis.from_url(self.settings.redis_url)
+            
+            # CPU処理用スレッドプール（NumPy/SciPy/sklearnはGILを解放する）
+            self._cpu_pool = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                thread_name_prefix="trend-cpu"
+            )
             
             # 予測モデル初期化
             await self._initialize_prediction_models()
@@ -56,10 +141,12 @@ class TrendAnalyzerService:
             self.prediction_models['linear'] = LinearRegression()
             
             # ランダムフォレスト（非線形パターン用）
+            # 並列化はメトリクス単位のスレッドプールで行うため、各モデルはn_jobs=1（CPUの過剰な多重化を防ぐ）
             self.prediction_models['random_forest'] = RandomForestRegressor(
                 n_estimators=100,
                 random_state=42,
-                max_depth=10
+                max_depth=10,
+                n_jobs=1
             )
             
             # モデルパラメータ
@@ -79,11 +166,19 @@ class TrendAnalyzerService:
         try:
             pattern_keys = await self.redis_client.keys("seasonal_patterns:*")
             
-            for key in pattern_keys:
-                pattern_data = await self.redis_client.get(key)
-                if pattern_data:
-                    site_id = key.split(':')[1]
-                    self.seasonal_patterns[site_id] = json.loads(pattern_data)
+            if pattern_keys:
+                # 全キーを1回のパイプラインで取得
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for key in pattern_keys:
+                        pipe.get(key)
+                    pattern_values = await pipe.execute()
+                
+                for key, pattern_data in zip(pattern_keys, pattern_values):
+                    if pattern_data:
+                        if isinstance(key, bytes):
+                            key = key.decode()
+                        site_id = key.split(':')[1]
+                        self.seasonal_patterns[site_id] = self._decode_pattern_payload(pattern_data)
             
             logger.info(f"{len(self.seasonal_patterns)}サイトの季節パターンを読み込み")
             
@@ -95,14 +190,20 @@ class TrendAnalyzerService:
         self, 
         site_id: str, 
         date_range: Dict[str, datetime],
-        metrics: Optional[List[str]] = None
+        metrics: Optional[List[str]] = None,
+        data: Optional[pd.DataFrame] = None
     ) -> Dict[str, TrendData]:
-        """トレンド分析実行"""
+        """
+        トレンド分析実行
+        
+        dataを渡した場合はデータ取得を省略し、その期間分をそのまま分析する
+        """
         try:
-            start_time = datetime.utcnow()
+            start_ns = time.perf_counter_ns()
             
-            # データ取得
-            data = await self._fetch_trend_data(site_id, date_range)
+            # データ取得（呼び出し側で取得済みなら再取得しない）
+            if data is None:
+                data = await self._fetch_trend_data(site_id, date_range)
             
             if data.empty:
                 logger.warning(f"トレンドデータが空: {site_id}")
@@ -112,24 +213,38 @@ class TrendAnalyzerService:
             if not metrics:
                 metrics = self._get_default_trend_metrics(data)
             
-            # 並行してメトリクス別トレンド分析
-            trend_tasks = []
-            for metric in metrics:
-                if metric in data.columns:
-                    task = self._analyze_metric_trend(data, metric, site_id)
-                    trend_tasks.append((metric, task))
+            target_metrics = [m for m in metrics if m in data.columns]
+            series_by_metric = {m: data[m].dropna() for m in target_metrics}
+            
+            # 同一データの予測結果がRedisにあればモデル学習を省略（全メトリクスを1回で取得）
+            forecast_keys = self._forecast_cache_keys(site_id, series_by_metric)
+            cached_forecasts = await self._get_cached_forecasts(forecast_keys)
+            
+            # 並行してメトリクス別トレンド分析（CPU処理はワーカースレッドで実行）
+            trend_tasks = [
+                self._analyze_metric_trend(
+                    series_by_metric[metric], metric, site_id, cached_forecasts.get(metric)
+                )
+                for metric in target_metrics
+            ]
+            results = await asyncio.gather(*trend_tasks, return_exceptions=True)
             
             # 結果取得
             trend_results = {}
-            for metric, task in trend_tasks:
-                try:
-                    trend_data = await task
-                    trend_results[metric] = trend_data
-                except Exception as e:
-                    logger.error(f"メトリクス{metric}のトレンド分析エラー: {e}")
+            new_forecasts = []
+            for metric, trend_data in zip(target_metrics, results):
+                if isinstance(trend_data, Exception):
+                    logger.error(f"メトリクス{metric}のトレンド分析エラー: {trend_data}")
+                    continue
+                trend_results[metric] = trend_data
+                if metric in forecast_keys and metric not in cached_forecasts and trend_data.forecast:
+                    new_forecasts.append((forecast_keys[metric], trend_data.forecast))
+            
+            # 新規の予測結果は1回のパイプラインで保存
+            await self._save_cached_forecasts(new_forecasts)
             
             # 処理時間ログ
-            processing_time = (datetime.utcnow() - start_time).total_seconds()
+            processing_time = (time.perf_counter_ns() - start_ns) / 1e9
             logger.info(f"トレンド分析完了 ({site_id}): {len(trend_results)}メトリクス, {processing_time:.2f}秒")
             
             return trend_results
@@ -152,16 +267,23 @@ class TrendAnalyzerService:
             
             date_range = {"start": start_date, "end": end_date}
             
+            # 季節性検出用の長期データを1回だけ取得し、トレンド分析には分析期間分を切り出して使う
+            extended_range = {"start": start_date - timedelta(days=365), "end": end_date}
+            extended_data = await self._fetch_trend_data(site_id, extended_range)
+            period_data = extended_data.loc[start_date:end_date]
+            
+            # トレンド分析は1回だけ実行し、予測・成長機会はその結果から導出
+            trends = await self.analyze_trends(site_id, date_range, data=period_data)
+            
             # 並行分析実行
             analysis_tasks = [
-                self.analyze_trends(site_id, date_range),
-                self._analyze_seasonal_patterns(site_id, date_range),
-                self._forecast_trends(site_id, date_range),
-                self._identify_growth_opportunities(site_id, date_range),
+                self._analyze_seasonal_patterns(site_id, extended_data, extended_range),
+                self._forecast_trends(site_id, date_range, trends),
+                self._identify_growth_opportunities(site_id, date_range, trends),
                 self._analyze_market_context(site_id, date_range)
             ]
             
-            results = await asyncio.gather(*analysis_tasks)
+            results = [trends, *await asyncio.gather(*analysis_tasks)]
             
             return {
                 "trends": results[0],
@@ -183,31 +305,55 @@ class TrendAnalyzerService:
 
     async def _analyze_metric_trend(
         self, 
-        data: pd.DataFrame, 
+        series: pd.Series, 
         metric: str, 
-        site_id: str
+        site_id: str,
+        cached_forecast: Optional[List[Dict[str, Any]]] = None
+    ) -> TrendData:
+        """メトリクス別トレンド分析（CPUプールに委譲）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._cpu_pool, self._analyze_metric_trend_sync, series, metric, site_id, cached_forecast
+        )
+
+    def _analyze_metric_trend_sync(
+        self, 
+        series: pd.Series, 
+        metric: str, 
+        site_id: str,
+        cached_forecast: Optional[List[Dict[str, Any]]] = None
     ) -> TrendData:
-        """メトリクス別トレンド分析"""
+        """メトリクス別トレンド分析（同期処理本体）"""
         try:
-            series = data[metric].dropna()
+            if not pd.api.types.is_numeric_dtype(series.dtype):
+                raise TypeError(f"数値型ではないメトリクスです: {series.dtype}")
             
             if len(series) < self.prediction_models['config']['min_data_points']:
                 return self._create_insufficient_data_trend(metric)
             
-            # 基本統計
-            basic_stats = self._calculate_basic_statistics(series)
+            # 定数系列は回帰・FFT・予測モデルを実行せずに安定トレンドとして返す
+            values = series.to_numpy(dtype=np.float64)
+            if np.ptp(values) == 0:
+                return self._create_stable_trend(metric, len(values))
+            
+            # 基本統計（変動性分析と共有する統計量を1回で計算）
+            summary = summary_statistics(values)
+            basic_stats = self._calculate_basic_statistics(series, summary)
             
             # トレンド方向と強度
-            trend_analysis = await self._analyze_trend_direction(series)
+            trend_analysis = self._analyze_trend_direction(series)
             
             # 季節性検出
-            seasonality = await self._detect_seasonality(series, metric)
+            seasonality = self._detect_seasonality(series, metric)
             
             # 変動性分析
-            volatility = self._analyze_volatility(series)
+            volatility = self._analyze_volatility(series, summary)
             
             # 予測生成
-            forecast = await self._generate_forecast(series, metric, site_id)
+            if cached_forecast is not None:
+                forecast = cached_forecast
+            else:
+                forecast = self._generate_forecast(series, metric, site_id)
             
             # サポート・レジスタンスレベル
             support_resistance = self._identify_support_resistance(series)
@@ -230,12 +376,11 @@ class TrendAnalyzerService:
             logger.error(f"メトリクストレンド分析エラー ({metric}): {e}")
             return self._create_error_trend(metric, str(e))
 
-    async def _analyze_trend_direction(self, series: pd.Series) -> Dict[str, Any]:
+    def _analyze_trend_direction(self, series: pd.Series) -> Dict[str, Any]:
         """トレンド方向分析"""
         try:
-            # 線形回帰による基本トレンド
-            x = np.arange(len(series))
-            slope, intercept, r_value, p_value, std_err = stats.linregress(x, series)
+            # 線形回帰による基本トレンド（閉形式の最小二乗）
+            slope, r_value, p_value = self._linear_trend_fit(series)
             
             # トレンド方向決定
             if p_value < 0.05:  # 統計的有意
@@ -287,7 +432,34 @@ class TrendAnalyzerService:
                 "confidence": 0.1
             }
 
-    async def _detect_seasonality(self, series: pd.Series, metric: str) -> Dict[str, Any]:
+    def _linear_trend_fit(self, series: pd.Series) -> Tuple[float, float, float]:
+        """インデックスに対する線形回帰の傾き・相関係数・p値"""
+        y = series.to_numpy(dtype=np.float64)
+        n = y.size
+        
+        xm = np.arange(n, dtype=np.float64) - (n - 1) / 2.0
+        ym = y - y.mean()
+        sxx = xm @ xm
+        sxy = xm @ ym
+        syy = ym @ ym
+        
+        slope = sxy / sxx
+        if syy == 0:
+            return float(slope), 0.0, 1.0
+        
+        r_value = min(1.0, max(-1.0, sxy / np.sqrt(sxx * syy)))
+        
+        # 傾きの有意性（自由度n-2のt検定）
+        dof = n - 2
+        if dof <= 0 or abs(r_value) == 1.0:
+            p_value = 0.0 if abs(r_value) == 1.0 else 1.0
+        else:
+            t_stat = r_value * np.sqrt(dof / ((1.0 - r_value) * (1.0 + r_value)))
+            p_value = 2 * stats.t.sf(abs(t_stat), dof)
+        
+        return float(slope), float(r_value), float(p_value)
+
+    def _detect_seasonality(self, series: pd.Series, metric: str) -> Dict[str, Any]:
         """季節性検出"""
         try:
             seasonality_info = {"detected": False}
@@ -295,14 +467,62 @@ class TrendAnalyzerService:
             if len(series) < 14:  # 最低2週間必要
                 return seasonality_info
             
-            # FFTによる周期性検出
-            fft_values = fft(series.values)
-            frequencies = fftfreq(len(series))
+            # 既知周期（週・月・四半期・年）の自己相関を直接計算
+            y = series.to_numpy(dtype=np.float64)
+            yc = y - y.mean()
+            denom = yc @ yc
+            lag_correlations = {}
+            if denom > 0:
+                for lag in SEASONAL_LAGS:
+                    if len(y) > 2 * lag:
+                        lag_correlations[lag] = float((yc[:-lag] @ yc[lag:]) / denom)
+            
+            significant_lags = [
+                lag for lag, acf in lag_correlations.items()
+                if acf > self.SEASONAL_ACF_THRESHOLD
+            ]
+            
+            if significant_lags:
+                dominant_lag = max(significant_lags, key=lag_correlations.get)
+                seasonality_info.update({
+                    "detected": True,
+                    "dominant_period": float(dominant_lag),
+                    "pattern_type": SEASONAL_LAGS[dominant_lag],
+                    "strength": lag_correlations[dominant_lag],
+                    "all_periods": [float(lag) for lag in significant_lags]
+                })
+            elif self.FFT_SEASONALITY_FALLBACK:
+                # 既知周期に該当しない場合のみFFTで任意周期を探索
+                seasonality_info.update(self._detect_custom_period_fft(series))
+            
+            # 自己相関による週次パターン確認
+            weekly_correlation = lag_correlations.get(7, 0)
+            if weekly_correlation > 0.5:
+                seasonality_info.update({
+                    "weekly_pattern": True,
+                    "weekly_correlation": weekly_correlation
+                })
             
-            # 正の周波数のみ使用
-            positive_freq_idx = frequencies > 0
-            positive_freqs = frequencies[positive_freq_idx]
-            positive_magnitudes = np.abs(fft_values[positive_freq_idx])
+            return seasonality_info
+            
+        except Exception as e:
+            logger.error(f"季節性検出エラー ({metric}): {e}")
+            return {"detected": False, "error": str(e)}
+
+    def _detect_custom_period_fft(self, series: pd.Series) -> Dict[str, Any]:
+        """FFTによる任意周期の検出"""
+        try:
+            seasonality_info = {}
+            
+            # 実数FFTによる周期性検出（非負周波数のみ計算される）
+            n = len(series)
+            fft_values = rfft(series.to_numpy(dtype=np.float64))
+            frequencies = rfftfreq(n)
+            
+            # 正の周波数のみ使用（直流成分とナイキスト周波数を除くスライス）
+            positive_end = (n + 1) // 2
+            positive_freqs = frequencies[1:positive_end]
+            positive_magnitudes = np.abs(fft_values[1:positive_end])
             
             # ピーク検出
             peaks, _ = find_peaks(positive_magnitudes, height=np.max(positive_magnitudes) * 0.3)
@@ -333,38 +553,38 @@ class TrendAnalyzerService:
                     "all_periods": [float(1/positive_freqs[p]) for p in peaks if positive_freqs[p] != 0]
                 })
             
-            # 自己相関による週次パターン確認
-            if len(series) >= 14:
-                weekly_correlation = series.autocorr(lag=7) if len(series) > 7 else 0
-                if weekly_correlation > 0.5:
-                    seasonality_info.update({
-                        "weekly_pattern": True,
-                        "weekly_correlation": float(weekly_correlation)
-                    })
-            
             return seasonality_info
             
         except Exception as e:
-            logger.error(f"季節性検出エラー ({metric}): {e}")
-            return {"detected": False, "error": str(e)}
+            logger.error(f"FFT周期検出エラー: {e}")
+            return {}
 
-    def _analyze_volatility(self, series: pd.Series) -> Dict[str, Any]:
+    def _analyze_volatility(
+        self, 
+        series: pd.Series, 
+        summary: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Any]:
         """変動性分析"""
         try:
+            if summary is None:
+                summary = summary_statistics(series.to_numpy(dtype=np.float64))
+            
             # 基本的な変動指標
             volatility_metrics = {
-                "standard_deviation": float(series.std()),
-                "coefficient_of_variation": float(series.std() / series.mean()) if series.mean() != 0 else 0,
-                "range": float(series.max() - series.min()),
-                "iqr": float(series.quantile(0.75) - series.quantile(0.25))
+                "standard_deviation": summary["std"],
+                "coefficient_of_variation": summary["std"] / summary["mean"] if summary["mean"] != 0 else 0,
+                "range": summary["max"] - summary["min"],
+                "iqr": summary["q3"] - summary["q1"]
             }
             
             # 移動変動性（Rolling Volatility）
             if len(series) >= 7:
-                rolling_std = series.rolling(window=7).std()
+                first_std, last_std, mean_std = rolling_std_summary(
+                    series.to_numpy(dtype=np.float64), 7
+                )
                 volatility_metrics.update({
-                    "rolling_volatility_mean": float(rolling_std.mean()),
-                    "rolling_volatility_trend": "increasing" if rolling_std.iloc[-1] > rolling_std.iloc[0] else "decreasing"
+                    "rolling_volatility_mean": mean_std,
+                    "rolling_volatility_trend": "increasing" if last_std > first_std else "decreasing"
                 })
             
             # 変動性レベルの分類
@@ -386,7 +606,7 @@ class TrendAnalyzerService:
             logger.error(f"変動性分析エラー: {e}")
             return {"volatility_level": "unknown", "error": str(e)}
 
-    async def _generate_forecast(
+    def _generate_forecast(
         self, 
         series: pd.Series, 
         metric: str, 
@@ -403,35 +623,39 @@ class TrendAnalyzerService:
             if len(X) == 0:
                 return []
             
-            # モデル選択と学習
-            model = self.prediction_models['random_forest']
-            model.fit(X, y)
+            # 学習済みモデル取得（データ未変更なら再学習しない）
+            model = self._get_fitted_forecast_model(site_id, metric, series, X, y)
             
-            # 予測実行
+            # 予測期間分の特徴量を一括生成し、1回のpredictで予測
             forecast_horizon = self.prediction_models['config']['forecast_horizon']
-            forecasts = []
+            X_future = self._generate_future_feature_matrix(series, forecast_horizon)
             
-            # 予測期間分の特徴量生成
-            last_index = len(series)
-            for i in range(1, forecast_horizon + 1):
-                future_features = self._generate_future_features(series, last_index + i)
+            if len(X_future) == 0:
+                return []
+            
+            predictions = model.predict(X_future)
+            
+            # 信頼区間計算（簡単な方法）
+            # 実際の実装では、より高度な信頼区間推定を使用
+            prediction_std = series.std() * 0.1  # 簡易実装
+            confidence_lower = predictions - 1.96 * prediction_std
+            confidence_upper = predictions + 1.96 * prediction_std
+            confidence_level = self.prediction_models['config']['confidence_interval']
+            
+            # 日付インデックスがなければ現在時刻（UTC）を起点にする
+            base_date = series.index[-1] if hasattr(series.index, 'to_pydatetime') else datetime.now(timezone.utc)
+            
+            forecasts = []
+            for i in range(forecast_horizon):
+                forecast_date = base_date + timedelta(days=i + 1)
                 
-                if len(future_features) > 0:
-                    prediction = model.predict([future_features])[0]
-                    
-                    # 信頼区間計算（簡単な方法）
-                    # 実際の実装では、より高度な信頼区間推定を使用
-                    prediction_std = series.std() * 0.1  # 簡易実装
-                    
-                    forecast_date = series.index[-1] + timedelta(days=i) if hasattr(series.index, 'to_pydatetime') else datetime.utcnow() + timedelta(days=i)
-                    
-                    forecasts.append({
-                        "date": forecast_date.isoformat() if hasattr(forecast_date, 'isoformat') else str(forecast_date),
-                        "predicted_value": float(prediction),
-                        "confidence_lower": float(prediction - 1.96 * prediction_std),
-                        "confidence_upper": float(prediction + 1.96 * prediction_std),
-                        "confidence_level": self.prediction_models['config']['confidence_interval']
-                    })
+                forecasts.append({
+                    "date": forecast_date.isoformat() if hasattr(forecast_date, 'isoformat') else str(forecast_date),
+                    "predicted_value": float(predictions[i]),
+                    "confidence_lower": float(confidence_lower[i]),
+                    "confidence_upper": float(confidence_upper[i]),
+                    "confidence_level": confidence_level
+                })
             
             return forecasts
             
@@ -439,52 +663,166 @@ class TrendAnalyzerService:
             logger.error(f"予測生成エラー ({metric}): {e}")
             return []
 
+    def _get_fitted_forecast_model(
+        self, 
+        site_id: str, 
+        metric: str, 
+        series: pd.Series, 
+        X: np.ndarray, 
+        y: np.ndarray
+    ) -> RandomForestRegressor:
+        """(site_id, metric)単位の学習済みモデルを取得（系列の指紋が一致すれば再利用）"""
+        fingerprint = self._series_fingerprint(series)
+        
+        cache_key = (site_id, metric)
+        with self._model_cache_lock:
+            cached = self.forecast_model_cache.get(cache_key)
+            if cached and cached[0] == fingerprint:
+                self.forecast_model_cache.move_to_end(cache_key)
+                return cached[1]
+        
+        # メトリクス毎に独立したモデルを学習（共有モデルの状態競合を回避）
+        # 学習はロック外で行い、他メトリクスの学習と並行させる
+        model = clone(self.prediction_models['random_forest'])
+        model.fit(X, y)
+        
+        with self._model_cache_lock:
+            self.forecast_model_cache[cache_key] = (fingerprint, model)
+            self.forecast_model_cache.move_to_end(cache_key)
+            while len(self.forecast_model_cache) > self.MAX_FORECAST_MODELS:
+                self.forecast_model_cache.popitem(last=False)
+        
+        return model
+
+    def _series_fingerprint(self, series: pd.Series, date_anchor: str = "") -> str:
+        """
+        系列の値と長さから指紋を計算
+        
+        学習済みモデルはX・yだけで決まるため日時は含めない。予測日付に依存するキャッシュはdate_anchorで日時を加える
+        """
+        values = np.ascontiguousarray(series.to_numpy(dtype=np.float64))
+        return hashlib.blake2b(
+            values.tobytes() + f"{len(values)}:{date_anchor}".encode(), digest_size=16
+        ).hexdigest()
+
+    def _forecast_cache_keys(
+        self, 
+        site_id: str, 
+        series_by_metric: Dict[str, pd.Series]
+    ) -> Dict[str, str]:
+        """予測対象メトリクスの予測結果キャッシュキー"""
+        if not self.redis_client:
+            return {}
+        
+        # 予測日付は最終日時から決まるため、その日付部分（時刻は丸める）を指紋に含める
+        min_points = self.prediction_models['config']['min_data_points']
+        return {
+            metric: (
+                f"forecast:{site_id}:{metric}:"
+                f"{self._series_fingerprint(series, self._forecast_date_anchor(series))}"
+            )
+            for metric, series in series_by_metric.items()
+            if pd.api.types.is_numeric_dtype(series.dtype) and len(series) >= min_points
+        }
+
+    @staticmethod
+    def _forecast_date_anchor(series: pd.Series) -> str:
+        """予測結果キャッシュ用の日付起点（日時インデックスは日付に丸める）"""
+        last_index = series.index[-1]
+        if isinstance(last_index, pd.Timestamp):
+            return last_index.normalize().isoformat()
+        return str(last_index)
+
+    async def _get_cached_forecasts(
+        self, 
+        cache_keys: Dict[str, str]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """予測結果キャッシュ一括取得（MGET）"""
+        if not cache_keys:
+            return {}
+        
+        try:
+            metrics = list(cache_keys)
+            values = await self.redis_client.mget([cache_keys[m] for m in metrics])
+            return {
+                metric: orjson.loads(value)
+                for metric, value in zip(metrics, values)
+                if value
+            }
+        except Exception as e:
+            logger.warning(f"予測キャッシュ取得エラー: {e}")
+            return {}
+
+    async def _save_cached_forecasts(self, items: List[Tuple[str, List[Dict[str, Any]]]]):
+        """予測結果キャッシュ一括保存（パイプライン）"""
+        if not items:
+            return
+        
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for cache_key, forecast in items:
+                    pipe.setex(
+                        cache_key,
+                        self.FORECAST_CACHE_TTL,
+                        orjson.dumps(forecast, option=orjson.OPT_SERIALIZE_NUMPY)
+                    )
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"予測キャッシュ保存エラー: {e}")
+
     def _prepare_forecast_features(self, series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
         """予測用特徴量準備"""
         try:
-            if len(series) < 7:
+            if len(series) <= 7:
                 return np.array([]), np.array([])
             
-            features = []
-            targets = []
-            
-            # ラグ特徴量と移動平均特徴量を使用
-            for i in range(7, len(series)):
-                feature_vector = [
-                    series.iloc[i-1],  # 前日
-                    series.iloc[i-7],  # 1週間前
-                    series.iloc[i-7:i].mean(),  # 過去7日平均
-                    series.iloc[i-3:i].mean(),  # 過去3日平均
-                    i,  # トレンド項
-                    i % 7,  # 曜日効果
-                ]
-                
-                features.append(feature_vector)
-                targets.append(series.iloc[i])
-            
-            return np.array(features), np.array(targets)
+            # ラグ特徴量と移動平均特徴量を使用（i = 7 .. N-1 を一括生成）
+            values = series.to_numpy(dtype=np.float64)
+            n = len(values)
+            index = np.arange(7, n)
+            features = np.column_stack([
+                values[6:n - 1],  # 前日
+                values[0:n - 7],  # 1週間前
+                sliding_window_view(values[:n - 1], 7).mean(axis=1),  # 過去7日平均
+                sliding_window_view(values[4:n - 1], 3).mean(axis=1),  # 過去3日平均
+                index,  # トレンド項
+                index % 7,  # 曜日効果
+            ])
+            targets = values[7:]
+            
+            # float32で保持し、学習は直近のウィンドウに限定
+            X = np.asarray(features, dtype=np.float32)
+            y = np.asarray(targets, dtype=np.float32)
+            if X.shape[0] > self.FORECAST_TRAINING_WINDOW:
+                X = X[-self.FORECAST_TRAINING_WINDOW:]
+                y = y[-self.FORECAST_TRAINING_WINDOW:]
+            
+            return X, y
             
         except Exception as e:
             logger.error(f"特徴量準備エラー: {e}")
             return np.array([]), np.array([])
 
-    def _generate_future_features(self, series: pd.Series, future_index: int) -> List[float]:
-        """未来特徴量生成"""
+    def _generate_future_feature_matrix(self, series: pd.Series, horizon: int) -> np.ndarray:
+        """予測期間全体の未来特徴量行列生成 (horizon × 6)"""
         try:
             if len(series) < 7:
-                return []
+                return np.array([])
             
-            return [
-                series.iloc[-1],  # 最新値
-                series.iloc[-7] if len(series) >= 7 else series.iloc[0],  # 1週間前
-                series.iloc[-7:].mean() if len(series) >= 7 else series.mean(),  # 過去7日平均
-                series.iloc[-3:].mean(),  # 過去3日平均
-                future_index,  # トレンド項
-                future_index % 7,  # 曜日効果
-            ]
+            # ラグ特徴量は系列末尾から決まる定数（再帰予測はしない）
+            future_index = np.arange(len(series) + 1, len(series) + horizon + 1)
+            X_future = np.empty((horizon, 6), dtype=np.float32)
+            X_future[:, 0] = series.iloc[-1]  # 最新値
+            X_future[:, 1] = series.iloc[-7]  # 1週間前
+            X_future[:, 2] = series.iloc[-7:].mean()  # 過去7日平均
+            X_future[:, 3] = series.iloc[-3:].mean()  # 過去3日平均
+            X_future[:, 4] = future_index  # トレンド項
+            X_future[:, 5] = future_index % 7  # 曜日効果
+            
+            return X_future
             
         except Exception:
-            return []
+            return np.array([])
 
     def _identify_support_resistance(self, series: pd.Series) -> Dict[str, Any]:
         """サポート・レジスタンスレベル識別"""
@@ -492,16 +830,15 @@ class TrendAnalyzerService:
             if len(series) < 10:
                 return {"support_levels": [], "resistance_levels": []}
             
-            # ローカルミニマ（サポート）とマキシマ（レジスタンス）を検出
-            from scipy.signal import argrelextrema
+            # ローカルミニマ（サポート）とマキシマ（レジスタンス）を1回で検出
+            values = series.to_numpy(dtype=np.float64)
+            local_minima, local_maxima = local_extrema(values, order=3)
             
             # ローカルミニマ（サポートレベル）
-            local_minima = argrelextrema(series.values, np.less, order=3)[0]
-            support_levels = [float(series.iloc[i]) for i in local_minima]
+            support_levels = values[local_minima].tolist()
             
             # ローカルマキシマ（レジスタンスレベル）
-            local_maxima = argrelextrema(series.values, np.greater, order=3)[0]
-            resistance_levels = [float(series.iloc[i]) for i in local_maxima]
+            resistance_levels = values[local_maxima].tolist()
             
             # 重要なレベルのみ抽出（出現頻度ベース）
             support_levels = self._filter_significant_levels(support_levels, series)
@@ -524,15 +861,17 @@ class TrendAnalyzerService:
                 return []
             
             # レベル周辺での価格滞在回数をカウント
-            significant_levels = []
             tolerance = series.std() * 0.1  # 許容範囲
+            levels_arr = np.asarray(levels, dtype=np.float64)
             
-            for level in levels:
-                nearby_count = sum(1 for value in series if abs(value - level) <= tolerance)
-                if nearby_count >= 2:  # 2回以上近づいた場合のみ
-                    significant_levels.append(level)
+            # ソート済み配列の二分探索で[level ± tolerance]内の件数を計算
+            # （N×Lの一時行列を作らずO(N+L)メモリで済む）
+            sorted_values = np.sort(series.to_numpy(dtype=np.float64))
+            nearby_counts = np.searchsorted(sorted_values, levels_arr + tolerance, side='right')
+            nearby_counts -= np.searchsorted(sorted_values, levels_arr - tolerance, side='left')
             
-            return significant_levels[:5]  # 最大5個まで
+            # 2回以上近づいた場合のみ
+            return levels_arr[nearby_counts >= 2][:5].tolist()  # 最大5個まで
             
         except Exception:
             return levels[:5]
@@ -568,40 +907,47 @@ class TrendAnalyzerService:
     async def _analyze_seasonal_patterns(
         self, 
         site_id: str, 
-        date_range: Dict[str, datetime]
+        data: pd.DataFrame,
+        extended_range: Dict[str, datetime]
     ) -> Dict[str, Any]:
-        """季節パターン分析"""
+        """季節パターン分析（dataは季節性検出用に取得済みの長期データ）"""
         try:
-            # 長期データ取得（季節性検出用）
-            extended_start = date_range['start'] - timedelta(days=365)
-            extended_range = {"start": extended_start, "end": date_range['end']}
-            
-            data = await self._fetch_trend_data(site_id, extended_range)
-            
             if data.empty:
                 return {"patterns_detected": False}
             
             patterns = {}
-            metrics = self._get_default_trend_metrics(data)
-            
-            for metric in metrics:
-                if metric in data.columns:
-                    series = data[metric].dropna()
-                    
-                    # 曜日パターン
-                    if hasattr(series.index, 'dayofweek'):
-                        weekday_pattern = series.groupby(series.index.dayofweek).mean().to_dict()
-                        patterns[f"{metric}_weekday"] = weekday_pattern
-                    
-                    # 月次パターン
-                    if hasattr(series.index, 'month'):
-                        monthly_pattern = series.groupby(series.index.month).mean().to_dict()
-                        patterns[f"{metric}_monthly"] = monthly_pattern
-                    
-                    # 時間帯パターン（時間別データがある場合）
-                    if hasattr(series.index, 'hour'):
-                        hourly_pattern = series.groupby(series.index.hour).mean().to_dict()
-                        patterns[f"{metric}_hourly"] = hourly_pattern
+            metrics = [m for m in self._get_default_trend_metrics(data) if m in data.columns]
+            values = data[metrics].to_numpy(dtype=np.float64)
+            index = data.index
+            
+            # 周期キーは1回だけ計算し、全メトリクスで共有
+            period_keys = {}
+            
+            # 曜日パターン
+            if hasattr(index, 'dayofweek'):
+                period_keys['weekday'] = np.asarray(index.dayofweek, dtype=np.intp)
+            
+            # 月次パターン
+            if hasattr(index, 'month'):
+                period_keys['monthly'] = np.asarray(index.month, dtype=np.intp)
+            
+            # 時間帯パターン（時間別データがある場合）
+            if hasattr(index, 'hour'):
+                period_keys['hourly'] = np.asarray(index.hour, dtype=np.intp)
+            
+            # 欠損を除いた重み付きbincountで周期別平均を計算
+            for j, metric in enumerate(metrics):
+                column = values[:, j]
+                valid = ~np.isnan(column)
+                weights = column[valid]
+                for period_name, keys in period_keys.items():
+                    valid_keys = keys[valid]
+                    counts = np.bincount(valid_keys)
+                    sums = np.bincount(valid_keys, weights=weights)
+                    present = np.flatnonzero(counts)
+                    patterns[f"{metric}_{period_name}"] = {
+                        int(k): float(sums[k] / counts[k]) for k in present
+                    }
             
             # パターンをキャッシュに保存
             if patterns:
@@ -620,29 +966,24 @@ class TrendAnalyzerService:
     async def _forecast_trends(
         self, 
         site_id: str, 
-        date_range: Dict[str, datetime]
+        date_range: Dict[str, datetime],
+        trend_data: Optional[Dict[str, TrendData]] = None
     ) -> Dict[str, Any]:
-        """トレンド予測"""
+        """トレンド予測（トレンド分析結果に含まれる予測を期間別に整形）"""
         try:
-            data = await self._fetch_trend_data(site_id, date_range)
-            
-            if data.empty:
-                return {"forecasts": {}}
+            if trend_data is None:
+                trend_data = await self.analyze_trends(site_id, date_range)
             
             forecasts = {}
-            metrics = self._get_default_trend_metrics(data)
-            
-            for metric in metrics:
-                if metric in data.columns:
-                    series = data[metric].dropna()
-                    forecast = await self._generate_forecast(series, metric, site_id)
-                    
-                    if forecast:
-                        forecasts[metric] = {
-                            "short_term": forecast[:7],  # 1週間
-                            "medium_term": forecast[:30],  # 1ヶ月
-                            "long_term": forecast  # 全期間
-                        }
+            for metric, trend in trend_data.items():
+                forecast = trend.forecast
+                
+                if forecast:
+                    forecasts[metric] = {
+                        "short_term": forecast[:7],  # 1週間
+                        "medium_term": forecast[:30],  # 1ヶ月
+                        "long_term": forecast  # 全期間
+                    }
             
             return {"forecasts": forecasts}
             
@@ -653,11 +994,13 @@ class TrendAnalyzerService:
     async def _identify_growth_opportunities(
         self, 
         site_id: str, 
-        date_range: Dict[str, datetime]
+        date_range: Dict[str, datetime],
+        trend_data: Optional[Dict[str, TrendData]] = None
     ) -> List[Dict[str, Any]]:
         """成長機会識別"""
         try:
-            trend_data = await self.analyze_trends(site_id, date_range)
+            if trend_data is None:
+                trend_data = await self.analyze_trends(site_id, date_range)
             opportunities = []
             
             for metric, trend in trend_data.items():
@@ -788,25 +1131,28 @@ class TrendAnalyzerService:
 
     def _get_default_trend_metrics(self, data: pd.DataFrame) -> List[str]:
         """デフォルトトレンドメトリクス取得"""
-        default_metrics = [
-            'page_views', 'unique_visitors', 'bounce_rate',
-            'conversion_rate', 'avg_session_duration', 'revenue'
-        ]
-        return [m for m in default_metrics if m in data.columns]
+        return list(_default_metrics_for(frozenset(data.columns)))
 
-    def _calculate_basic_statistics(self, series: pd.Series) -> Dict[str, float]:
+    def _calculate_basic_statistics(
+        self, 
+        series: pd.Series, 
+        summary: Optional[Dict[str, float]] = None
+    ) -> Dict[str, float]:
         """基本統計計算"""
+        # 歪度・尖度には3点以上の数値データが必要（例外を使わず事前に判定）
+        if len(series) < 3 or not np.issubdtype(series.dtype, np.number):
+            return {}
+        
         try:
+            if summary is None:
+                summary = summary_statistics(series.to_numpy(dtype=np.float64))
+            
             return {
-                "mean": float(series.mean()),
-                "median": float(series.median()),
-                "std": float(series.std()),
-                "min": float(series.min()),
-                "max": float(series.max()),
-                "skewness": float(series.skew()),
-                "kurtosis": float(series.kurtosis())
+                key: summary[key]
+                for key in ("mean", "median", "std", "min", "max", "skewness", "kurtosis")
             }
-        except:
+        except (ValueError, FloatingPointError) as e:
+            logger.debug(f"基本統計計算エラー: {e}")
             return {}
 
     def _create_insufficient_data_trend(self, metric: str) -> TrendData:
@@ -821,6 +1167,18 @@ class TrendAnalyzerService:
             forecast=[]
         )
 
+    def _create_stable_trend(self, metric: str, n_points: int) -> TrendData:
+        """定数系列のトレンド（変化なし）"""
+        return TrendData(
+            metric_name=metric,
+            period=f"{n_points}d",
+            direction="stable",
+            magnitude=0.0,
+            confidence=0.95,
+            seasonality={"detected": False},
+            forecast=[]
+        )
+
     def _create_error_trend(self, metric: str, error: str) -> TrendData:
         """エラー時のデフォルトトレンド"""
         return TrendData(
@@ -838,19 +1196,34 @@ class TrendAnalyzerService:
         try:
             pattern_data = {
                 "patterns": patterns,
-                "updated_at": datetime.utcnow().isoformat()
+                "updated_at": utcnow_iso()
             }
             
             cache_key = f"seasonal_patterns:{site_id}"
             await self.redis_client.setex(
                 cache_key, 
-                86400 * 30,  # 30日間保持
-                json.dumps(pattern_data)
+                self.SEASONAL_PATTERN_TTL,
+                self._encode_pattern_payload(pattern_data)
             )
             
         except Exception as e:
             logger.error(f"季節パターン保存エラー: {e}")
 
+    def _encode_pattern_payload(self, pattern_data: Dict[str, Any]) -> bytes:
+        """季節パターンをJSON化して圧縮（識別子付き）"""
+        payload = orjson.dumps(
+            pattern_data,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+        return self.COMPRESSED_PAYLOAD_PREFIX + zlib.compress(payload, 3)
+
+    def _decode_pattern_payload(self, payload: bytes) -> Dict[str, Any]:
+        """季節パターンの復元（圧縮前の旧形式JSONにも対応）"""
+        prefix = self.COMPRESSED_PAYLOAD_PREFIX
+        if isinstance(payload, bytes) and payload.startswith(prefix):
+            payload = zlib.decompress(payload[len(prefix):])
+        return orjson.loads(payload)
+
     async def _fetch_trend_data(
         self, 
         site_id: str, 
@@ -863,33 +1236,28 @@ class TrendAnalyzerService:
             start_date = date_range['start']
             end_date = date_range['end']
             
-            dates = pd.date_range(start=start_date, end=end_date, freq='D')
+            return _sample_trend_data(start_date, end_date)
             
-            # サンプルデータ生成
-            np.random.seed(42)
-            n_points = len(dates)
-            
-            # トレンドとノイズを含むデータ
-            trend = np.linspace(1000, 1200, n_points)  # 上昇トレンド
-            seasonal = 100 * np.sin(2 * np.pi * np.arange(n_points) / 7)  # 週次季節性
-            noise = np.random.normal(0, 50, n_points)
+        except Exception as e:
+            logger.error(f"トレンドデータ取得エラー: {e}")
+            return pd.DataFrame()
+
+    async def cleanup(self):
+        """クリーンアップ"""
+        try:
+            # CPUプール停止
+            if self._cpu_pool:
+                self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+                self._cpu_pool = None
             
-            data = pd.DataFrame({
-                'timestamp': dates,
-                'page_views': trend + seasonal + noise,
-                'unique_visitors': (trend + seasonal + noise) * 0.4,
-                'bounce_rate': np.clip(0.6 + np.random.normal(0, 0.1, n_points), 0, 1),
-                'conversion_rate': np.clip(0.03 + np.random.normal(0, 0.005, n_points), 0, 1),
-                'avg_session_duration': 180 + np.random.normal(0, 30, n_points),
-                'revenue': (trend + seasonal + noise) * 0.8
-            })
+            # Redis接続クローズ
+            if self.redis_client:
+                await self.redis_client.close()
             
-            data = data.set_index('timestamp')
-            return data
+            logger.info("トレンド分析サービスクリーンアップ完了")
             
         except Exception as e:
-            logger.error(f"トレンドデータ取得エラー: {e}")
-            return pd.DataFrame()
+            logger.error(f"クリーンアップエラー: {e}")
 
     async def health_check(self) -> bool:
         """ヘルスチェック"""
@@ -1,5 +1,6 @@
 import pytest
 import asyncio
+import copy
 import os
 from typing import AsyncGenerator, Generator
 from unittest.mock import AsyncMock, MagicMock
@@ -53,10 +54,9 @@ async def async_client() -> AsyncGenerator[AsyncClient, None]:
         yield ac
 
 
-@pytest.fixture
-def mock_redis():
-    """Mock Redis client."""
-    redis_mock = AsyncMock()
+def _configure_mock_redis(redis_mock):
+    """Install default Redis mock behaviour."""
+    redis_mock.reset_mock(side_effect=True)
     redis_mock.get = AsyncMock(return_value=None)
     redis_mock.set = AsyncMock(return_value=True)
     redis_mock.setex = AsyncMock(return_value=True)
@@ -67,18 +67,50 @@ def mock_redis():
     return redis_mock
 
 
-@pytest.fixture
-def mock_openai():
-    """Mock OpenAI client."""
-    openai_mock = MagicMock()
+def _configure_mock_openai(openai_mock):
+    """Install default OpenAI mock behaviour."""
+    openai_mock.reset_mock(side_effect=True)
     openai_mock.chat.completions.create = AsyncMock()
     openai_mock.embeddings.create = AsyncMock()
     return openai_mock
 
 
-@pytest.fixture
-def sample_analytics_data():
-    """Sample analytics data for testing."""
+def _configure_mock_websocket_manager(manager_mock):
+    """Install default WebSocket manager mock behaviour."""
+    manager_mock.reset_mock(side_effect=True)
+    manager_mock.connect = AsyncMock()
+    manager_mock.disconnect = AsyncMock()
+    manager_mock.send_personal_message = AsyncMock()
+    manager_mock.broadcast = AsyncMock()
+    manager_mock.active_connections = []
+    return manager_mock
+
+
+def _configure_mock_database(db_mock):
+    """Install default database mock behaviour."""
+    db_mock.reset_mock(side_effect=True)
+    db_mock.execute = AsyncMock()
+    db_mock.fetch = AsyncMock(return_value=[])
+    db_mock.fetchone = AsyncMock(return_value=None)
+    db_mock.fetchval = AsyncMock(return_value=None)
+    return db_mock
+
+
+@pytest.fixture(scope="session")
+def mock_redis():
+    """Mock Redis client (shared across the session, reset after each test)."""
+    return _configure_mock_redis(AsyncMock())
+
+
+@pytest.fixture(scope="session")
+def mock_openai():
+    """Mock OpenAI client (shared across the session, reset after each test)."""
+    return _configure_mock_openai(MagicMock())
+
+
+@pytest.fixture(scope="session")
+def _shared_sample_analytics_data():
+    """Sample analytics data for testing (built once per session)."""
     return {
         "site_id": "test-site-123",
         "page_views": [
@@ -120,8 +152,14 @@ def sample_analytics_data():
 
 
 @pytest.fixture
-def sample_user_behavior():
-    """Sample user behavior data for testing."""
+def sample_analytics_data(_shared_sample_analytics_data):
+    """Sample analytics data for testing (a fresh copy of the session data, safe to mutate)."""
+    return copy.deepcopy(_shared_sample_analytics_data)
+
+
+@pytest.fixture(scope="session")
+def _shared_sample_user_behavior():
+    """Sample user behavior data for testing (built once per session)."""
     return {
         "user_id": "test-user-123",
         "sessions": [
@@ -145,24 +183,24 @@ def sample_user_behavior():
 
 
 @pytest.fixture
+def sample_user_behavior(_shared_sample_user_behavior):
+    """Sample user behavior data for testing (a fresh copy of the session data, safe to mutate)."""
+    return copy.deepcopy(_shared_sample_user_behavior)
+
+
+@pytest.fixture(scope="session")
 def mock_websocket_manager():
-    """Mock WebSocket manager."""
-    manager_mock = MagicMock()
-    manager_mock.connect = AsyncMock()
-    manager_mock.disconnect = AsyncMock()
-    manager_mock.send_personal_message = AsyncMock()
-    manager_mock.broadcast = AsyncMock()
-    manager_mock.active_connections = []
-    return manager_mock
+    """Mock WebSocket manager (shared across the session, reset after each test)."""
+    return _configure_mock_websocket_manager(MagicMock())
 
 
-@pytest.fixture
-def sample_anomaly_data():
-    """Sample data for anomaly detection testing."""
+@pytest.fixture(scope="session")
+def _shared_sample_anomaly_data():
+    """Sample data for anomaly detection testing (built once per session)."""
     import numpy as np
     
-    # Generate normal data with some anomalies
-    normal_data = np.random.normal(100, 10, 100).tolist()
+    # Generate normal data with some anomalies (local generator, leaves the global RNG state alone)
+    normal_data = np.random.default_rng(42).normal(100, 10, 100).tolist()
     anomalies = [200, 300, 50, 10]  # Clear anomalies
     
     data = normal_data + anomalies
@@ -176,65 +214,84 @@ def sample_anomaly_data():
 
 
 @pytest.fixture
+def sample_anomaly_data(_shared_sample_anomaly_data):
+    """Sample data for anomaly detection testing (a fresh copy of the session data, safe to mutate)."""
+    return copy.deepcopy(_shared_sample_anomaly_data)
+
+
+@pytest.fixture(scope="session")
 def mock_database():
-    """Mock database operations."""
-    db_mock = AsyncMock()
-    db_mock.execute = AsyncMock()
-    db_mock.fetch = AsyncMock(return_value=[])
-    db_mock.fetchone = AsyncMock(return_value=None)
-    db_mock.fetchval = AsyncMock(return_value=None)
-    return db_mock
+    """Mock database operations (shared across the session, reset after each test)."""
+    return _configure_mock_database(AsyncMock())
 
 
-# Test data factories using factory_boy
-import factory
-from datetime import datetime, timezone
+@pytest.fixture(autouse=True)
+def _reset_shared_mocks(mock_redis, mock_openai, mock_websocket_manager, mock_database):
+    """Restore the shared mocks to their default behaviour after each test."""
+    yield
+    _configure_mock_redis(mock_redis)
+    _configure_mock_openai(mock_openai)
+    _configure_mock_websocket_manager(mock_websocket_manager)
+    _configure_mock_database(mock_database)
 
 
-class AnalyticsDataFactory(factory.Factory):
-    class Meta:
-        model = dict
-    
-    site_id = factory.Faker('uuid4')
-    timestamp = factory.LazyFunction(lambda: datetime.now(timezone.utc).isoformat())
-    page_views = factory.Faker('random_int', min=1, max=1000)
-    unique_visitors = factory.Faker('random_int', min=1, max=500)
-    bounce_rate = factory.Faker('pyfloat', left_digits=1, right_digits=2, positive=True, max_value=1)
-    avg_session_duration = factory.Faker('random_int', min=30, max=3600)
+# Test data builders (plain functions sharing one Faker instance)
+from datetime import datetime, timezone
+from faker import Faker
 
+_faker = Faker()
 
-class UserSessionFactory(factory.Factory):
-    class Meta:
-        model = dict
-    
-    session_id = factory.Faker('uuid4')
-    user_id = factory.Faker('uuid4')
-    site_id = factory.Faker('uuid4')
-    start_time = factory.Faker('date_time')
-    end_time = factory.Faker('date_time')
-    page_views = factory.Faker('random_int', min=1, max=20)
-    events = factory.List([
-        factory.Dict({
-            'type': factory.Faker('word'),
-            'timestamp': factory.Faker('date_time'),
-            'data': factory.Dict({'element': factory.Faker('word')})
-        })
-        for _ in range(3)
-    ])
-
-
-class AIInsightFactory(factory.Factory):
-    class Meta:
-        model = dict
-    
-    insight_id = factory.Faker('uuid4')
-    site_id = factory.Faker('uuid4')
-    type = factory.Faker('word', ext_word_list=['trend', 'anomaly', 'recommendation'])
-    title = factory.Faker('sentence', nb_words=4)
-    description = factory.Faker('text', max_nb_chars=200)
-    confidence = factory.Faker('pyfloat', left_digits=1, right_digits=2, positive=True, max_value=1)
-    created_at = factory.LazyFunction(lambda: datetime.now(timezone.utc).isoformat())
-    metadata = factory.Dict({
-        'source': factory.Faker('word'),
-        'category': factory.Faker('word')
-    })
\ No newline at end of file
+
+def make_analytics_data(**overrides) -> dict:
+    """Build an analytics data record."""
+    data = {
+        'site_id': _faker.uuid4(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'page_views': _faker.random_int(min=1, max=1000),
+        'unique_visitors': _faker.random_int(min=1, max=500),
+        'bounce_rate': _faker.pyfloat(left_digits=1, right_digits=2, positive=True, max_value=1),
+        'avg_session_duration': _faker.random_int(min=30, max=3600),
+    }
+    data.update(overrides)
+    return data
+
+
+def make_user_session(**overrides) -> dict:
+    """Build a user session record."""
+    data = {
+        'session_id': _faker.uuid4(),
+        'user_id': _faker.uuid4(),
+        'site_id': _faker.uuid4(),
+        'start_time': _faker.date_time(),
+        'end_time': _faker.date_time(),
+        'page_views': _faker.random_int(min=1, max=20),
+        'events': [
+            {
+                'type': _faker.word(),
+                'timestamp': _faker.date_time(),
+                'data': {'element': _faker.word()}
+            }
+            for _ in range(3)
+        ],
+    }
+    data.update(overrides)
+    return data
+
+
+def make_ai_insight(**overrides) -> dict:
+    """Build an AI insight record."""
+    data = {
+        'insight_id': _faker.uuid4(),
+        'site_id': _faker.uuid4(),
+        'type': _faker.word(ext_word_list=['trend', 'anomaly', 'recommendation']),
+        'title': _faker.sentence(nb_words=4),
+        'description': _faker.text(max_nb_chars=200),
+        'confidence': _faker.pyfloat(left_digits=1, right_digits=2, positive=True, max_value=1),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'metadata': {
+            'source': _faker.word(),
+            'category': _faker.word()
+        },
+    }
+    data.update(overrides)
+    return data
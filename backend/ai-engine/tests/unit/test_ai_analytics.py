@@ -26,24 +26,30 @@ def ai_service():
     return AIAnalyticsService(settings)
 
 
-@pytest.fixture
-def sample_dataframe():
-    """Sample DataFrame for testing."""
+@pytest.fixture(scope="session")
+def _shared_sample_dataframe():
+    """Sample DataFrame built once per session (local generator, leaves the global RNG state alone)."""
     dates = pd.date_range(start='2023-01-01', end='2023-01-30', freq='D')
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
     
     return pd.DataFrame({
         'date': dates,
-        'page_views': np.random.poisson(1000, len(dates)),
-        'unique_visitors': np.random.poisson(400, len(dates)),
-        'sessions': np.random.poisson(600, len(dates)),
-        'bounce_rate': np.random.beta(2, 3, len(dates)),
-        'avg_session_duration': np.random.gamma(2, 60, len(dates)),
-        'conversions': np.random.poisson(20, len(dates)),
-        'revenue': np.random.gamma(2, 500, len(dates))
+        'page_views': rng.poisson(1000, len(dates)),
+        'unique_visitors': rng.poisson(400, len(dates)),
+        'sessions': rng.poisson(600, len(dates)),
+        'bounce_rate': rng.beta(2, 3, len(dates)),
+        'avg_session_duration': rng.gamma(2, 60, len(dates)),
+        'conversions': rng.poisson(20, len(dates)),
+        'revenue': rng.gamma(2, 500, len(dates))
     })
 
 
+@pytest.fixture
+def sample_dataframe(_shared_sample_dataframe):
+    """Sample DataFrame for testing (a fresh copy of the session frame, safe to mutate)."""
+    return _shared_sample_dataframe.copy()
+
+
 class TestAIAnalyticsService:
     """Test AI Analytics Service."""
 
@@ -176,6 +182,18 @@ class TestAIAnalyticsService:
         assert 10 in outliers
         assert 11 in outliers
 
+    def test_statistical_analysis_outlier_counts_match_per_column(self, ai_service, sample_dataframe):
+        """Batched outlier counts should match per-column outlier detection."""
+        df = sample_dataframe.copy()
+        df.loc[df.index[:3], 'revenue'] = np.nan
+        df.loc[df.index[5], 'page_views'] = 10_000
+
+        result = ai_service._perform_statistical_analysis(df)
+
+        for column, stats in result.items():
+            assert stats['outliers'] == len(ai_service._detect_outliers(df[column].dropna())), column
+        assert result['page_views']['outliers'] >= 1
+
     def test_seasonality_detection(self, ai_service):
         """Test seasonality detection."""
         # Create weekly pattern
@@ -269,6 +287,23 @@ class TestAIAnalyticsService:
         assert df['bounce_rate'].max() <= 1.0
         assert df['bounce_rate'].min() >= 0.0
 
+    def test_sample_data_is_shared_across_times_of_day_but_isolated(self, ai_service):
+        """Ranges of the same length should reuse values, and edits should not leak between calls."""
+        first = ai_service._generate_sample_data('test-site', {
+            'start': datetime(2023, 1, 1, 9, 15),
+            'end': datetime(2023, 1, 31, 9, 15)
+        })
+        original = first.loc[0, 'page_views']
+        first.loc[0, 'page_views'] = -1
+
+        second = ai_service._generate_sample_data('test-site', {
+            'start': datetime(2023, 3, 1, 17, 40),
+            'end': datetime(2023, 3, 31, 17, 40)
+        })
+
+        assert second.loc[0, 'page_views'] == original
+        assert second['date'].iloc[0] == pd.Timestamp('2023-03-01 17:40')
+
     @pytest.mark.asyncio
     async def test_cache_operations(self, ai_service, mock_redis):
         """Test cache operations."""
@@ -308,6 +343,14 @@ class TestAIAnalyticsService:
         next_steps = ai_service._extract_next_steps(sample_text)
         assert len(next_steps) > 0
 
+        # Single-pass extraction should agree with the individual extractors
+        extracted = ai_service._extract_all(sample_text)
+        assert extracted == {
+            'recommendations': recommendations,
+            'roi_predictions': roi_predictions,
+            'next_steps': next_steps,
+        }
+
     @pytest.mark.asyncio
     async def test_comprehensive_analysis_request(self, ai_service, mock_redis, mock_openai):
         """Test comprehensive analysis with mocked dependencies."""
@@ -413,6 +456,17 @@ class TestAIAnalyticsService:
         assert not result.empty
         assert 'test' in result.columns
 
+    def test_frame_payload_roundtrip_preserves_dtypes(self, ai_service, sample_dataframe):
+        """Cached frame payloads should restore values, dtypes and index."""
+        df = sample_dataframe.set_index('date')
+        df['visits'] = df['page_views'].astype(np.int32)
+
+        payload = ai_service._encode_frame_payload(df)
+        restored = ai_service._decode_frame_payload(payload)
+
+        assert payload.startswith(ai_service.FRAME_PAYLOAD_PREFIX)
+        pd.testing.assert_frame_equal(restored, df)
+
     @pytest.mark.parametric
     @pytest.mark.parametrize("data_points,expected_min_confidence", [
         (2000, 0.85),  # High data points should give high confidence
@@ -7,6 +7,15 @@ from unittest.mock import AsyncMock, MagicMock, patch
 from services.anomaly_detector import AnomalyDetector
 from config.settings import Settings
 
+# Shared timestamp indexes (DatetimeIndex is immutable, so tests can reuse them)
+_DATES_100 = pd.date_range(start='2023-01-01', periods=100, freq='H')
+_DATES_168 = pd.date_range(start='2023-01-01', periods=168, freq='H')
+
+# Trend and daily seasonality shared by the time series fixtures
+_PHASE = 2 * np.pi * np.arange(100) / 24
+_SEASONAL = 20 * np.sin(_PHASE)
+_TREND = np.linspace(100, 200, 100)
+
 
 @pytest.fixture
 def anomaly_detector():
@@ -19,17 +28,13 @@ def anomaly_detector():
     return AnomalyDetector(settings)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def normal_time_series():
-    """Normal time series data without anomalies."""
-    np.random.seed(42)
-    dates = pd.date_range(start='2023-01-01', periods=100, freq='H')
+    """Normal time series data without anomalies (shared across the session; copy before mutating)."""
+    dates = _DATES_100
     
     # Generate normal data with some trend and seasonality
-    trend = np.linspace(100, 200, 100)
-    seasonal = 20 * np.sin(2 * np.pi * np.arange(100) / 24)  # Daily pattern
-    noise = np.random.normal(0, 10, 100)
-    values = trend + seasonal + noise
+    values = _TREND + _SEASONAL + np.random.default_rng(42).normal(0, 10, 100)
     
     return pd.DataFrame({
         'timestamp': dates,
@@ -37,17 +42,13 @@ def normal_time_series():
     })
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def anomalous_time_series():
-    """Time series data with clear anomalies."""
-    np.random.seed(42)
-    dates = pd.date_range(start='2023-01-01', periods=100, freq='H')
+    """Time series data with clear anomalies (shared across the session; copy before mutating)."""
+    dates = _DATES_100
     
     # Generate normal data
-    trend = np.linspace(100, 200, 100)
-    seasonal = 20 * np.sin(2 * np.pi * np.arange(100) / 24)
-    noise = np.random.normal(0, 10, 100)
-    values = trend + seasonal + noise
+    values = _TREND + _SEASONAL + np.random.default_rng(42).normal(0, 10, 100)
     
     # Inject anomalies
     values[25] = 500  # Point anomaly - spike
@@ -110,12 +111,13 @@ class TestAnomalyDetector:
         await anomaly_detector.initialize()
         
         # Add features that provide context (hour of day, day of week)
-        anomalous_time_series['hour'] = anomalous_time_series['timestamp'].dt.hour
-        anomalous_time_series['day_of_week'] = anomalous_time_series['timestamp'].dt.dayofweek
+        contextual_series = anomalous_time_series.copy()
+        contextual_series['hour'] = contextual_series['timestamp'].dt.hour
+        contextual_series['day_of_week'] = contextual_series['timestamp'].dt.dayofweek
         
         context_features = ['hour', 'day_of_week']
         anomalies = await anomaly_detector.detect_contextual_anomalies(
-            anomalous_time_series, 
+            contextual_series, 
             context_features
         )
         
@@ -182,7 +184,7 @@ class TestAnomalyDetector:
     async def test_seasonal_anomaly_detection(self, anomaly_detector):
         """Test seasonal anomaly detection."""
         # Create data with clear seasonal pattern
-        dates = pd.date_range(start='2023-01-01', periods=168, freq='H')  # 1 week
+        dates = _DATES_168  # 1 week
         
         # Weekly pattern with anomaly
         pattern = np.tile([100, 90, 80, 85, 95, 110, 120], 24)  # Repeat daily pattern
@@ -386,7 +388,7 @@ class TestAnomalyDetector:
         """Test model update and concept drift detection."""
         # Initial data
         initial_data = pd.DataFrame({
-            'timestamp': pd.date_range(start='2023-01-01', periods=100, freq='H'),
+            'timestamp': _DATES_100,
             'value': np.random.normal(100, 10, 100)
         })
         
@@ -420,7 +422,7 @@ class TestAnomalyDetector:
         data[25] = 300  # Clear anomaly
         
         df = pd.DataFrame({
-            'timestamp': pd.date_range(start='2023-01-01', periods=100, freq='H'),
+            'timestamp': _DATES_100,
             'value': data
         })
         
@@ -0,0 +1,143 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from services.anomaly_detector import AnomalyDetectorService
+from config.settings import Settings
+from models.schemas import AlertSeverity
+
+
+@pytest.fixture
+def detector():
+    """Anomaly detector service fixture (models set up without Redis)."""
+    service = AnomalyDetectorService(Settings(anomaly_min_data_points=10))
+    service.models['statistical'] = {'z_threshold': 3.0, 'iqr_multiplier': 1.5}
+    return service
+
+
+class TestStreamingBaseline:
+    """Test the streaming sufficient-statistics baseline."""
+
+    @pytest.mark.asyncio
+    async def test_update_baseline_merges_batches(self, detector):
+        """Folding batches in one at a time should match the statistics of the whole series."""
+        values = np.random.default_rng(1).normal(100, 10, 50)
+        data = pd.DataFrame({
+            'timestamp': pd.date_range(start='2023-01-01', periods=50, freq='h'),
+            'value': values
+        })
+
+        await detector.update_baseline(data.iloc[:20])
+        await detector.update_baseline(data.iloc[20:45])
+        await detector.update_baseline(data.iloc[45:])
+
+        baseline = detector.baselines['default']['value']
+        assert baseline['count'] == 50
+        assert baseline['mean'] == pytest.approx(values.mean())
+        assert baseline['m2'] / 49 == pytest.approx(values.var(ddof=1))
+
+    @pytest.mark.asyncio
+    async def test_update_baseline_skips_missing_values(self, detector):
+        """NaN values should not count towards the baseline."""
+        data = pd.DataFrame({'value': [1.0, np.nan, 3.0]})
+
+        await detector.update_baseline(data, site_id='site-1')
+
+        baseline = detector.baselines['site-1']['value']
+        assert baseline['count'] == 2
+        assert baseline['mean'] == pytest.approx(2.0)
+
+    @pytest.mark.asyncio
+    async def test_detect_real_time_anomaly(self, detector):
+        """A point far from the running mean should be flagged, a nearby one should not."""
+        await detector.update_baseline(pd.DataFrame({
+            'timestamp': pd.date_range(start='2023-01-01', periods=50, freq='h'),
+            'value': np.random.default_rng(2).normal(100, 10, 50)
+        }))
+
+        normal = await detector.detect_real_time_anomaly(pd.DataFrame({
+            'timestamp': [pd.Timestamp('2023-01-03 02:00:00')],
+            'value': [105]
+        }))
+        assert normal['is_anomaly'] is False
+
+        anomalous = await detector.detect_real_time_anomaly(pd.DataFrame({
+            'timestamp': [pd.Timestamp('2023-01-03 03:00:00')],
+            'value': [300]
+        }))
+        assert anomalous['is_anomaly'] is True
+        assert anomalous['confidence'] > 0.8
+        assert anomalous['anomalies'][0].metric_name == 'value'
+        assert anomalous['anomalies'][0].severity == AlertSeverity.CRITICAL
+
+    @pytest.mark.asyncio
+    async def test_detect_real_time_anomaly_needs_enough_history(self, detector):
+        """Detection should stay silent until the baseline has the minimum number of points."""
+        await detector.update_baseline(pd.DataFrame({'value': [1.0, 2.0, 3.0]}))
+
+        result = await detector.detect_real_time_anomaly(pd.DataFrame({'value': [1000.0]}))
+
+        assert result['is_anomaly'] is False
+        assert result['anomalies'] == []
+
+
+class TestContinuityAnomalies:
+    """Test the trailing-window continuity detector."""
+
+    @staticmethod
+    def _series(n=72, seed=3):
+        return np.random.default_rng(seed).normal(1000, 20, n)
+
+    @pytest.mark.asyncio
+    async def test_flags_sudden_jump(self, detector):
+        """A sudden jump should be flagged against the trailing window's median."""
+        values = self._series()
+        values[50] = 1400
+        data = pd.DataFrame({
+            'timestamp': pd.date_range(start='2023-01-01', periods=len(values), freq='h'),
+            'page_views': values
+        })
+
+        anomalies = await detector._detect_continuity_anomalies(data, ['page_views'])
+
+        assert [a.timestamp for a in anomalies] == [data['timestamp'][50]]
+        assert anomalies[0].actual_value == 1400
+        assert anomalies[0].context['detection_method'] == 'continuity'
+
+    @pytest.mark.asyncio
+    async def test_ignores_ordinary_noise(self, detector):
+        """Plain noise should not produce continuity anomalies."""
+        data = pd.DataFrame({'page_views': self._series(n=500)})
+
+        assert await detector._detect_continuity_anomalies(data, ['page_views']) == []
+
+    @pytest.mark.asyncio
+    async def test_timestamps_follow_index_labels(self, detector):
+        """Timestamps should be looked up by label when the index is not a RangeIndex."""
+        values = self._series()
+        values[5] = np.nan
+        values[60] = 2000
+        data = pd.DataFrame({
+            'timestamp': pd.date_range(start='2023-01-01', periods=len(values), freq='h'),
+            'page_views': values
+        }, index=np.arange(len(values)) + 1000)
+
+        anomalies = await detector._detect_continuity_anomalies(data, ['page_views'])
+
+        assert [a.timestamp for a in anomalies] == [data.loc[1060, 'timestamp']]
+
+    @pytest.mark.asyncio
+    async def test_severity_uses_continuity_breakpoints(self, detector):
+        """Severity should scale with the robust score on the continuity breakpoints."""
+        values = self._series()
+        window = values[26:50]
+        median = np.median(window)
+        scale = np.median(np.abs(window - median)) * detector.MAD_TO_STD
+
+        values[50] = median + 6 * scale
+        low = await detector._detect_continuity_anomalies(pd.DataFrame({'page_views': values}), ['page_views'])
+        values[50] = median + 30 * scale
+        critical = await detector._detect_continuity_anomalies(pd.DataFrame({'page_views': values}), ['page_views'])
+
+        assert [a.severity.value for a in low] == ['low']
+        assert [a.severity.value for a in critical] == ['critical']
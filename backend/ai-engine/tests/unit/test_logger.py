@@ -0,0 +1,17 @@
+import os
+import subprocess
+import sys
+
+
+def test_logger_import_stays_lightweight():
+    """Importing utils.logger should not pull in JSON logging or numeric libraries."""
+    code = (
+        "import sys, utils.logger; "
+        "print(','.join(m for m in ('pythonjsonlogger', 'orjson', 'numpy', 'pandas') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    )
+    assert result.stdout.strip() == ""
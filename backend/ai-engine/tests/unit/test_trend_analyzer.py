@@ -0,0 +1,121 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from services.trend_analyzer import TrendAnalyzerService
+from config.settings import Settings
+
+
+@pytest.fixture
+def trend_analyzer():
+    """Trend analyzer fixture (no Redis)."""
+    return TrendAnalyzerService(Settings())
+
+
+def _series(start, periods=60, seed=0):
+    """Daily series whose values depend only on its length and seed."""
+    index = pd.date_range(start=start, periods=periods, freq='D', name='timestamp')
+    return pd.Series(np.random.default_rng(seed).normal(1000, 50, periods), index=index)
+
+
+class TestForecastModelCache:
+    """Test reuse of fitted forecast models."""
+
+    @pytest.mark.asyncio
+    async def test_model_is_reused_when_only_the_index_moves(self, trend_analyzer):
+        """A series with the same values but a later timestamp should hit the model cache."""
+        await trend_analyzer._initialize_prediction_models()
+        first = _series(datetime(2024, 1, 1, 9, 0, 0, 123456))
+        second = _series(datetime(2024, 1, 1, 9, 5, 0, 654321))
+        X, y = trend_analyzer._prepare_forecast_features(first)
+
+        model = trend_analyzer._get_fitted_forecast_model('site-1', 'page_views', first, X, y)
+        reused = trend_analyzer._get_fitted_forecast_model('site-1', 'page_views', second, X, y)
+
+        assert reused is model
+
+    @pytest.mark.asyncio
+    async def test_model_is_refit_when_values_change(self, trend_analyzer):
+        """Different values should produce a new model."""
+        await trend_analyzer._initialize_prediction_models()
+        first = _series(datetime(2024, 1, 1), seed=0)
+        second = _series(datetime(2024, 1, 1), seed=1)
+
+        model = trend_analyzer._get_fitted_forecast_model(
+            'site-1', 'page_views', first, *trend_analyzer._prepare_forecast_features(first)
+        )
+        refit = trend_analyzer._get_fitted_forecast_model(
+            'site-1', 'page_views', second, *trend_analyzer._prepare_forecast_features(second)
+        )
+
+        assert refit is not model
+
+    @pytest.mark.asyncio
+    async def test_model_cache_is_bounded(self, trend_analyzer, monkeypatch):
+        """The cache should evict the least recently used models beyond its limit."""
+        monkeypatch.setattr(TrendAnalyzerService, "MAX_FORECAST_MODELS", 2)
+        await trend_analyzer._initialize_prediction_models()
+        series = _series(datetime(2024, 1, 1), periods=20)
+        X, y = trend_analyzer._prepare_forecast_features(series)
+
+        for i in range(trend_analyzer.MAX_FORECAST_MODELS + 3):
+            trend_analyzer._get_fitted_forecast_model(f'site-{i}', 'page_views', series, X, y)
+
+        assert len(trend_analyzer.forecast_model_cache) == trend_analyzer.MAX_FORECAST_MODELS
+        assert ('site-0', 'page_views') not in trend_analyzer.forecast_model_cache
+
+    @pytest.mark.asyncio
+    async def test_fitted_models_are_single_threaded(self, trend_analyzer):
+        """Per-metric models run inside the thread pool, so each should use one job."""
+        await trend_analyzer._initialize_prediction_models()
+        series = _series(datetime(2024, 1, 1))
+
+        model = trend_analyzer._get_fitted_forecast_model(
+            'site-1', 'page_views', series, *trend_analyzer._prepare_forecast_features(series)
+        )
+
+        assert model.n_jobs == 1
+
+
+class TestForecastCacheKeys:
+    """Test Redis forecast cache keys."""
+
+    @pytest.mark.asyncio
+    async def test_key_is_stable_within_a_day(self, trend_analyzer):
+        """Keys should not change with the time of day of the last timestamp."""
+        await trend_analyzer._initialize_prediction_models()
+        trend_analyzer.redis_client = object()
+
+        def keys_for(start):
+            return trend_analyzer._forecast_cache_keys('site-1', {'page_views': _series(start)})
+
+        morning = keys_for(datetime(2024, 1, 1, 9, 0, 0, 123))
+        evening = keys_for(datetime(2024, 1, 1, 21, 30, 0, 456))
+        next_day = keys_for(datetime(2024, 1, 2, 9, 0))
+
+        assert morning == evening
+        assert morning != next_day
+
+
+class TestComprehensiveTrendAnalysis:
+    """Test the combined trend analysis pipeline."""
+
+    @pytest.mark.asyncio
+    async def test_trend_data_is_fetched_once(self, trend_analyzer, monkeypatch):
+        """Seasonal patterns and trends should share a single data fetch."""
+        await trend_analyzer._initialize_prediction_models()
+        fetched = []
+        original = trend_analyzer._fetch_trend_data
+
+        async def counting_fetch(site_id, date_range):
+            fetched.append(date_range)
+            return await original(site_id, date_range)
+
+        monkeypatch.setattr(trend_analyzer, "_fetch_trend_data", counting_fetch)
+
+        result = await trend_analyzer.comprehensive_trend_analysis('site-1', '30d')
+
+        assert len(fetched) == 1
+        assert result['seasonal_patterns']['patterns_detected'] is True
+        assert result['trends']
@@ -0,0 +1,60 @@
+import pytest
+import pandas as pd
+import numpy as np
+
+from scipy.signal import argrelextrema
+
+from services._trend_kernels import summary_statistics, local_extrema, rolling_std_summary
+
+
+class TestTrendKernels:
+    """Test NumPy kernels used by the trend analyzer."""
+
+    @pytest.mark.parametrize("values", [
+        np.random.default_rng(0).lognormal(size=60),
+        np.arange(20, dtype=np.float64),
+        np.full(15, 3.0),
+    ])
+    def test_summary_statistics_matches_pandas(self, values):
+        """Summary statistics should agree with the pandas estimators."""
+        series = pd.Series(values)
+        summary = summary_statistics(values)
+
+        expected = {
+            "mean": series.mean(),
+            "median": series.median(),
+            "std": series.std(),
+            "min": series.min(),
+            "max": series.max(),
+            "q1": series.quantile(0.25),
+            "q3": series.quantile(0.75),
+            "skewness": series.skew(),
+            "kurtosis": series.kurtosis(),
+        }
+        for key, value in expected.items():
+            assert summary[key] == pytest.approx(value, abs=1e-9), key
+
+    def test_summary_statistics_empty(self):
+        """Empty input should return an empty dict."""
+        assert summary_statistics(np.array([], dtype=np.float64)) == {}
+
+    @pytest.mark.parametrize("order", [1, 3])
+    def test_local_extrema_matches_argrelextrema(self, order):
+        """Local extrema should match scipy's argrelextrema (clip mode)."""
+        values = np.random.default_rng(1).normal(size=200).round(1)
+
+        minima, maxima = local_extrema(values, order)
+
+        np.testing.assert_array_equal(minima, argrelextrema(values, np.less, order=order)[0])
+        np.testing.assert_array_equal(maxima, argrelextrema(values, np.greater, order=order)[0])
+
+    def test_rolling_std_summary_matches_pandas(self):
+        """Rolling std summary should agree with pandas rolling().std()."""
+        values = np.random.default_rng(2).lognormal(mean=5, size=90)
+        rolling = pd.Series(values).rolling(window=7).std().dropna()
+
+        first, last, mean = rolling_std_summary(values, 7)
+
+        assert first == pytest.approx(rolling.iloc[0], rel=1e-9)
+        assert last == pytest.approx(rolling.iloc[-1], rel=1e-9)
+        assert mean == pytest.approx(rolling.mean(), rel=1e-9)
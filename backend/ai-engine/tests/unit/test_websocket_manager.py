@@ -0,0 +1,209 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from starlette.websockets import WebSocket
+
+import utils.websocket_manager as websocket_manager_module
+from utils.websocket_manager import ConnectionInfo, WebSocketManager
+
+
+class FakeASGIConnection:
+    """Fake ASGI websocket transport recording the messages sent by the app."""
+
+    def __init__(self):
+        self.sent = []
+        # Cleared to make every websocket.send block, simulating a slow consumer
+        self.unblocked = asyncio.Event()
+        self.unblocked.set()
+        self.websocket = WebSocket(
+            {"type": "websocket", "path": "/ws", "headers": []},
+            self.receive,
+            self.send
+        )
+
+    async def receive(self):
+        return {"type": "websocket.connect"}
+
+    async def send(self, message):
+        if message["type"] == "websocket.send":
+            await self.unblocked.wait()
+        self.sent.append(message)
+
+    def frame_types(self):
+        """Message types of the JSON frames sent so far."""
+        return [
+            json.loads(message["text"])["type"]
+            for message in self.sent
+            if message["type"] == "websocket.send"
+        ]
+
+
+async def drain(connection_info):
+    """Let the connection's writer task send everything queued so far."""
+    for _ in range(100):
+        if connection_info.outbox.empty():
+            break
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+
+@pytest.fixture
+def manager():
+    """WebSocket manager fixture."""
+    return WebSocketManager()
+
+
+class TestWebSocketManager:
+    """Test WebSocket manager delivery through per-connection outboxes."""
+
+    @pytest.mark.asyncio
+    async def test_send_to_site_queues_and_writer_delivers_in_order(self, manager):
+        """Site messages should be queued and sent by the writer in order."""
+        client = FakeASGIConnection()
+        await manager.connect(client.websocket, "site-1")
+        connection_info = manager.get_connection_info(client.websocket)
+
+        for i in range(3):
+            assert await manager.send_to_site("site-1", {"type": f"update-{i}"}) == 1
+
+        await drain(connection_info)
+
+        assert client.sent[0] == {"type": "websocket.accept", "subprotocol": None, "headers": []}
+        assert client.frame_types() == ["connection_established", "update-0", "update-1", "update-2"]
+        assert manager.stats["messages_sent"] == 4
+
+        await manager.disconnect(client.websocket, "site-1")
+
+    @pytest.mark.asyncio
+    async def test_control_frames_keep_order_with_site_messages(self, manager):
+        """Subscription updates should go through the outbox behind earlier messages."""
+        client = FakeASGIConnection()
+        await manager.connect(client.websocket, "site-1")
+        connection_info = manager.get_connection_info(client.websocket)
+
+        await manager.send_to_site("site-1", {"type": "before"})
+        await manager.handle_subscription(client.websocket, ["alerts"])
+        await manager.send_to_subscribed("alerts", {"type": "alert"})
+
+        await drain(connection_info)
+
+        assert client.frame_types() == ["connection_established", "before", "subscription_updated", "alert"]
+
+        await manager.disconnect(client.websocket, "site-1")
+
+    @pytest.mark.asyncio
+    async def test_slow_consumer_is_evicted_when_outbox_is_full(self, manager, monkeypatch):
+        """A connection whose outbox fills up should be removed and its writer stopped."""
+        monkeypatch.setattr(ConnectionInfo, "OUTBOX_MAX_SIZE", 2)
+        slow = FakeASGIConnection()
+        fast = FakeASGIConnection()
+        await manager.connect(slow.websocket, "site-1")
+        await manager.connect(fast.websocket, "site-1")
+        slow_info = manager.get_connection_info(slow.websocket)
+
+        # The writer takes one message and blocks on it; two more fill the outbox
+        slow.unblocked.clear()
+        await asyncio.sleep(0)
+        results = []
+        for i in range(4):
+            results.append(await manager.send_to_site("site-1", {"type": f"update-{i}"}))
+            await asyncio.sleep(0)
+
+        assert results == [2, 2, 1, 1]
+        assert manager.get_connection_count("site-1") == 1
+        assert manager.get_connection_info(slow.websocket) is None
+        assert slow_info.writer_task is None
+        assert manager.stats["messages_failed"] >= 1
+
+        await drain(manager.get_connection_info(fast.websocket))
+        assert fast.frame_types()[-1] == "update-3"
+
+        await manager.disconnect(fast.websocket, "site-1")
+
+    @pytest.mark.asyncio
+    async def test_enqueue_to_site_coalesces_into_one_batch_frame(self, manager):
+        """Messages queued within the delay should go out as a single batch frame."""
+        client = FakeASGIConnection()
+        await manager.connect(client.websocket, "site-1")
+        connection_info = manager.get_connection_info(client.websocket)
+
+        for i in range(3):
+            manager.enqueue_to_site("site-1", {"type": f"update-{i}"}, max_delay=0.01)
+        await asyncio.sleep(0.02)
+        await drain(connection_info)
+
+        assert client.frame_types() == ["connection_established", "batch"]
+        batch = json.loads(client.sent[-1]["text"])
+        assert [item["type"] for item in batch["batch"]] == ["update-0", "update-1", "update-2"]
+
+        # A lone message is sent as-is rather than wrapped in a batch
+        manager.enqueue_to_site("site-1", {"type": "single"}, max_delay=0.01)
+        await asyncio.sleep(0.02)
+        await drain(connection_info)
+        assert client.frame_types()[-1] == "single"
+
+        await manager.disconnect(client.websocket, "site-1")
+
+    @pytest.mark.asyncio
+    async def test_enqueue_to_site_flushes_early_when_batch_is_full(self, manager):
+        """Reaching max_size should send the batch without waiting for the delay."""
+        client = FakeASGIConnection()
+        await manager.connect(client.websocket, "site-1")
+        connection_info = manager.get_connection_info(client.websocket)
+
+        for i in range(2):
+            manager.enqueue_to_site("site-1", {"type": f"update-{i}"}, max_delay=60, max_size=2)
+        await asyncio.sleep(0.01)
+        await drain(connection_info)
+
+        assert client.frame_types() == ["connection_established", "batch"]
+        assert manager._flush_tasks == {}
+
+        await manager.disconnect(client.websocket, "site-1")
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_writer(self, manager):
+        """Disconnecting should cancel the connection's writer task."""
+        client = FakeASGIConnection()
+        await manager.connect(client.websocket, "site-1")
+        writer_task = manager.get_connection_info(client.websocket).writer_task
+
+        await manager.disconnect(client.websocket, "site-1")
+        await asyncio.sleep(0)
+
+        assert writer_task.cancelled()
+        assert manager.get_connection_count() == 0
+        assert manager.get_connection_info(client.websocket) is None
+
+    @pytest.mark.asyncio
+    async def test_cleanup_stale_connections_removes_only_old_connections(self, manager, monkeypatch):
+        """Stale cleanup should remove connections older than the cutoff only."""
+        now = datetime(2024, 1, 1, 0, 0, 0)
+
+        class FrozenDatetime(datetime):
+            @classmethod
+            def utcnow(cls):
+                return now
+
+        monkeypatch.setattr(websocket_manager_module, "datetime", FrozenDatetime)
+
+        old = FakeASGIConnection()
+        await manager.connect(old.websocket, "site-1")
+        old_writer = manager.get_connection_info(old.websocket).writer_task
+
+        now += timedelta(hours=2)
+        recent = FakeASGIConnection()
+        await manager.connect(recent.websocket, "site-1")
+
+        now += timedelta(minutes=1)
+        assert await manager.cleanup_stale_connections(max_age_hours=1) == 1
+        await asyncio.sleep(0)
+
+        assert manager.get_connection_info(old.websocket) is None
+        assert old_writer.cancelled()
+        assert manager.get_connection_info(recent.websocket) is not None
+        assert manager.get_connection_count("site-1") == 1
+
+        await manager.disconnect(recent.websocket, "site-1")
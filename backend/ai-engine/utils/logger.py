@@ -1,14 +1,70 @@
 """
 ログ設定ユーティリティ
+
+起動時に必ずimportされるため、トップレベルでは標準ライブラリの軽量モジュールのみをimportする
+（JSON出力用のpythonjsonlogger/orjsonは構造化ログ使用時に遅延import、numpy/pandasは依存させない）
 """
+import atexit
+import copy
 import logging
 import logging.handlers
+import queue
 import sys
 import os
-from pathlib import Path
-from datetime import datetime
+from functools import lru_cache
+from datetime import datetime, timezone
 from typing import Optional
 
+DEFAULT_LOG_FORMAT = (
+    "[%(asctime)s] %(levelname)s in %(name)s: %(message)s "
+    "(%(filename)s:%(lineno)d)"
+)
+DEFAULT_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+@lru_cache(maxsize=8)
+def _get_formatter(fmt: str, datefmt: str) -> logging.Formatter:
+    """フォーマット文字列ごとに共有するFormatter（Formatterは状態を持たないため共有可能）"""
+    return logging.Formatter(fmt, datefmt=datefmt)
+
+def _orjson_default(obj):
+    """orjsonが直接扱えない値の変換（numpyスカラーはPython数値、それ以外は文字列）"""
+    if hasattr(obj, 'item') and callable(obj.item):
+        try:
+            return obj.item()
+        except (TypeError, ValueError):
+            pass
+    return str(obj)
+
+@lru_cache(maxsize=1)
+def _get_json_formatter_class():
+    """orjsonでシリアライズするJsonFormatterサブクラス（orjsonが無い環境では標準のJsonFormatter）"""
+    from pythonjsonlogger import jsonlogger
+
+    try:
+        import orjson
+    except ImportError:
+        return jsonlogger.JsonFormatter
+
+    options = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    class OrjsonJsonFormatter(jsonlogger.JsonFormatter):
+        """ログレコードをorjsonでJSON化するフォーマッター"""
+
+        def jsonify_log_record(self, log_record):
+            return orjson.dumps(log_record, default=_orjson_default, option=options).decode()
+
+    return OrjsonJsonFormatter
+
+# 作成確認済みのログディレクトリ（同じディレクトリへのstat/mkdirは初回のみ）
+_ensured_dirs = set()
+
+def _ensure_log_dir(log_file: str):
+    """ログファイルの親ディレクトリを作成（プロセス内でディレクトリごとに1回のみ確認）"""
+    log_dir = os.path.dirname(log_file) or '.'
+    if log_dir not in _ensured_dirs:
+        os.makedirs(log_dir, exist_ok=True)
+        _ensured_dirs.add(log_dir)
+
 def setup_logger(
     name: Optional[str] = None,
     level: str = "INFO",
@@ -43,17 +99,8 @@ def setup_logger(
     log_level = getattr(logging, level.upper(), logging.INFO)
     logger.setLevel(log_level)
     
-    # フォーマット設定
-    if not format_string:
-        format_string = (
-            "[%(asctime)s] %(levelname)s in %(name)s: %(message)s "
-            "(%(filename)s:%(lineno)d)"
-        )
-    
-    formatter = logging.Formatter(
-        format_string,
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
+    # フォーマット設定（同じフォーマットのFormatterは使い回す）
+    formatter = _get_formatter(format_string or DEFAULT_LOG_FORMAT, DEFAULT_DATE_FORMAT)
     
     # コンソールハンドラー
     console_handler = logging.StreamHandler(sys.stdout)
@@ -64,8 +111,7 @@ def setup_logger(
     # ファイルハンドラー（指定された場合）
     if log_file:
         # ログディレクトリ作成
-        log_path = Path(log_file)
-        log_path.parent.mkdir(parents=True, exist_ok=True)
+        _ensure_log_dir(log_file)
         
         # ローテーティングファイルハンドラー
         file_handler = logging.handlers.RotatingFileHandler(
@@ -96,9 +142,6 @@ def setup_structured_logger(
     Returns:
         設定済みロガー
     """
-    import json
-    from pythonjsonlogger import jsonlogger
-    
     logger = logging.getLogger(name)
     
     if logger.handlers:
@@ -107,8 +150,8 @@ def setup_structured_logger(
     log_level = getattr(logging, level.upper(), logging.INFO)
     logger.setLevel(log_level)
     
-    # JSON フォーマッター
-    json_formatter = jsonlogger.JsonFormatter(
+    # JSON フォーマッター（orjsonが利用可能ならorjsonでシリアライズ）
+    json_formatter = _get_json_formatter_class()(
         fmt='%(asctime)s %(name)s %(levelname)s %(message)s %(pathname)s %(lineno)d',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
@@ -121,8 +164,7 @@ def setup_structured_logger(
     
     # ファイルハンドラー
     if log_file:
-        log_path = Path(log_file)
-        log_path.parent.mkdir(parents=True, exist_ok=True)
+        _ensure_log_dir(log_file)
         
         file_handler = logging.handlers.RotatingFileHandler(
             log_file,
@@ -206,7 +248,7 @@ class SecurityLogger:
             'user_id': user_id,
             'success': success,
             'ip_address': ip_address,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': datetime.now(timezone.utc).isoformat()
         })
     
     def log_authorization_failure(self, user_id: str, resource: str, action: str):
@@ -218,7 +260,7 @@ class SecurityLogger:
                 'user_id': user_id,
                 'resource': resource,
                 'action': action,
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': datetime.now(timezone.utc).isoformat()
             }
         )
     
@@ -231,16 +273,85 @@ class SecurityLogger:
                 'description': description,
                 'user_id': user_id,
                 'ip_address': ip_address,
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': datetime.now(timezone.utc).isoformat()
             }
         )
 
+class _QueueRouteHandler(logging.handlers.QueueHandler):
+    """キューに積むレコードに出力先（ロガー名）を記録するQueueHandler"""
+    
+    def __init__(self, log_queue, route: str):
+        super().__init__(log_queue)
+        self.route = route
+    
+    def prepare(self, record):
+        # メッセージのみ確定させ、例外情報は残してファイル側のフォーマットを従来と同一に保つ
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.log_route = self.route
+        return record
+
+class _FileRouteHandler(logging.Handler):
+    """キューから取り出したレコードを出力先のファイルハンドラーへ振り分け"""
+    
+    def __init__(self, routes):
+        super().__init__()
+        self.routes = routes
+    
+    def handle(self, record):
+        handler = self.routes.get(getattr(record, 'log_route', None))
+        if handler is not None and record.levelno >= handler.level:
+            handler.handle(record)
+        return True
+    
+    def close(self):
+        for handler in self.routes.values():
+            handler.close()
+        super().close()
+
+# ファイル出力を担うバックグラウンドリスナー（プロセス内で1つ）
+_file_queue_listener: Optional[logging.handlers.QueueListener] = None
+
+def _move_file_handlers_to_queue(loggers):
+    """
+    ファイルハンドラーをQueueHandler経由に置き換え、1つのバックグラウンドスレッドで書き込む
+    
+    コンソールハンドラーは呼び出し元スレッドに残す（テスト時の出力キャプチャ用）
+    """
+    global _file_queue_listener
+    
+    log_queue = queue.SimpleQueue()
+    routes = {}
+    for logger in loggers:
+        for handler in list(logger.handlers):
+            if isinstance(handler, logging.FileHandler):
+                logger.removeHandler(handler)
+                routes[logger.name] = handler
+                queue_handler = _QueueRouteHandler(log_queue, logger.name)
+                queue_handler.setLevel(handler.level)
+                logger.addHandler(queue_handler)
+    
+    # 既に置き換え済み（再呼び出し）の場合は何もしない
+    if not routes:
+        return
+    
+    _file_queue_listener = logging.handlers.QueueListener(log_queue, _FileRouteHandler(routes))
+    _file_queue_listener.start()
+    atexit.register(_stop_file_queue_listener)
+
+def _stop_file_queue_listener():
+    """残りのレコードを書き出してバックグラウンドリスナーを停止"""
+    global _file_queue_listener
+    if _file_queue_listener is not None:
+        _file_queue_listener.stop()
+        _file_queue_listener = None
+
 def setup_application_logger():
     """アプリケーション用の統合ログ設定"""
     
-    # ログディレクトリ作成
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
+    # ログディレクトリは各setup_logger呼び出しで必要時のみ作成される
     
     # メインアプリケーションログ
     app_logger = setup_logger(
@@ -284,7 +395,7 @@ def setup_application_logger():
         log_file="logs/realtime.log"
     )
     
-    return {
+    loggers = {
         'app': app_logger,
         'error': error_logger,
         'performance': perf_logger,
@@ -292,6 +403,11 @@ def setup_application_logger():
         'websocket': websocket_logger,
         'realtime': realtime_logger
     }
+    
+    # ファイル書き込み（ローテーション含む）はリクエスト処理スレッドから切り離す
+    _move_file_handlers_to_queue(loggers.values())
+    
+    return loggers
 
 # ログ設定のサンプル使用
 if __name__ == "__main__":
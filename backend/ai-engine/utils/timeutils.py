@@ -0,0 +1,22 @@
+"""
+時刻ユーティリティ
+"""
+import time
+
+# (エポック秒, 整形済み文字列) のタプル。参照と差し替えを1回ずつにしてスレッド間でも整合させる
+_TS_CACHE = (0, "")
+
+
+def utcnow_iso() -> str:
+    """
+    現在のUTC時刻をISO 8601形式（秒精度）で返す
+
+    整形は1秒に1回だけ行い、同じ秒の呼び出しではキャッシュ済みの文字列を返す
+    """
+    global _TS_CACHE
+    now = int(time.time())
+    cached = _TS_CACHE
+    if cached[0] != now:
+        cached = (now, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now)))
+        _TS_CACHE = cached
+    return cached[1]
@@ -3,32 +3,82 @@ WebSocketマネージャー
 リアルタイム通信とコネクション管理
 """
 import asyncio
+import heapq
+import itertools
 import logging
-import json
-from typing import Dict, List, Set, Optional, Any
+from typing import Dict, List, Set, Optional, Any, Tuple, Sequence, Callable, Awaitable
 from collections import defaultdict
 from fastapi import WebSocket, WebSocketDisconnect
-from datetime import datetime
+from datetime import datetime, timedelta
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# 送信メッセージのJSON化オプション（datetimeはorjsonがisoformat()と同じ形式で直接シリアライズ）
+_MESSAGE_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# 相手側が既に切断している場合に送信で発生する例外
+# （StarletteはClose後の送信でRuntimeErrorを送出する）
+_PEER_CLOSED_ERRORS = (WebSocketDisconnect, ConnectionResetError, RuntimeError)
+
 class ConnectionInfo:
     """接続情報"""
-    def __init__(self, websocket: WebSocket, site_id: str, connected_at: datetime):
+    
+    # 接続数が多くてもインスタンスごとの__dict__を持たないようスロットで固定
+    __slots__ = (
+        "websocket", "site_id", "connected_at", "last_ping", "subscriptions",
+        "binary_frames", "outbox", "writer_task", "send"
+    )
+    
+    # 集合での管理は同一インスタンス判定が前提のため、同一性による比較・ハッシュを明示
+    # （フィールド比較の__eq__を追加すると__hash__が無効化され集合に入らなくなる）
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+    
+    # 送信キューの上限（超えた接続は受信が追いつかない遅いクライアントとして切断）
+    OUTBOX_MAX_SIZE = 1024
+    
+    def __init__(self, websocket: WebSocket, site_id: str, connected_at: datetime, binary_frames: bool = False):
         self.websocket = websocket
         self.site_id = site_id
         self.connected_at = connected_at
         self.last_ping = connected_at
         self.subscriptions = set()
+        # バイナリフレーム（UTF-8のJSONバイト列）で受信するクライアントか
+        self.binary_frames = binary_frames
+        # 送信キューとそれを送信する接続専用タスク
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=self.OUTBOX_MAX_SIZE)
+        self.writer_task: Optional[asyncio.Task] = None
+        # ASGIイベントを送信する関数（送信のたびにsend_text等を経由しないよう接続時に保持）
+        self.send = websocket.send
 
 class WebSocketManager:
     """WebSocket接続管理"""
     
-    def __init__(self):
-        # サイト別接続管理
-        self.connections: Dict[str, List[ConnectionInfo]] = defaultdict(list)
-        # 全接続のマップ
-        self.connection_map: Dict[WebSocket, ConnectionInfo] = {}
+    # 接続情報を保持するWebSocketのscopeキー（WebSocket側に持たせ、WebSocket破棄と同時に解放されるようにする）
+    SCOPE_KEY = "websocket_manager.connection_info"
+    
+    # 1メッセージの送信に許容する最大秒数（超えた接続は応答しないクライアントとして切断）
+    SEND_TIMEOUT = 5.0
+    
+    # まとめ送信の既定値：最大待ち時間（秒）と1フレームあたりの最大件数
+    BATCH_MAX_DELAY = 0.2
+    BATCH_MAX_SIZE = 64
+    
+    def __init__(self, send_timeout: Optional[float] = None):
+        self.send_timeout = self.SEND_TIMEOUT if send_timeout is None else send_timeout
+        # サイト別接続管理（切断時に接続一覧を作り直さずO(1)で削除できるようsetで保持）
+        self.connections: Dict[str, Set[ConnectionInfo]] = defaultdict(set)
+        # サイト別の最古・最新接続時刻（統計取得時に全接続を走査しないよう接続/切断時に更新）
+        self.site_connection_times: Dict[str, Tuple[datetime, datetime]] = {}
+        # 接続時刻順のヒープ（古い接続のクリーンアップで期限切れ分だけ取り出す。切断済みの要素は取り出し時に読み飛ばす）
+        self._age_heap: List[Tuple[datetime, int, ConnectionInfo]] = []
+        self._age_heap_counter = itertools.count()
+        # 購読種別ごとの購読接続（送信時に全接続を走査しないための逆引き）
+        self.subscribers: Dict[str, Set[ConnectionInfo]] = defaultdict(set)
+        # まとめ送信待ちのサイト別メッセージと送信タイマー
+        self._pending_messages: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
         # 統計情報
         self.stats = {
             "total_connections": 0,
@@ -37,33 +87,47 @@ class WebSocketManager:
             "messages_failed": 0
         }
         
-    async def connect(self, websocket: WebSocket, site_id: str):
-        """WebSocket接続を追加"""
+    async def connect(self, websocket: WebSocket, site_id: str, binary_frames: bool = False):
+        """
+        WebSocket接続を追加
+        
+        binary_frames=Trueの接続には、JSONをテキストフレームではなくUTF-8バイト列のバイナリフレームで送信する
+        （接続ごとの文字列→バイト列変換を省略できる。受信側がバイナリフレームを扱える場合のみ指定）
+        """
         try:
             await websocket.accept()
             
             connection_info = ConnectionInfo(
                 websocket=websocket,
                 site_id=site_id,
-                connected_at=datetime.utcnow()
+                connected_at=datetime.utcnow(),
+                binary_frames=binary_frames
             )
             
             # 接続を登録
-            self.connections[site_id].append(connection_info)
-            self.connection_map[websocket] = connection_info
+            self.connections[site_id].add(connection_info)
+            websocket.scope[self.SCOPE_KEY] = connection_info
+            self._track_connection_time(connection_info)
+            heapq.heappush(
+                self._age_heap,
+                (connection_info.connected_at, next(self._age_heap_counter), connection_info)
+            )
             
             # 統計更新
             self.stats["total_connections"] += 1
             self.stats["active_sites"] = len(self.connections)
             
-            # 接続確認メッセージ送信
+            # 接続確認メッセージ送信（送信キューの先頭に入る）
             await self.send_to_connection(websocket, {
                 "type": "connection_established",
                 "site_id": site_id,
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": datetime.utcnow(),
                 "connection_id": id(connection_info)
             })
             
+            # 送信タスク開始
+            connection_info.writer_task = asyncio.create_task(self._connection_writer(connection_info))
+            
             logger.info(f"WebSocket接続確立: {site_id} (総接続数: {self.stats['total_connections']})")
             
         except Exception as e:
@@ -74,26 +138,30 @@ class WebSocketManager:
         """WebSocket接続を削除"""
         try:
             # 接続情報を取得
-            connection_info = self.connection_map.get(websocket)
+            connection_info = self.get_connection_info(websocket)
             
             if connection_info:
                 # サイト別接続から削除
-                if site_id in self.connections:
-                    self.connections[site_id] = [
-                        conn for conn in self.connections[site_id] 
-                        if conn.websocket != websocket
-                    ]
+                site_connections = self.connections.get(site_id)
+                if site_connections is not None:
+                    site_connections.discard(connection_info)
                     
                     # サイトに接続がなくなった場合はキーを削除
-                    if not self.connections[site_id]:
+                    if not site_connections:
                         del self.connections[site_id]
+                    
+                    self._untrack_connection_times(site_id, (connection_info,))
+                
+                self._untrack_subscriptions(connection_info)
+                self._stop_writer(connection_info)
                 
-                # グローバルマップから削除
-                del self.connection_map[websocket]
+                # WebSocketから接続情報を外す
+                del websocket.scope[self.SCOPE_KEY]
                 
                 # 統計更新
                 self.stats["total_connections"] = max(0, self.stats["total_connections"] - 1)
                 self.stats["active_sites"] = len(self.connections)
+                self._compact_age_heap()
                 
                 logger.info(f"WebSocket接続切断: {site_id} (総接続数: {self.stats['total_connections']})")
             
@@ -101,43 +169,20 @@ class WebSocketManager:
             logger.error(f"WebSocket切断エラー ({site_id}): {e}")
 
     async def send_to_site(self, site_id: str, message: Dict[str, Any]) -> int:
-        """特定サイトの全接続にメッセージ送信"""
+        """特定サイトの全接続にメッセージ送信（送信キューに追加できた接続数を返す）"""
         try:
             if site_id not in self.connections:
                 return 0
             
-            connections = self.connections[site_id].copy()  # コピーを作成
-            sent_count = 0
-            failed_connections = []
-            
-            # 全接続に並行送信
-            send_tasks = []
-            for connection in connections:
-                task = self._send_to_connection_safe(connection.websocket, message)
-                send_tasks.append((connection, task))
+            connections = tuple(self.connections[site_id])  # 送信中の切断に備えてスナップショットを作成
             
-            # 結果を取得
-            for connection, task in send_tasks:
-                try:
-                    success = await task
-                    if success:
-                        sent_count += 1
-                    else:
-                        failed_connections.append(connection)
-                except Exception as e:
-                    logger.warning(f"メッセージ送信失敗 ({site_id}): {e}")
-                    failed_connections.append(connection)
-            
-            # 失敗した接続を削除
-            for failed_conn in failed_connections:
-                await self._remove_failed_connection(failed_conn)
+            # JSON化は接続数によらず1回だけ
+            payload = self._encode_message(message)
             
-            # 統計更新
-            self.stats["messages_sent"] += sent_count
-            self.stats["messages_failed"] += len(failed_connections)
+            sent_count, failed_count = await self._send_payload_to_connections(connections, payload, site_id)
             
             if sent_count > 0:
-                logger.debug(f"メッセージ送信完了 ({site_id}): {sent_count}件成功, {len(failed_connections)}件失敗")
+                logger.debug(f"メッセージ送信完了 ({site_id}): {sent_count}件成功, {failed_count}件失敗")
             
             return sent_count
             
@@ -145,69 +190,289 @@ class WebSocketManager:
             logger.error(f"サイトメッセージ送信エラー ({site_id}): {e}")
             return 0
 
+    def enqueue_to_site(
+        self,
+        site_id: str,
+        message: Dict[str, Any],
+        max_delay: Optional[float] = None,
+        max_size: Optional[int] = None
+    ):
+        """
+        サイト宛メッセージをまとめ送信キューに追加
+        
+        max_delay秒経過するかmax_size件たまった時点で {"type": "batch", "batch": [...]} の1フレームで送信する
+        （1件だけの場合はそのまま送信。制御用メッセージはsend_to_siteで即時送信）
+        """
+        max_delay = self.BATCH_MAX_DELAY if max_delay is None else max_delay
+        max_size = self.BATCH_MAX_SIZE if max_size is None else max_size
+        
+        pending = self._pending_messages[site_id]
+        pending.append(message)
+        
+        flush_task = self._flush_tasks.get(site_id)
+        if len(pending) >= max_size:
+            # 上限に達したら待ち時間を打ち切って送信
+            if flush_task is not None:
+                flush_task.cancel()
+            self._flush_tasks[site_id] = asyncio.create_task(self._flush_site_later(site_id, 0))
+        elif flush_task is None:
+            self._flush_tasks[site_id] = asyncio.create_task(self._flush_site_later(site_id, max_delay))
+
+    async def _flush_site_later(self, site_id: str, delay: float):
+        """一定時間待ってからまとめ送信"""
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            # 送信中に追加されたメッセージは次のタイマーで送るよう、送信前に登録を外す
+            if self._flush_tasks.get(site_id) is asyncio.current_task():
+                del self._flush_tasks[site_id]
+        
+        messages = self._pending_messages.pop(site_id, None)
+        if not messages:
+            return
+        
+        if len(messages) == 1:
+            payload = messages[0]
+        else:
+            payload = {
+                "type": "batch",
+                "batch": messages,
+                "timestamp": datetime.utcnow()
+            }
+        
+        await self.send_to_site(site_id, payload)
+
+    async def _send_payload_to_connections(
+        self,
+        connections: Sequence[ConnectionInfo],
+        payload: bytes,
+        target: str
+    ) -> Tuple[int, int]:
+        """
+        エンコード済みメッセージを各接続の送信キューに追加（キュー追加数, 失敗数）
+        
+        実際の送信は接続ごとの送信タスクが行うため、遅いクライアントが呼び出し元や他の接続を待たせない。
+        キューが上限に達した接続は遅いクライアントとして削除する。
+        """
+        queued_count = 0
+        failed_connections = []
+        events = self._send_events(payload)
+        
+        for connection in connections:
+            try:
+                connection.outbox.put_nowait(self._frame_for(connection, events))
+                queued_count += 1
+            except asyncio.QueueFull:
+                failed_connections.append(connection)
+        
+        # 送信が追いつかない接続をまとめて削除
+        if failed_connections:
+            logger.warning(f"送信キュー上限超過のため切断 ({target}): {len(failed_connections)}件")
+            await self._remove_failed_connections(failed_connections)
+            self.stats["messages_failed"] += len(failed_connections)
+        
+        return queued_count, len(failed_connections)
+
+    async def _connection_writer(self, connection: ConnectionInfo):
+        """接続ごとの送信タスク：送信キューのメッセージを順に送信し、失敗したら接続を削除"""
+        outbox = connection.outbox
+        send = connection.send
+        
+        while True:
+            event = await outbox.get()
+            
+            if await self._send_event(send, event):
+                self.stats["messages_sent"] += 1
+            else:
+                self.stats["messages_failed"] += 1
+                await self._remove_failed_connections([connection])
+                return
+
+    def _stop_writer(self, connection: ConnectionInfo):
+        """接続の送信タスクを停止（送信タスク自身からの呼び出しでは何もしない）"""
+        writer_task = connection.writer_task
+        if writer_task is not None and writer_task is not asyncio.current_task():
+            writer_task.cancel()
+        connection.writer_task = None
+
     async def send_to_connection(self, websocket: WebSocket, message: Dict[str, Any]) -> bool:
-        """特定接続にメッセージ送信"""
+        """
+        特定接続にメッセージ送信
+        
+        登録済みの接続は送信キュー経由で送り、サイト宛メッセージとの送信順序を保つ（キューに追加できればTrue）。
+        未登録のWebSocketには直接送信する。
+        """
         try:
-            # メッセージにタイムスタンプ追加
-            if "timestamp" not in message:
-                message["timestamp"] = datetime.utcnow().isoformat()
-            
-            await websocket.send_text(json.dumps(message, ensure_ascii=False))
-            return True
-            
-        except WebSocketDisconnect:
-            logger.debug("WebSocket切断検出")
-            return False
+            payload = self._encode_message(message)
         except Exception as e:
             logger.warning(f"WebSocketメッセージ送信エラー: {e}")
             return False
+        
+        connection_info = self.get_connection_info(websocket)
+        if connection_info is not None and self._is_registered(connection_info):
+            queued_count, _ = await self._send_payload_to_connections(
+                (connection_info,), payload, connection_info.site_id
+            )
+            return queued_count > 0
+        
+        return await self._send_event(websocket.send, {"type": "websocket.send", "text": payload.decode()})
 
-    async def _send_to_connection_safe(self, websocket: WebSocket, message: Dict[str, Any]) -> bool:
-        """安全な接続送信（例外処理付き）"""
+    def _encode_message(self, message: Dict[str, Any]) -> bytes:
+        """送信用のJSON（UTF-8バイト列）を作成（タイムスタンプが無い場合は付与）"""
+        if "timestamp" not in message:
+            message["timestamp"] = datetime.utcnow()
+        
+        return orjson.dumps(message, option=_MESSAGE_JSON_OPTIONS)
+
+    @staticmethod
+    def _send_events(payload: bytes) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """エンコード済みメッセージのASGI送信イベント（テキスト, バイナリ）を作成（全接続で共有）"""
+        return (
+            {"type": "websocket.send", "text": payload.decode()},
+            {"type": "websocket.send", "bytes": payload}
+        )
+
+    @staticmethod
+    def _frame_for(connection: ConnectionInfo, events: Tuple[Dict[str, Any], Dict[str, Any]]) -> Dict[str, Any]:
+        """接続の受信形式に合わせた送信イベント（バイナリ接続はバイナリフレーム、それ以外はテキストフレーム）"""
+        return events[1] if connection.binary_frames else events[0]
+
+    async def _send_event(self, send: Callable[[Dict[str, Any]], Awaitable[None]], event: Dict[str, Any]) -> bool:
+        """ASGI送信イベントを送信（WebSocket.sendの状態チェックはそのまま適用される）"""
         try:
-            return await self.send_to_connection(websocket, message)
-        except Exception:
+            # 送信バッファが詰まったままのクライアントで送信が止まり続けないよう上限時間を設ける
+            async with asyncio.timeout(self.send_timeout):
+                await send(event)
+            return True
+            
+        except TimeoutError:
+            logger.warning(f"WebSocketメッセージ送信タイムアウト ({self.send_timeout}秒)")
+            return False
+        except _PEER_CLOSED_ERRORS:
+            # 相手側の切断は大量切断時に頻発するため、ログ整形のコストをかけない
+            return False
+        except Exception as e:
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning(f"WebSocketメッセージ送信エラー: {e}")
             return False
 
-    async def _remove_failed_connection(self, connection: ConnectionInfo):
-        """失敗した接続を削除"""
+    async def _remove_failed_connections(self, connections: List[ConnectionInfo]):
+        """失敗した接続をまとめて削除（サイトごとに1回の差集合、統計は1回で更新）"""
         try:
-            site_id = connection.site_id
-            websocket = connection.websocket
-            
-            # サイト別接続から削除
-            if site_id in self.connections:
-                self.connections[site_id] = [
-                    conn for conn in self.connections[site_id] 
-                    if conn != connection
-                ]
-                
-                if not self.connections[site_id]:
-                    del self.connections[site_id]
+            # サイト別にまとめる
+            by_site: Dict[str, Set[ConnectionInfo]] = defaultdict(set)
+            for connection in connections:
+                by_site[connection.site_id].add(connection)
             
-            # グローバルマップから削除
-            if websocket in self.connection_map:
-                del self.connection_map[websocket]
+            removed_count = 0
+            for site_id, site_removed in by_site.items():
+                # サイト別接続から削除
+                site_connections = self.connections.get(site_id)
+                if site_connections is not None:
+                    site_connections -= site_removed
+                    
+                    if not site_connections:
+                        del self.connections[site_id]
+                    
+                    self._untrack_connection_times(site_id, site_removed)
+                
+                for connection in site_removed:
+                    self._untrack_subscriptions(connection)
+                    self._stop_writer(connection)
+                    
+                    # WebSocketから接続情報を外す（登録済みだったもののみ接続数から減算）
+                    if connection.websocket.scope.pop(self.SCOPE_KEY, None) is not None:
+                        removed_count += 1
             
             # 統計更新
-            self.stats["total_connections"] = max(0, self.stats["total_connections"] - 1)
+            self.stats["total_connections"] = max(0, self.stats["total_connections"] - removed_count)
             self.stats["active_sites"] = len(self.connections)
+            self._compact_age_heap()
             
         except Exception as e:
             logger.error(f"失敗接続削除エラー: {e}")
 
+    def _track_connection_time(self, connection: ConnectionInfo):
+        """接続追加時にサイトの最古・最新接続時刻を更新"""
+        times = self.site_connection_times.get(connection.site_id)
+        if times is None:
+            self.site_connection_times[connection.site_id] = (connection.connected_at, connection.connected_at)
+        else:
+            oldest, newest = times
+            self.site_connection_times[connection.site_id] = (
+                min(oldest, connection.connected_at),
+                max(newest, connection.connected_at)
+            )
+
+    def _untrack_connection_times(self, site_id: str, removed_connections):
+        """接続削除時、削除した接続が最古・最新だった場合のみサイトの接続時刻を再計算"""
+        site_connections = self.connections.get(site_id)
+        if not site_connections:
+            self.site_connection_times.pop(site_id, None)
+            return
+        
+        times = self.site_connection_times.get(site_id)
+        removed_times = {conn.connected_at for conn in removed_connections}
+        if times is None:
+            oldest = newest = None
+        else:
+            oldest, newest = times
+        
+        if oldest is None or oldest in removed_times:
+            oldest = min(conn.connected_at for conn in site_connections)
+        if newest is None or newest in removed_times:
+            newest = max(conn.connected_at for conn in site_connections)
+        self.site_connection_times[site_id] = (oldest, newest)
+
+    def _is_registered(self, connection: ConnectionInfo) -> bool:
+        """接続が現在も登録されているか"""
+        return connection in self.connections.get(connection.site_id, ())
+
+    def _compact_age_heap(self):
+        """切断済みの要素が増えすぎた場合に、登録中の接続だけで接続時刻ヒープを作り直す"""
+        if len(self._age_heap) <= 2 * self.stats["total_connections"] + 64:
+            return
+        
+        self._age_heap = [entry for entry in self._age_heap if self._is_registered(entry[2])]
+        heapq.heapify(self._age_heap)
+
+    def _untrack_subscriptions(self, connection: ConnectionInfo):
+        """接続削除時に購読の逆引きから外す"""
+        for subscription_type in connection.subscriptions:
+            subscribers = self.subscribers.get(subscription_type)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self.subscribers[subscription_type]
+
     async def broadcast_to_all(self, message: Dict[str, Any]) -> int:
-        """全接続にブロードキャスト"""
+        """全接続にブロードキャスト（送信キューに追加できた接続数を返す）"""
+        return await self._broadcast_message(message, copy_message=True)
+
+    async def _broadcast_message(self, message: Dict[str, Any], copy_message: bool = False) -> int:
+        """
+        全接続にブロードキャスト（内部用）
+        
+        copy_message=Falseの場合、messageは"broadcast": Trueを含む使い捨ての辞書であること（コピーせずそのままJSON化する）
+        """
         try:
-            total_sent = 0
-            
-            # 全サイトに送信
-            for site_id in list(self.connections.keys()):
-                sent_count = await self.send_to_site(site_id, {
-                    **message,
-                    "broadcast": True
-                })
-                total_sent += sent_count
+            # 全サイトの全接続の送信キューへ、1回だけJSON化したメッセージを追加
+            connections = [
+                connection
+                for site_connections in self.connections.values()
+                for connection in site_connections
+            ]
+            if not connections:
+                total_sent = 0
+            else:
+                if copy_message:
+                    # 呼び出し元のメッセージは変更しないよう、コピーはブロードキャスト全体で1回だけ
+                    message = {
+                        **message,
+                        "broadcast": True
+                    }
+                payload = self._encode_message(message)
+                total_sent, _ = await self._send_payload_to_connections(connections, payload, "broadcast")
             
             logger.info(f"全体ブロードキャスト完了: {total_sent}件送信")
             return total_sent
@@ -217,20 +482,15 @@ class WebSocketManager:
             return 0
 
     async def send_to_subscribed(self, subscription_type: str, message: Dict[str, Any]) -> int:
-        """特定の購読者にメッセージ送信"""
+        """特定の購読者にメッセージ送信（送信キューに追加できた接続数を返す）"""
         try:
-            sent_count = 0
-            
-            for site_connections in self.connections.values():
-                for connection in site_connections:
-                    if subscription_type in connection.subscriptions:
-                        success = await self._send_to_connection_safe(
-                            connection.websocket, message
-                        )
-                        if success:
-                            sent_count += 1
+            subscribers = tuple(self.subscribers.get(subscription_type, ()))
+            if not subscribers:
+                return 0
             
-            return sent_count
+            payload = self._encode_message(message)
+            queued_count, _ = await self._send_payload_to_connections(subscribers, payload, subscription_type)
+            return queued_count
             
         except Exception as e:
             logger.error(f"購読者メッセージ送信エラー: {e}")
@@ -259,30 +519,44 @@ class WebSocketManager:
                 for site_id, connections in self.connections.items()
             },
             "uptime_info": {
-                site_id: {
-                    "oldest_connection": min(
-                        conn.connected_at for conn in connections
-                    ).isoformat() if connections else None,
-                    "newest_connection": max(
-                        conn.connected_at for conn in connections
-                    ).isoformat() if connections else None
-                }
-                for site_id, connections in self.connections.items()
+                site_id: self._get_site_uptime_info(site_id)
+                for site_id in self.connections
             }
         }
 
+    def _get_site_uptime_info(self, site_id: str) -> Dict[str, Optional[str]]:
+        """サイトの最古・最新接続時刻（接続/切断時に更新済みの値を使用）"""
+        times = self.site_connection_times.get(site_id)
+        if times is None:
+            return {"oldest_connection": None, "newest_connection": None}
+        
+        oldest, newest = times
+        return {
+            "oldest_connection": oldest.isoformat(),
+            "newest_connection": newest.isoformat()
+        }
+
     async def ping_all_connections(self) -> Dict[str, int]:
         """全接続にpingを送信"""
         try:
             ping_message = {
                 "type": "ping",
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": datetime.utcnow()
             }
             
+            # 全サイト共通のメッセージなので時刻取得・JSON化は1回だけ行い、送信数はサイト別に集計
+            payload = self._encode_message(ping_message)
             ping_results = {}
             
-            for site_id in list(self.connections.keys()):
-                sent_count = await self.send_to_site(site_id, ping_message)
+            for site_id in tuple(self.connections):
+                site_connections = self.connections.get(site_id)
+                if not site_connections:
+                    ping_results[site_id] = 0
+                    continue
+                
+                sent_count, _ = await self._send_payload_to_connections(
+                    tuple(site_connections), payload, site_id
+                )
                 ping_results[site_id] = sent_count
             
             return ping_results
@@ -294,21 +568,20 @@ class WebSocketManager:
     async def cleanup_stale_connections(self, max_age_hours: int = 24):
         """古い接続のクリーンアップ"""
         try:
-            current_time = datetime.utcnow()
-            removed_count = 0
+            cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+            connections_to_remove = []
             
-            for site_id in list(self.connections.keys()):
-                connections_to_remove = []
-                
-                for connection in self.connections[site_id]:
-                    age = current_time - connection.connected_at
-                    if age.total_seconds() > max_age_hours * 3600:
-                        connections_to_remove.append(connection)
-                
-                # 古い接続を削除
-                for connection in connections_to_remove:
-                    await self._remove_failed_connection(connection)
-                    removed_count += 1
+            # 接続時刻の古い順に、期限切れの分だけヒープから取り出す
+            age_heap = self._age_heap
+            while age_heap and age_heap[0][0] < cutoff:
+                _, _, connection = heapq.heappop(age_heap)
+                if self._is_registered(connection):
+                    connections_to_remove.append(connection)
+            
+            # 古い接続をまとめて削除
+            if connections_to_remove:
+                await self._remove_failed_connections(connections_to_remove)
+            removed_count = len(connections_to_remove)
             
             if removed_count > 0:
                 logger.info(f"古い接続をクリーンアップ: {removed_count}件削除")
@@ -322,14 +595,16 @@ class WebSocketManager:
     async def handle_subscription(self, websocket: WebSocket, subscription_types: List[str]):
         """購読設定"""
         try:
-            connection_info = self.connection_map.get(websocket)
+            connection_info = self.get_connection_info(websocket)
             if connection_info:
                 connection_info.subscriptions.update(subscription_types)
+                for subscription_type in subscription_types:
+                    self.subscribers[subscription_type].add(connection_info)
                 
                 await self.send_to_connection(websocket, {
                     "type": "subscription_updated",
                     "subscriptions": list(connection_info.subscriptions),
-                    "timestamp": datetime.utcnow().isoformat()
+                    "timestamp": datetime.utcnow()
                 })
                 
                 logger.debug(f"購読設定更新 ({connection_info.site_id}): {subscription_types}")
@@ -340,14 +615,20 @@ class WebSocketManager:
     async def handle_unsubscription(self, websocket: WebSocket, subscription_types: List[str]):
         """購読解除"""
         try:
-            connection_info = self.connection_map.get(websocket)
+            connection_info = self.get_connection_info(websocket)
             if connection_info:
                 connection_info.subscriptions -= set(subscription_types)
+                for subscription_type in subscription_types:
+                    subscribers = self.subscribers.get(subscription_type)
+                    if subscribers is not None:
+                        subscribers.discard(connection_info)
+                        if not subscribers:
+                            del self.subscribers[subscription_type]
                 
                 await self.send_to_connection(websocket, {
                     "type": "subscription_updated",
                     "subscriptions": list(connection_info.subscriptions),
-                    "timestamp": datetime.utcnow().isoformat()
+                    "timestamp": datetime.utcnow()
                 })
                 
                 logger.debug(f"購読解除 ({connection_info.site_id}): {subscription_types}")
@@ -357,21 +638,25 @@ class WebSocketManager:
 
     def get_connection_info(self, websocket: WebSocket) -> Optional[ConnectionInfo]:
         """接続情報取得"""
-        return self.connection_map.get(websocket)
+        return websocket.scope.get(self.SCOPE_KEY)
 
     async def send_heartbeat(self) -> int:
         """ハートビート送信"""
         try:
+            # server_timeと送信時刻は同じ時刻を使う（時刻取得は1回）
+            now = datetime.utcnow()
             heartbeat_message = {
                 "type": "heartbeat",
-                "server_time": datetime.utcnow().isoformat(),
+                "server_time": now,
+                "timestamp": now,
+                "broadcast": True,
                 "stats": {
                     "total_connections": self.stats["total_connections"],
                     "active_sites": self.stats["active_sites"]
                 }
             }
             
-            return await self.broadcast_to_all(heartbeat_message)
+            return await self._broadcast_message(heartbeat_message)
             
         except Exception as e:
             logger.error(f"ハートビート送信エラー: {e}")
@@ -383,26 +668,43 @@ class WebSocketManager:
             shutdown_message = {
                 "type": "server_shutdown",
                 "message": "サーバーがシャットダウンします",
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": datetime.utcnow(),
+                "broadcast": True
             }
             
+            # まとめ送信待ちを破棄
+            for flush_task in self._flush_tasks.values():
+                flush_task.cancel()
+            self._flush_tasks.clear()
+            self._pending_messages.clear()
+            
             # 全接続に通知
-            await self.broadcast_to_all(shutdown_message)
+            await self._broadcast_message(shutdown_message)
             
             # 少し待機してから強制切断
             await asyncio.sleep(1)
             
-            # 全接続を閉じる
-            for site_connections in self.connections.values():
-                for connection in site_connections:
-                    try:
-                        await connection.websocket.close(code=1000, reason="Server shutdown")
-                    except Exception:
-                        pass  # 既に切断されている可能性
+            # 送信タスクを止めてから全接続を閉じる（送信失敗による接続一覧の変更を防ぐため先に一覧を固定）
+            all_connections = [
+                connection
+                for site_connections in self.connections.values()
+                for connection in site_connections
+            ]
+            for connection in all_connections:
+                self._stop_writer(connection)
+                connection.websocket.scope.pop(self.SCOPE_KEY, None)
+            
+            for connection in all_connections:
+                try:
+                    await connection.websocket.close(code=1000, reason="Server shutdown")
+                except Exception:
+                    pass  # 既に切断されている可能性
             
             # 接続情報をクリア
             self.connections.clear()
-            self.connection_map.clear()
+            self._age_heap.clear()
+            self.site_connection_times.clear()
+            self.subscribers.clear()
             self.stats["total_connections"] = 0
             self.stats["active_sites"] = 0
             
@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 import http.server
-import socketserver
 import os
 import sys
 
@@ -11,7 +10,8 @@ PORT = 8001
 Handler = http.server.SimpleHTTPRequestHandler
 
 try:
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
+    # ダッシュボードのアセットを並列に配信できるよう、リクエストごとにスレッドで処理
+    with http.server.ThreadingHTTPServer(("", PORT), Handler) as httpd:
         print(f"🚀 市場最強売上分析システム が起動しました！")
         print(f"")
         print(f"📊 完全版ダッシュボード: http://localhost:{PORT}/analytics.html")